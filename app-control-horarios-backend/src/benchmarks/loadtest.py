@@ -0,0 +1,305 @@
+"""
+Prueba de carga local que reproduce los flujos reales del frontend.
+
+Cada usuario virtual inicia sesión y recorre en bucle las pantallas que se
+abren a la vez a fin de mes, con las mismas peticiones y en el mismo orden que
+el frontend:
+
+- Dashboard.jsx: GET /forecast/<año>/<mes>
+- Calendar.jsx: GET /employees, GET /calendar/<año>/<mes> y un GET
+  /holidays/<año>/<mes>?community=<nombre> por empleado, en serie
+- Summary.jsx: GET /employees y los 12 GET /forecast/employee/<id>/<año>/<mes>
+  en paralelo (Promise.all, como máximo 6 conexiones como un navegador)
+
+Summary elige un empleado al azar en cada vuelta para no medir solo la caché
+de uno. Al final se imprimen por endpoint las peticiones, errores, latencias
+p50/p95/p99 y el throughput.
+
+Uso (desde app-control-horarios-backend):
+
+    DATABASE_URL=sqlite:////tmp/carga.db python -m src.benchmarks.loadtest seed --employees 1000
+    DATABASE_URL=sqlite:////tmp/carga.db python -m src.main
+    python -m src.benchmarks.loadtest run --users 50 --duration 60
+"""
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from urllib.parse import quote, urlsplit
+
+# Conexiones simultáneas por usuario (límite por host de los navegadores)
+BROWSER_CONNECTIONS = 6
+FLOWS = ('dashboard', 'calendar', 'summary')
+
+
+class Recorder:
+    """Latencias y errores por endpoint, compartidos por todos los usuarios"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint, status, seconds):
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            self.statuses[endpoint][status] += 1
+            if not isinstance(status, int) or status >= 400:
+                self.errors[endpoint] += 1
+
+
+def percentile(values, fraction):
+    """Percentil por rango más cercano sobre una lista ordenada"""
+    if not values:
+        return 0.0
+    rank = max(int(round(fraction * len(values) + 0.5)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+class Client:
+    """Cliente HTTP con una conexión keep-alive por hilo"""
+
+    def __init__(self, base_url, recorder, timeout):
+        parts = urlsplit(base_url)
+        self.connection_class = (http.client.HTTPSConnection if parts.scheme == 'https'
+                                 else http.client.HTTPConnection)
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip('/')
+        self.recorder = recorder
+        self.timeout = timeout
+        self.token = None
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = self.connection_class(self.netloc, timeout=self.timeout)
+        return connection
+
+    def request(self, method, path, endpoint, body=None):
+        """Petición registrada bajo `endpoint`; devuelve el JSON o None"""
+        headers = {'Accept': 'application/json'}
+        if body is not None:
+            body = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        started = time.perf_counter()
+        try:
+            connection = self._connection()
+            connection.request(method, self.prefix + path, body=body, headers=headers)
+            response = connection.getresponse()
+            payload = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException) as e:
+            self._local.connection = None
+            self.recorder.record(endpoint, type(e).__name__, time.perf_counter() - started)
+            return None
+        self.recorder.record(endpoint, status, time.perf_counter() - started)
+        if status >= 400:
+            return None
+        try:
+            return json.loads(payload)
+        except ValueError:
+            return None
+
+
+def _find_token(payload):
+    """El token puede venir en response.user.authentication_token, response.token, access_token..."""
+    if not isinstance(payload, dict):
+        return None
+    for key in ('authentication_token', 'access_token', 'token'):
+        if isinstance(payload.get(key), str):
+            return payload[key]
+    for value in payload.values():
+        token = _find_token(value)
+        if token:
+            return token
+    return None
+
+
+class VirtualUser:
+    def __init__(self, client, options, stop_at):
+        self.client = client
+        self.options = options
+        self.stop_at = stop_at
+        self.random = random.Random()
+
+    def login(self):
+        if self.options.token:
+            self.client.token = self.options.token
+            return
+        payload = self.client.request('POST', self.options.login_path + '?include_auth_token',
+                                      'POST /auth/login',
+                                      {'email': self.options.email, 'password': self.options.password})
+        self.client.token = _find_token(payload)
+
+    def think(self):
+        time.sleep(self.options.think * self.random.uniform(0.5, 1.5))
+
+    def dashboard(self, year, month):
+        self.client.request('GET', f'/api/forecast/{year}/{month}', 'GET /forecast/<y>/<m>')
+
+    def calendar(self, year, month):
+        employees = self.client.request('GET', '/api/employees', 'GET /employees') or {}
+        self.client.request('GET', f'/api/calendar/{year}/{month}', 'GET /calendar/<y>/<m>')
+        for employee in employees.get('data') or []:
+            # Calendar.jsx lee employee.autonomous_community, que la API expone como *_name
+            community = employee.get('autonomous_community') or employee.get('autonomous_community_name')
+            if not community or time.time() >= self.stop_at:
+                continue
+            self.client.request('GET', f'/api/holidays/{year}/{month}?community={quote(str(community))}',
+                                'GET /holidays/<y>/<m>')
+
+    def summary(self, year, pool):
+        employees = (self.client.request('GET', '/api/employees', 'GET /employees') or {}).get('data')
+        if not employees:
+            return
+        employee_id = self.random.choice(employees)['id']
+        futures = [
+            pool.submit(self.client.request, 'GET', f'/api/forecast/employee/{employee_id}/{year}/{month}',
+                        'GET /forecast/employee/<id>/<y>/<m>')
+            for month in range(1, 13)
+        ]
+        for future in futures:
+            future.result()
+
+    def run(self):
+        year, month = self.options.year, self.options.month
+        self.login()
+        with ThreadPoolExecutor(max_workers=BROWSER_CONNECTIONS) as pool:
+            while time.time() < self.stop_at:
+                for flow in self.options.flows:
+                    if time.time() >= self.stop_at:
+                        break
+                    if flow == 'dashboard':
+                        self.dashboard(year, month)
+                    elif flow == 'calendar':
+                        self.calendar(year, month)
+                    else:
+                        self.summary(year, pool)
+                    self.think()
+
+
+def run_load(options):
+    recorder = Recorder()
+    started = time.time()
+    stop_at = started + options.ramp_up + options.duration
+    threads = []
+    for index in range(options.users):
+        user = VirtualUser(Client(options.url, recorder, options.timeout), options, stop_at)
+        thread = threading.Thread(target=user.run, name=f'vu-{index}', daemon=True)
+        threads.append(thread)
+
+    print(f"🚀 {options.users} usuarios durante {options.duration}s "
+          f"(subida {options.ramp_up}s) contra {options.url}")
+    for index, thread in enumerate(threads):
+        if options.ramp_up and options.users > 1:
+            time.sleep(options.ramp_up / options.users)
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - started
+    return report(recorder, elapsed, options.output)
+
+
+def report(recorder, elapsed, output=None):
+    rows = []
+    for endpoint in sorted(recorder.latencies):
+        latencies = sorted(recorder.latencies[endpoint])
+        rows.append({
+            'endpoint': endpoint,
+            'requests': len(latencies),
+            'errors': recorder.errors[endpoint],
+            'error_rate': recorder.errors[endpoint] / len(latencies),
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'max_ms': latencies[-1] * 1000,
+            'rps': len(latencies) / elapsed,
+            'statuses': {str(status): count for status, count in recorder.statuses[endpoint].items()},
+        })
+
+    print(f"\n📊 Resultados ({elapsed:.1f}s)")
+    print(f"   {'endpoint':<38} {'peticiones':>10} {'errores':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'req/s':>8}")
+    for row in rows:
+        print(f"   {row['endpoint']:<38} {row['requests']:>10} {row['error_rate']:>7.1%} "
+              f"{row['p50_ms']:>7.1f}ms {row['p95_ms']:>7.1f}ms {row['p99_ms']:>7.1f}ms {row['rps']:>8.1f}")
+    total = sum(row['requests'] for row in rows)
+    errors = sum(row['errors'] for row in rows)
+    print(f"   Total: {total} peticiones, {total / elapsed:.1f} req/s, "
+          f"{(errors / total if total else 0):.1%} errores")
+    for row in rows:
+        if row['errors']:
+            print(f"   ⚠️ {row['endpoint']}: {row['statuses']}")
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as handle:
+            json.dump({'elapsed': elapsed, 'endpoints': rows}, handle, indent=2)
+    return rows
+
+
+def seed(options):
+    """Poblar la base de DATABASE_URL con datos sintéticos para la prueba"""
+    from src.main import app
+    from src.models.employee import db, Employee
+    from src.services.synthetic_data import SyntheticDataGenerator
+
+    year = date.today().year
+    with app.app_context():
+        if db.session.query(Employee.id).first() is not None and not options.reset:
+            raise SystemExit('❌ La base de datos ya tiene empleados: usa --reset para vaciarla')
+        if options.reset:
+            db.drop_all()
+            db.create_all()
+        dataset = SyntheticDataGenerator(seed=options.seed).generate(
+            options.employees, list(range(year - options.years + 1, year + 1)))
+    print(f"✅ Datos sintéticos creados: {dataset}")
+
+
+def main(argv=None):
+    today = date.today()
+    parser = argparse.ArgumentParser(description='Prueba de carga con los flujos del frontend')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed_parser = commands.add_parser('seed', help='Poblar DATABASE_URL con datos sintéticos')
+    seed_parser.add_argument('--employees', type=int, default=1000)
+    seed_parser.add_argument('--years', type=int, default=2)
+    seed_parser.add_argument('--seed', type=int, default=42)
+    seed_parser.add_argument('--reset', action='store_true', help='Vaciar la base de datos antes')
+
+    run_parser = commands.add_parser('run', help='Lanzar los usuarios virtuales')
+    run_parser.add_argument('--url', default='http://localhost:5002')
+    run_parser.add_argument('--users', type=int, default=20)
+    run_parser.add_argument('--duration', type=float, default=60, help='Segundos a plena carga')
+    run_parser.add_argument('--ramp-up', type=float, default=10, help='Segundos hasta arrancar todos')
+    run_parser.add_argument('--think', type=float, default=1.0, help='Pausa media entre pantallas (s)')
+    run_parser.add_argument('--flows', default=','.join(FLOWS), help='Pantallas a recorrer, en orden')
+    run_parser.add_argument('--year', type=int, default=today.year)
+    run_parser.add_argument('--month', type=int, default=today.month)
+    run_parser.add_argument('--email', default='admin@example.com')
+    run_parser.add_argument('--password', default='password')
+    run_parser.add_argument('--login-path', default='/api/auth/login')
+    run_parser.add_argument('--token', help='Token ya emitido (omite el login)')
+    run_parser.add_argument('--timeout', type=float, default=30)
+    run_parser.add_argument('--output', help='Guardar los resultados en JSON')
+
+    options = parser.parse_args(argv)
+    if options.command == 'seed':
+        seed(options)
+        return
+    options.flows = [flow.strip() for flow in options.flows.split(',') if flow.strip()]
+    unknown = set(options.flows) - set(FLOWS)
+    if unknown:
+        parser.error(f'Flujos desconocidos: {", ".join(sorted(unknown))}')
+    run_load(options)
+
+
+if __name__ == '__main__':
+    main()
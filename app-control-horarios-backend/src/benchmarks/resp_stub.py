@@ -0,0 +1,151 @@
+"""
+Servidor mínimo con protocolo Redis (RESP) en memoria, para pruebas locales.
+
+Implementa solo los comandos que usa RedisBackend (GET, SET con PX/EX/NX,
+DEL, INCR, SCAN, SELECT, AUTH, PING, FLUSHDB), de modo que la caché
+compartida entre varios workers se puede probar sin instalar Redis.
+
+Uso (desde app-control-horarios-backend):
+
+    python -m src.benchmarks.resp_stub --port 6380
+    CACHE_BACKEND=redis://localhost:6380/0 gunicorn -w 4 src.main:app
+"""
+import argparse
+import re
+import socketserver
+import threading
+import time
+
+_lock = threading.Lock()
+_data = {}  # clave -> (valor, caduca o None)
+
+
+def _glob_to_regex(pattern):
+    """Patrón MATCH de Redis (*, ?, [..] y escapes con \\) a expresión regular"""
+    regex, position = [], 0
+    while position < len(pattern):
+        char = pattern[position]
+        if char == '\\' and position + 1 < len(pattern):
+            position += 1
+            regex.append(re.escape(pattern[position]))
+        elif char == '*':
+            regex.append('.*')
+        elif char == '?':
+            regex.append('.')
+        elif char == '[':
+            end = pattern.find(']', position)
+            if end < 0:
+                regex.append(re.escape(char))
+            else:
+                regex.append(pattern[position:end + 1])
+                position = end
+        else:
+            regex.append(re.escape(char))
+        position += 1
+    return re.compile(''.join(regex) + r'\Z', re.S)
+
+
+def _alive(key, now):
+    entry = _data.get(key)
+    if entry is None:
+        return None
+    if entry[1] is not None and entry[1] <= now:
+        del _data[key]
+        return None
+    return entry
+
+
+def execute(args):
+    """Ejecutar un comando ya decodificado; devuelve el valor a codificar en RESP"""
+    command = args[0].decode().upper()
+    now = time.monotonic()
+    with _lock:
+        if command in ('PING',):
+            return 'PONG'
+        if command in ('AUTH', 'SELECT'):
+            return 'OK'
+        if command == 'FLUSHDB':
+            _data.clear()
+            return 'OK'
+        if command == 'GET':
+            entry = _alive(args[1], now)
+            return entry[0] if entry else None
+        if command == 'SET':
+            key, value, expires, only_new = args[1], args[2], None, False
+            options = [arg.decode().upper() for arg in args[3:]]
+            for position, option in enumerate(options):
+                if option == 'PX':
+                    expires = now + int(options[position + 1]) / 1000
+                elif option == 'EX':
+                    expires = now + int(options[position + 1])
+                elif option == 'NX':
+                    only_new = True
+            if only_new and _alive(key, now):
+                return None
+            _data[key] = (value, expires)
+            return 'OK'
+        if command == 'DEL':
+            return sum(1 for key in args[1:] if _data.pop(key, None) is not None)
+        if command == 'INCR':
+            entry = _alive(args[1], now)
+            value = int(entry[0]) + 1 if entry else 1
+            _data[args[1]] = (str(value).encode(), entry[1] if entry else None)
+            return value
+        if command == 'SCAN':
+            pattern = None
+            options = [arg.decode() for arg in args[2:]]
+            for position, option in enumerate(options):
+                if option.upper() == 'MATCH':
+                    pattern = _glob_to_regex(options[position + 1])
+            keys = [key for key in list(_data) if _alive(key, now)
+                    and (pattern is None or pattern.match(key.decode('utf-8', 'replace')))]
+            return [b'0', keys]
+    return RuntimeError(f"ERR unknown command '{command}'")
+
+
+def encode(value):
+    if isinstance(value, RuntimeError):
+        return b'-%s\r\n' % str(value).encode()
+    if value is None:
+        return b'$-1\r\n'
+    if isinstance(value, str):
+        return b'+%s\r\n' % value.encode()
+    if isinstance(value, int):
+        return b':%d\r\n' % value
+    if isinstance(value, bytes):
+        return b'$%d\r\n%s\r\n' % (len(value), value)
+    return b'*%d\r\n' % len(value) + b''.join(encode(item) for item in value)
+
+
+class RESPHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            if not line.startswith(b'*'):
+                continue
+            args = []
+            for _ in range(int(line[1:])):
+                length = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(length + 2)[:-2])
+            self.wfile.write(encode(execute(args)))
+
+
+class RESPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Servidor RESP en memoria para pruebas de la caché')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6380)
+    options = parser.parse_args(argv)
+    with RESPServer((options.host, options.port), RESPHandler) as server:
+        print(f"🧪 Servidor RESP de pruebas en {options.host}:{options.port}")
+        server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
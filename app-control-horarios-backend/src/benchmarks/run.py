@@ -0,0 +1,279 @@
+"""
+Suite de rendimiento del forecast y del calendario sobre datos sintéticos.
+
+Para cada base de datos y tamaño lanza un proceso aparte (la aplicación se
+configura con DATABASE_URL al importarse), genera el conjunto de datos con
+SyntheticDataGenerator y cronometra los cálculos y rutas más pesados. Cada
+ejecución se añade como una línea JSON a benchmarks/results.jsonl junto con el
+commit, para comparar versiones.
+
+Uso (desde app-control-horarios-backend):
+
+    python -m src.benchmarks.run --sizes 100,1000,10000
+    python -m src.benchmarks.run --database sqlite --database postgresql://localhost/bench --reset
+    python -m src.benchmarks.run --compare-only
+
+Las bases PostgreSQL se vacían por completo (--reset es obligatorio si tienen
+datos); SQLite usa siempre un fichero temporal nuevo.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import date, datetime
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+DEFAULT_RESULTS = BACKEND_DIR / 'benchmarks' / 'results.jsonl'
+DEFAULT_SIZES = '100,1000,10000'
+
+
+def _git(*args):
+    try:
+        return subprocess.check_output(['git', *args], cwd=BACKEND_DIR, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _commit():
+    commit = _git('rev-parse', '--short', 'HEAD') or 'unknown'
+    if _git('status', '--porcelain', '--', 'src'):
+        commit += '-dirty'
+    return commit
+
+
+# --- Proceso hijo: generar datos y cronometrar ---
+
+def _measure(app, function, repeat, before=None, **request):
+    """Ejecutar `function` `repeat` veces, cada una en un contexto de petición limpio"""
+    from flask import g
+
+    durations = []
+    queries = 0
+    for _ in range(repeat):
+        if before:
+            before()
+        with app.test_request_context(**request):
+            g._sql_stats = [0, 0.0]
+            g._sql_fingerprints = Counter()
+            started = time.perf_counter()
+            function()
+            durations.append(time.perf_counter() - started)
+            queries = g._sql_stats[0]
+    return {
+        'min': round(min(durations), 6),
+        'median': round(statistics.median(durations), 6),
+        'max': round(max(durations), 6),
+        'queries': queries,
+        'repeat': repeat,
+    }
+
+
+def _view(app, endpoint):
+    """Vista sin los decoradores de autenticación"""
+    import inspect
+    return inspect.unwrap(app.view_functions[endpoint])
+
+
+def run_worker(options):
+    from src.main import app
+    from src.models.employee import db, Employee, AutonomousCommunity
+    from src.services.holiday_service import HolidayService
+    from src.services.holiday_generator import SpanishHolidayGenerator
+    from src.services.hours_ledger import hours_ledger, HOURS_LEDGER_ENABLED
+    from src.services.synthetic_data import SyntheticDataGenerator
+    from src.utils.hours_calculator import HoursCalculator
+
+    year = date.today().year
+    years = list(range(year - options.years + 1, year + 1))
+    month = 3
+    results = {}
+
+    with app.app_context():
+        if db.session.query(Employee.id).first() is not None:
+            if not options.reset:
+                raise SystemExit('❌ La base de datos ya tiene empleados: usa --reset para vaciarla')
+        if options.reset:
+            hours_ledger.wait_until_idle()
+            db.drop_all()
+            db.create_all()
+        HolidayService._cache.clear()
+        HoursCalculator.invalidate_cache()
+
+        started = time.perf_counter()
+        dataset = SyntheticDataGenerator(seed=options.seed).generate(options.employees, years)
+        results['generate'] = {'seconds': round(time.perf_counter() - started, 3)}
+        print(f"🧪 Datos generados: {dataset}")
+
+        if HOURS_LEDGER_ENABLED:
+            started = time.perf_counter()
+            hours_ledger.schedule()
+            hours_ledger.wait_until_idle()
+            results['ledger_build'] = {'seconds': round(time.perf_counter() - started, 3)}
+
+        calculator = HoursCalculator()
+        sample = Employee.query.order_by(Employee.id).limit(20).all()
+        community_ids = [community_id for (community_id,) in db.session.query(AutonomousCommunity.id)]
+        holiday_service = HolidayService()
+
+        def cold():
+            HolidayService._cache.clear()
+            HoursCalculator.invalidate_cache()
+
+        def annual_summaries():
+            for employee in Employee.query.filter(Employee.id.in_([e.id for e in sample])):
+                calculator.calculate_annual_summary(employee, year)
+
+        def holiday_lookups():
+            for index in range(10000):
+                day = date.fromordinal(date(year, 1, 1).toordinal() + index % 365)
+                holiday_service.is_holiday(day, community_ids[index % len(community_ids)])
+
+        def holidays_by_year():
+            for community_id in community_ids:
+                holiday_service.get_holidays_by_year(year, community_id)
+
+        calendar_view = _view(app, 'calendar.get_calendar_data')
+        cases = [
+            ('dashboard_summary_cold', lambda: calculator.calculate_dashboard_summary(year, month), cold),
+            ('dashboard_summary_warm', lambda: calculator.calculate_dashboard_summary(year, month), None),
+            ('annual_summary_x20_cold', annual_summaries, cold),
+            ('calendar_month', lambda: calendar_view(year, month), None),
+            ('holiday_lookups_x10000', holiday_lookups, cold),
+            ('holidays_by_year_x19', holidays_by_year, cold),
+        ]
+        for name, function, before in cases:
+            print(f"⏱️  {name}...")
+            results[name] = _measure(app, function, options.repeat, before)
+
+        # Escrituras en bloque (al final: modifican los datos)
+        bulk_view = _view(app, 'employee.bulk_upsert_employees')
+        ids = [employee_id for (employee_id,) in db.session.query(Employee.id).limit(5000)]
+        payload = {'employees': [{'id': employee_id, 'free_hours': 16} for employee_id in ids]}
+        results['employees_bulk_update'] = _measure(app, bulk_view, 1, method='POST', json=payload)
+        results['holidays_sync_year'] = _measure(
+            app, lambda: SpanishHolidayGenerator().sync_year(year + 1), 1)
+        hours_ledger.wait_until_idle()
+
+        dialect = db.engine.dialect.name
+
+    record = {
+        'timestamp': datetime.utcnow().isoformat(timespec='seconds'),
+        'commit': _commit(),
+        'database': dialect,
+        'employees': options.employees,
+        'years': options.years,
+        'ledger': HOURS_LEDGER_ENABLED,
+        'python': platform.python_version(),
+        'dataset': dataset,
+        'results': results,
+    }
+    Path(options.output).write_text(json.dumps(record))
+
+
+# --- Proceso principal: matriz de ejecuciones y comparación ---
+
+def _database_url(database, employees, workdir):
+    if database == 'sqlite':
+        path = Path(workdir) / f'bench_{employees}.db'
+        if path.exists():
+            path.unlink()
+        return f'sqlite:///{path}'
+    return database
+
+
+def load_results(path):
+    if not Path(path).exists():
+        return []
+    with open(path, encoding='utf-8') as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def _same_setup(a, b):
+    return all(a[key] == b[key] for key in ('database', 'employees', 'years', 'ledger'))
+
+
+def compare(record, history):
+    """Imprimir las medianas frente a la última ejecución equivalente de otro commit"""
+    baseline = next((previous for previous in reversed(history)
+                     if _same_setup(previous, record) and previous['commit'] != record['commit']), None)
+    print(f"\n📊 {record['database']} · {record['employees']} empleados · {record['years']} años "
+          f"· commit {record['commit']}" + (f" vs {baseline['commit']}" if baseline else ''))
+    for name, values in record['results'].items():
+        current = values.get('median', values.get('seconds'))
+        line = f"   {name:<28} {current * 1000:>10.1f} ms"
+        if 'queries' in values:
+            line += f" {values['queries']:>6} consultas"
+        if baseline and name in baseline['results']:
+            previous = baseline['results'][name]
+            previous = previous.get('median', previous.get('seconds'))
+            if previous:
+                line += f"   x{current / previous:.2f}"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks del forecast y del calendario')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='Nº de empleados separados por comas')
+    parser.add_argument('--years', type=int, default=2, help='Años de entradas a generar')
+    parser.add_argument('--database', action='append',
+                        help="'sqlite' o una URL de PostgreSQL (repetible; por defecto sqlite)")
+    parser.add_argument('--repeat', type=int, default=5, help='Repeticiones por caso')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-ledger', action='store_true', help='Desactivar el libro diario de horas')
+    parser.add_argument('--reset', action='store_true', help='Vaciar las bases PostgreSQL antes de generar')
+    parser.add_argument('--results', default=str(DEFAULT_RESULTS), help='Fichero JSONL de resultados')
+    parser.add_argument('--compare-only', action='store_true', help='Solo comparar los resultados guardados')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--employees', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    options = parser.parse_args(argv)
+
+    if options.worker:
+        run_worker(options)
+        return
+
+    history = load_results(options.results)
+    if options.compare_only:
+        latest = {}
+        for record in history:
+            latest[(record['database'], record['employees'], record['years'], record['ledger'])] = record
+        for record in latest.values():
+            compare(record, history[:history.index(record)])
+        return
+
+    Path(options.results).parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory() as workdir:
+        for database in options.database or ['sqlite']:
+            for employees in [int(size) for size in options.sizes.split(',')]:
+                output = Path(workdir) / 'result.json'
+                env = dict(os.environ,
+                           DATABASE_URL=_database_url(database, employees, workdir),
+                           HOURS_LEDGER_ENABLED='false' if options.no_ledger else 'true',
+                           # Los casos en frío no deben encontrar las cachés ya calentadas
+                           CACHE_WARMUP_ENABLED='false')
+                command = [sys.executable, '-m', 'src.benchmarks.run', '--worker',
+                           '--employees', str(employees), '--years', str(options.years),
+                           '--repeat', str(options.repeat), '--seed', str(options.seed),
+                           '--output', str(output)]
+                if options.reset or database == 'sqlite':
+                    command.append('--reset')
+                print(f"🚀 {database} con {employees} empleados...")
+                subprocess.run(command, cwd=BACKEND_DIR, env=env, check=True)
+
+                record = json.loads(output.read_text())
+                compare(record, history)
+                with open(options.results, 'a', encoding='utf-8') as handle:
+                    handle.write(json.dumps(record) + '\n')
+                history.append(record)
+
+
+if __name__ == '__main__':
+    main()
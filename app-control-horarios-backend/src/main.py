@@ -1,9 +1,9 @@
-from flask import Flask, send_from_directory, jsonify
+from flask import Flask, send_from_directory, jsonify, Response
 from flask_sqlalchemy import SQLAlchemy # type: ignore
 from flask_cors import CORS # type: ignore
 import os
 from dotenv import load_dotenv # type: ignore
-from flask_security import Security, SQLAlchemyUserDatastore, utils
+from flask_security import Security, utils
 from flask_bcrypt import Bcrypt # type: ignore
 from datetime import timedelta, datetime # Importar timedelta y datetime
 
@@ -13,6 +13,18 @@ load_dotenv()
 # Crear la aplicación Flask
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 
+# Logging estructurado y no bloqueante (LOG_LEVEL, LOG_LEVELS, LOG_FORMAT)
+from src.utils.logging_config import init_logging
+logger = init_logging(app).getChild('main')
+
+# Serialización JSON con orjson (fechas ISO 8601 nativas)
+from src.utils.json_provider import init_json
+init_json(app)
+
+# Cachés de forecast, festivos y calendario (CACHE_BACKEND: memory, sqlite:///ruta o redis://host)
+from src.utils.cache_backend import init_cache
+init_cache(app)
+
 # --- Configuración de Flask-Security-Too ---
 # Es CRUCIAL que SECRET_KEY y SECURITY_PASSWORD_SALT se definan en el archivo .env
 # EJEMPLO para .env:
@@ -26,12 +38,20 @@ app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
 app.config['SECURITY_PASSWORD_SALT'] = os.getenv('SECURITY_PASSWORD_SALT')
 
 if not app.config['SECRET_KEY'] or not app.config['SECURITY_PASSWORD_SALT']:
-    print("⚠️ ADVERTENCIA: SECRET_KEY o SECURITY_PASSWORD_SALT no están configuradas en las variables de entorno. Usando valores por defecto NO SEGUROS.")
+    logger.warning("⚠️ ADVERTENCIA: SECRET_KEY o SECURITY_PASSWORD_SALT no están configuradas en las variables de entorno. Usando valores por defecto NO SEGUROS.")
     app.config['SECRET_KEY'] = 'fallback-secret-key-dev-only'
     app.config['SECURITY_PASSWORD_SALT'] = 'fallback-salt-dev-only'
 
 
 app.config['SECURITY_PASSWORD_HASH'] = 'bcrypt'
+# Coste de bcrypt (2^rounds). Los hashes con otro coste se regeneran en el siguiente login
+PASSWORD_HASH_ROUNDS = int(os.getenv('PASSWORD_HASH_ROUNDS', '12'))
+app.config['SECURITY_PASSWORD_HASH_PASSLIB_OPTIONS'] = {
+    'argon2__rounds': 10,
+    'bcrypt__default_rounds': PASSWORD_HASH_ROUNDS,
+    'bcrypt__min_rounds': PASSWORD_HASH_ROUNDS,
+    'bcrypt__max_rounds': PASSWORD_HASH_ROUNDS,
+}
 app.config['SECURITY_TOKEN_AUTHENTICATION_HEADER'] = "Authorization"
 app.config['SECURITY_USER_IDENTITY_ATTRIBUTES'] = [
     {"email": {"required": True, "allow_unverified": True}}
@@ -44,6 +64,7 @@ app.config['SECURITY_CONFIRMABLE'] = False
 app.config['SECURITY_REGISTERABLE'] = True
 app.config['SECURITY_RECOVERABLE'] = False
 app.config['SECURITY_CHANGEABLE'] = True
+app.config['SECURITY_SEND_PASSWORD_CHANGE_EMAIL'] = False # Sin extensión de correo configurada
 app.config['SECURITY_TRACKABLE'] = False
 
 # Para una API JSON que usa tokens Bearer, la protección CSRF tradicional de sesión no es necesaria
@@ -79,13 +100,21 @@ if database_url:
         'max_overflow': 0,
         'pool_pre_ping': True
     }
-    print("🔗 Conectando a Supabase PostgreSQL con pool optimizado...")
+    logger.info("🔗 Conectando a Supabase PostgreSQL con pool optimizado...")
 else:
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///control_horarios.db'
-    print("🔗 Usando SQLite local...")
+    logger.info("🔗 Usando SQLite local...")
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Compresión de respuestas (registrada primero: su after_request se ejecuta el último)
+from src.utils.compression import init_compression
+init_compression(app)
+
+# Instrumentación: consultas SQL y cálculos por petición (Server-Timing y /metrics)
+from src.utils.instrumentation import init_instrumentation, metrics
+init_instrumentation(app)
+
 # Importar e inicializar la base de datos
 from src.models.employee import db
 db.init_app(app)
@@ -94,8 +123,19 @@ db.init_app(app)
 from src.models.employee import Employee, CalendarEntry, Holiday, User, Role # Añadir User y Role
 
 # Configurar Flask-Security-Too
-user_datastore = SQLAlchemyUserDatastore(db, User, Role)
+# Identidades por token cacheadas (sin consulta de usuario/roles en cada petición)
+from src.services.identity_cache import CachedUserDatastore, init_identity_cache
+user_datastore = CachedUserDatastore(db, User, Role)
 security = Security(app, user_datastore)
+init_identity_cache(app, security)
+
+# Verificación de contraseñas en un pool acotado (admisión por cola y métricas de login)
+from src.services.password_hasher import init_password_hashing
+init_password_hashing(app)
+
+# Admisión por carriles: las rutas pesadas no agotan el pool y las escrituras pasan primero
+from src.utils.admission import init_admission
+init_admission(app)
 
 # Función para crear roles y usuario admin inicial (opcional)
 def create_initial_roles_and_user(app_context_user_datastore):
@@ -108,7 +148,7 @@ def create_initial_roles_and_user(app_context_user_datastore):
         # Crear un usuario admin de prueba si no existe ninguno
         # En producción, esto debería manejarse de forma más segura o eliminarse.
         if not app_context_user_datastore.get_user('admin@example.com'):
-            print("👤 Creando usuario admin de prueba: admin@example.com / password")
+            logger.info("👤 Creando usuario admin de prueba: admin@example.com / password")
             import uuid
             fs_uniquifier = str(uuid.uuid4())
 
@@ -128,6 +168,8 @@ from src.routes.calendar import calendar_bp
 from src.routes.forecast import forecast_bp
 from src.routes.holiday import holiday_bp
 from src.routes.auth import auth_bp
+from src.routes.jobs import jobs_bp
+from src.routes.reference import reference_bp
 
 # Registrar blueprints
 app.register_blueprint(employee_bp, url_prefix='/api')
@@ -135,28 +177,53 @@ app.register_blueprint(calendar_bp, url_prefix='/api')
 app.register_blueprint(forecast_bp, url_prefix='/api')
 app.register_blueprint(holiday_bp, url_prefix='/api')
 app.register_blueprint(auth_bp, url_prefix='/api')
+app.register_blueprint(jobs_bp, url_prefix='/api')
+app.register_blueprint(reference_bp, url_prefix='/api')
 
 # Crear las tablas e inicializar festivos
 with app.app_context():
     try:
+        if db.engine.dialect.name == 'postgresql':
+            # Necesaria para los índices trigram de búsqueda de empleados
+            with db.engine.begin() as connection:
+                connection.execute(db.text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
         db.create_all()
-        print("✅ Tablas de base de datos creadas/verificadas exitosamente")
+        # create_all no añade índices a tablas ya existentes
+        for index in Employee.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
+        logger.info("✅ Tablas de base de datos creadas/verificadas exitosamente")
 
         # Crear roles y usuario admin inicial
         if user_datastore: # Asegurarse que user_datastore está disponible
             create_initial_roles_and_user(user_datastore)
         else:
-            print("⚠️ user_datastore no disponible, no se crearon roles/usuario iniciales.")
+            logger.warning("⚠️ user_datastore no disponible, no se crearon roles/usuario iniciales.")
 
         # Verificar festivos existentes
         holiday_count = Holiday.query.count()
         if holiday_count > 0:
-            print(f"✅ Ya existen {holiday_count} festivos en la base de datos")
+            logger.info("✅ Ya existen %d festivos en la base de datos", holiday_count)
         else:
-            print("⚠️ No hay festivos en la base de datos")
+            logger.warning("⚠️ No hay festivos en la base de datos")
             
-    except Exception as e:
-        print(f"❌ Error al crear tablas: {e}")
+    except Exception:
+        logger.exception("❌ Error al crear tablas")
+
+# Datos de referencia (comunidades, provincias, tipos de actividad) precargados en memoria
+from src.services.reference_data import init_reference_data
+init_reference_data(app)
+
+# Generar en segundo plano el libro diario de horas esperadas
+from src.services.hours_ledger import hours_ledger
+hours_ledger.init_app(app)
+
+# Trabajos pesados (resúmenes anuales, reconstrucciones, exportaciones) en procesos aparte
+from src.services.job_runner import job_runner
+job_runner.init_app(app)
+
+# Calentamiento de cachés al arrancar y los días 1 y 26 (comando: flask warm-cache)
+from src.services.cache_warmup import cache_warmup
+cache_warmup.init_app(app)
 
 @app.route('/')
 def index():
@@ -166,6 +233,11 @@ def index():
         'version': '1.0.0'
     })
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Métricas en formato de texto de Prometheus"""
+    return Response(metrics.render(db.engine), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/health')
 def health():
     return jsonify({
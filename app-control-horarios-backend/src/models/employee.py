@@ -1,4 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy # type: ignore
+import json
 from datetime import datetime
 from flask_security import UserMixin, RoleMixin
 
@@ -38,6 +39,18 @@ class User(db.Model, UserMixin):
     def __str__(self):
         return self.email
 
+    def verify_and_update_password(self, password):
+        """Verificar la contraseña en el pool acotado de hashing (ver password_hasher)"""
+        from src.services.password_hasher import verify_and_update_password
+        return verify_and_update_password(self, password)
+
+    def get_auth_token(self):
+        """Token firmado con los roles del usuario como claim (ver identity_cache)"""
+        from flask import current_app
+        from src.services.identity_cache import role_claims_token_data
+        serializer = current_app.extensions['security'].remember_token_serializer
+        return serializer.dumps(role_claims_token_data(self))
+
 class Employee(db.Model):
     __tablename__ = 'employees'
     
@@ -56,6 +69,18 @@ class Employee(db.Model):
     
     # Relación con entradas de calendario
     calendar_entries = db.relationship('CalendarEntry', backref='employee', lazy=True, cascade='all, delete-orphan')
+
+    # Índices de listado y búsqueda
+    __table_args__ = (
+        # Orden estable para la paginación por cursor (keyset)
+        db.Index('idx_employee_team_name_id', 'team_name', 'full_name', 'id'),
+        # Búsqueda por subcadena (ILIKE '%x%'): índices trigram solo en PostgreSQL;
+        # en otros motores un índice normal no sirve para ILIKE y solo encarece las escrituras
+        db.Index('idx_employee_full_name_trgm', 'full_name',
+                 postgresql_using='gin', postgresql_ops={'full_name': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+        db.Index('idx_employee_team_name_trgm', 'team_name',
+                 postgresql_using='gin', postgresql_ops={'team_name': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+    )
     
     def __repr__(self):
         return f'<Employee {self.full_name} - {self.team_name}>'
@@ -81,22 +106,8 @@ class Employee(db.Model):
     
     def get_monthly_hours(self, year, month):
         """Calcula las horas mensuales teóricas (sin considerar ausencias)"""
-        import calendar
-        # Contar días laborables del mes
-        working_days = 0
-        days_in_month = calendar.monthrange(year, month)[1]
-        
-        for day in range(1, days_in_month + 1):
-            date_obj = datetime(year, month, day)
-            weekday = date_obj.weekday()  # 0=Lunes, 6=Domingo
-            
-            if weekday < 4:  # Lunes a Jueves
-                working_days += self.hours_mon_thu
-            elif weekday == 4:  # Viernes
-                working_days += self.hours_fri
-            # Sábado y Domingo no se cuentan
-        
-        return working_days
+        from src.utils.hours_calculator import HoursCalculator
+        return HoursCalculator().calculate_theoretical_hours(self, year, month)
     
     @staticmethod
     def get_autonomous_communities():
@@ -123,6 +134,70 @@ class Employee(db.Model):
             'Melilla': 'ML'
         }
 
+class EmployeeSchedule(db.Model):
+    __tablename__ = 'employee_schedules'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    employee_id = db.Column(db.Integer, db.ForeignKey('employees.id'), nullable=False, index=True)
+    effective_from = db.Column(db.Date, nullable=False)
+    effective_to = db.Column(db.Date, nullable=True)  # Inclusive; None = vigente sin fecha de fin
+    hours_mon_thu = db.Column(db.Float, nullable=False)
+    hours_fri = db.Column(db.Float, nullable=False)
+    profile = db.Column(db.String(50), nullable=True)  # Perfil de jornada (ver utils/schedule_rules.py)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    employee = db.relationship('Employee', backref=db.backref('schedules', lazy=True, cascade='all, delete-orphan'))
+    
+    __table_args__ = (
+        db.UniqueConstraint('employee_id', 'effective_from', name='unique_employee_schedule_from'),
+        db.Index('idx_employee_schedule_from', 'employee_id', 'effective_from'),
+    )
+    
+    def __repr__(self):
+        return f'<EmployeeSchedule {self.employee_id} - {self.effective_from} -> {self.effective_to}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'employee_id': self.employee_id,
+            'effective_from': self.effective_from.isoformat() if self.effective_from else None,
+            'effective_to': self.effective_to.isoformat() if self.effective_to else None,
+            'hours_mon_thu': self.hours_mon_thu,
+            'hours_fri': self.hours_fri,
+            'profile': self.profile,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class DailyExpectedHours(db.Model):
+    __tablename__ = 'daily_expected_hours'
+
+    # Libro diario de horas (ver services/hours_ledger.py): una fila por empleado y día
+    employee_id = db.Column(db.Integer, db.ForeignKey('employees.id', ondelete='CASCADE'), primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    expected = db.Column(db.Float, nullable=False, default=0)  # Horas esperadas según horario, perfil y festivos
+    worked = db.Column(db.Float, nullable=False, default=0)  # Esperadas ajustadas por V/F/HLD/G
+
+    employee = db.relationship('Employee', backref=db.backref('ledger_days', lazy='dynamic', passive_deletes=True))
+
+    __table_args__ = (
+        db.Index('idx_daily_expected_hours_date', 'date', 'employee_id'),
+    )
+
+    def __repr__(self):
+        return f'<DailyExpectedHours {self.employee_id} - {self.date}: {self.expected}/{self.worked}>'
+
+class LedgerPending(db.Model):
+    __tablename__ = 'ledger_pending'
+
+    # Regeneraciones del libro diario encoladas en algún worker y aún sin terminar:
+    # mientras exista una fila, ningún proceso lee el libro para ese empleado
+    id = db.Column(db.Integer, primary_key=True)
+    employee_id = db.Column(db.Integer, nullable=True, index=True)  # None = todos los empleados
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<LedgerPending {self.employee_id or "todos"}>'
+
 class CalendarEntry(db.Model):
     __tablename__ = 'calendar_entries'
     
@@ -218,3 +293,75 @@ class Holiday(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+
+class MonthClosure(db.Model):
+    __tablename__ = 'month_closures'
+
+    id = db.Column(db.Integer, primary_key=True)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='closed')  # 'closed' o 'reopened'
+    snapshot = db.Column(db.LargeBinary, nullable=True)  # JSON comprimido con zlib (ver services/month_close_service.py)
+    closed_at = db.Column(db.DateTime, nullable=True)
+    closed_by = db.Column(db.String(255), nullable=True)
+    reopened_at = db.Column(db.DateTime, nullable=True)
+    reopened_by = db.Column(db.String(255), nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('year', 'month', name='unique_month_closure'),
+    )
+
+    def __repr__(self):
+        return f'<MonthClosure {self.year}-{self.month:02d} {self.status}>'
+
+    def to_dict(self):
+        return {
+            'year': self.year,
+            'month': self.month,
+            'status': self.status,
+            'closed_at': self.closed_at.isoformat() if self.closed_at else None,
+            'closed_by': self.closed_by,
+            'reopened_at': self.reopened_at.isoformat() if self.reopened_at else None,
+            'reopened_by': self.reopened_by,
+            'snapshot_bytes': len(self.snapshot) if self.snapshot else 0
+        }
+
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+
+    id = db.Column(db.String(36), primary_key=True)  # uuid4
+    kind = db.Column(db.String(50), nullable=False)
+    params = db.Column(db.Text, nullable=False, default='{}')  # JSON
+    status = db.Column(db.String(10), nullable=False, default='queued', index=True)  # queued, running, succeeded, failed
+    progress = db.Column(db.Float, nullable=False, default=0.0)  # 0..1
+    progress_message = db.Column(db.String(255), nullable=True)
+    result = db.deferred(db.Column(db.LargeBinary, nullable=True))  # cuerpo de la descarga comprimido con zlib
+    result_content_type = db.Column(db.String(100), nullable=True)
+    result_filename = db.Column(db.String(255), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_by = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Job {self.id} {self.kind} {self.status}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'params': json.loads(self.params or '{}'),
+            'status': self.status,
+            'progress': round(self.progress or 0.0, 3),
+            'progress_message': self.progress_message,
+            'error': self.error,
+            'has_result': self.status == 'succeeded',
+            'result_filename': self.result_filename,
+            'created_by': self.created_by,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
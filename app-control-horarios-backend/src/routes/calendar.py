@@ -1,17 +1,37 @@
+import logging
 from flask import Blueprint, request, jsonify
 from src.models.employee import db, Employee, CalendarEntry, Holiday
+from src.utils.hours_calculator import HoursCalculator
+from src.services.hours_ledger import hours_ledger
+from src.services.month_close_service import MonthCloseService
+from src.services.calendar_cache import get_month_entries
+from src.utils.instrumentation import query_budget
 from datetime import datetime, date, timedelta
 import calendar as cal
 from flask_security import auth_required
 
 calendar_bp = Blueprint('calendar', __name__)
+logger = logging.getLogger(__name__)
+month_close_service = MonthCloseService()
+
+def _closed_month_error(entry_date):
+    """Respuesta 409 si la fecha pertenece a un mes cerrado, o None"""
+    closed_month = month_close_service.closed_month_for_date(entry_date)
+    if closed_month is None:
+        return None
+    year, month = closed_month
+    return jsonify({
+        'success': False,
+        'message': f'El mes {month:02d}/{year} está cerrado. Reábralo para modificar sus entradas'
+    }), 409
 
 @calendar_bp.route('/calendar/<int:year>/<int:month>', methods=['GET'])
-@auth_required('jwt')
+@query_budget(5)
+@auth_required('token')
 def get_calendar_data(year, month):
     """Obtener datos del calendario para un mes específico"""
     try:
-        print(f"📅 Obteniendo datos del calendario para {year}/{month}")
+        logger.debug("📅 Obteniendo datos del calendario para %s/%s", year, month)
         
         # Validar fecha
         if not (1 <= month <= 12):
@@ -28,10 +48,10 @@ def get_calendar_data(year, month):
         
         # Obtener empleados con manejo de errores
         try:
-            employees = Employee.query.all()
-            print(f"👥 Empleados encontrados: {len(employees)}")
+            employees = db.session.query(Employee.id).all()
+            logger.debug("👥 Empleados encontrados: %d", len(employees))
         except Exception as e:
-            print(f"❌ Error al obtener empleados: {e}")
+            logger.exception("❌ Error al obtener empleados")
             return jsonify({
                 'success': False,
                 'message': f'Error al obtener empleados: {str(e)}'
@@ -44,20 +64,15 @@ def get_calendar_data(year, month):
                 'message': 'No hay empleados registrados'
             })
         
-        # Obtener entradas del calendario para el mes
+        # Obtener entradas del calendario para el mes (cacheadas por mes)
         try:
-            start_date = date(year, month, 1)
-            end_date = date(year, month, cal.monthrange(year, month)[1])
-            
-            calendar_entries = CalendarEntry.query.filter(
-                CalendarEntry.date >= start_date,
-                CalendarEntry.date <= end_date
-            ).all()
+            month_entries = get_month_entries(year, month)
+            entries_count = sum(len(entries) for entries in month_entries.values())
             
-            print(f"📋 Entradas del calendario encontradas: {len(calendar_entries)}")
+            logger.debug("📋 Entradas del calendario encontradas: %d", entries_count)
             
         except Exception as e:
-            print(f"❌ Error al obtener entradas del calendario: {e}")
+            logger.exception("❌ Error al obtener entradas del calendario")
             return jsonify({
                 'success': False,
                 'message': f'Error al obtener entradas del calendario: {str(e)}'
@@ -69,17 +84,11 @@ def get_calendar_data(year, month):
             calendar_data[employee.id] = []
         
         # Agregar entradas del calendario
-        for entry in calendar_entries:
-            if entry.employee_id in calendar_data:
-                calendar_data[entry.employee_id].append({
-                    'id': entry.id,
-                    'date': entry.date.strftime('%Y-%m-%d'),
-                    'activity_type': entry.activity_type,
-                    'hours': entry.hours,
-                    'notes': entry.notes
-                })
+        for employee_id, entries in month_entries.items():
+            if employee_id in calendar_data:
+                calendar_data[employee_id] = list(entries)
         
-        print(f"✅ Datos del calendario organizados para {len(calendar_data)} empleados")
+        logger.debug("✅ Datos del calendario organizados para %d empleados", len(calendar_data))
         
         return jsonify({
             'success': True,
@@ -89,19 +98,20 @@ def get_calendar_data(year, month):
                 'month': month,
                 'days_in_month': cal.monthrange(year, month)[1],
                 'employees_count': len(employees),
-                'entries_count': len(calendar_entries)
+                'entries_count': entries_count
             }
         })
         
     except Exception as e:
-        print(f"❌ Error en get_calendar_data: {e}")
+        logger.exception("❌ Error en get_calendar_data")
         return jsonify({
             'success': False,
             'message': f'Error interno del servidor: {str(e)}'
         }), 500
 
 @calendar_bp.route('/calendar/entry', methods=['POST'])
-@auth_required('jwt')
+@query_budget(8)
+@auth_required('token')
 def create_calendar_entry():
     """Crear una nueva entrada en el calendario"""
     try:
@@ -139,6 +149,10 @@ def create_calendar_entry():
                 'message': 'Formato de fecha inválido. Use YYYY-MM-DD'
             }), 400
         
+        closed_error = _closed_month_error(entry_date)
+        if closed_error:
+            return closed_error
+        
         # Verificar si ya existe una entrada para ese día
         existing_entry = CalendarEntry.query.filter_by(
             employee_id=data['employee_id'],
@@ -153,6 +167,8 @@ def create_calendar_entry():
             existing_entry.updated_at = datetime.utcnow()
             
             db.session.commit()
+            hours_ledger.schedule([existing_entry.employee_id], entry_date, entry_date)
+            HoursCalculator.invalidate_cache(since=entry_date, employee_id=existing_entry.employee_id)
             
             return jsonify({
                 'success': True,
@@ -180,6 +196,8 @@ def create_calendar_entry():
             
             db.session.add(new_entry)
             db.session.commit()
+            hours_ledger.schedule([new_entry.employee_id], entry_date, entry_date)
+            HoursCalculator.invalidate_cache(since=entry_date, employee_id=new_entry.employee_id)
             
             return jsonify({
                 'success': True,
@@ -196,14 +214,15 @@ def create_calendar_entry():
             
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error al crear entrada del calendario: {e}")
+        logger.exception("❌ Error al crear entrada del calendario")
         return jsonify({
             'success': False,
             'message': f'Error interno del servidor: {str(e)}'
         }), 500
 
 @calendar_bp.route('/calendar/entry/<int:entry_id>', methods=['DELETE'])
-@auth_required('jwt')
+@query_budget(6)
+@auth_required('token')
 def delete_calendar_entry(entry_id):
     """Eliminar una entrada del calendario"""
     try:
@@ -215,8 +234,15 @@ def delete_calendar_entry(entry_id):
                 'message': 'Entrada no encontrada'
             }), 404
         
+        closed_error = _closed_month_error(entry.date)
+        if closed_error:
+            return closed_error
+        
+        employee_id, entry_date = entry.employee_id, entry.date
         db.session.delete(entry)
         db.session.commit()
+        hours_ledger.schedule([employee_id], entry_date, entry_date)
+        HoursCalculator.invalidate_cache(since=entry_date, employee_id=employee_id)
         
         return jsonify({
             'success': True,
@@ -225,14 +251,15 @@ def delete_calendar_entry(entry_id):
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error al eliminar entrada del calendario: {e}")
+        logger.exception("❌ Error al eliminar entrada del calendario")
         return jsonify({
             'success': False,
             'message': f'Error interno del servidor: {str(e)}'
         }), 500
 
 @calendar_bp.route('/calendar/employee/<int:employee_id>/<int:year>/<int:month>', methods=['GET'])
-@auth_required('jwt')
+@query_budget(5)
+@auth_required('token')
 def get_employee_calendar(employee_id, year, month):
     """Obtener calendario específico de un empleado"""
     try:
@@ -258,7 +285,7 @@ def get_employee_calendar(employee_id, year, month):
         for entry in entries:
             entries_data.append({
                 'id': entry.id,
-                'date': entry.date.strftime('%Y-%m-%d'),
+                'date': entry.date,
                 'activity_type': entry.activity_type,
                 'hours': entry.hours,
                 'notes': entry.notes
@@ -282,7 +309,7 @@ def get_employee_calendar(employee_id, year, month):
         })
         
     except Exception as e:
-        print(f"❌ Error al obtener calendario del empleado: {e}")
+        logger.exception("❌ Error al obtener calendario del empleado")
         return jsonify({
             'success': False,
             'message': f'Error interno del servidor: {str(e)}'
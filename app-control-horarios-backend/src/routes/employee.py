@@ -1,54 +1,130 @@
 from flask import Blueprint, request, jsonify
-from src.models.employee import db, Employee
-from datetime import datetime
+from src.models.employee import db, Employee, AutonomousCommunity
+from src.utils.hours_calculator import HoursCalculator
+from src.services.employee_stats import employee_stats
+from src.services.schedule_service import ScheduleService
+from src.services.hours_ledger import hours_ledger
+from src.utils.schedule_rules import SCHEDULE_PROFILES
+from src.utils.instrumentation import query_budget
+from datetime import datetime, date
 import re
+import json
+import base64
+from sqlalchemy.orm import joinedload
 from flask_security import auth_required, roles_required
 
 employee_bp = Blueprint('employee', __name__)
+schedule_service = ScheduleService()
+
+def _parse_effective_from(data):
+    """Fecha de efecto de un cambio de horario (hoy por defecto)"""
+    value = data.get('effective_from')
+    if not value:
+        return date.today()
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+def _contains_pattern(term):
+    """Patrón ILIKE de subcadena con los comodines del usuario escapados (usar escape='\\')"""
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+def _encode_cursor(employee):
+    """Cursor opaco con la clave de ordenación (equipo, nombre, id) del último empleado"""
+    payload = json.dumps([employee.team_name, employee.full_name, employee.id])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+def _decode_cursor(cursor):
+    team_name, full_name, employee_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    return team_name, full_name, int(employee_id)
 
 @employee_bp.route('/employees', methods=['GET'])
-@auth_required('jwt')
+@query_budget(5)
+@auth_required('token')
 def get_employees():
-    """Obtener todos los empleados con filtros opcionales"""
+    """
+    Obtener empleados con filtros opcionales.
+
+    Por defecto pagina por cursor (keyset): `cursor` y `per_page`, sin COUNT.
+    Si se indica `page` se mantiene la paginación clásica por OFFSET.
+    """
     try:
         # Parámetros de filtro opcionales
         team_name = request.args.get('team')
-        community = request.args.get('community')
-        page = request.args.get('page', 1, type=int)
+        community = request.args.get('community', type=int)
+        search = request.args.get('search')
+        page = request.args.get('page', type=int)
+        cursor = request.args.get('cursor')
         per_page = request.args.get('per_page', 50, type=int)
         
-        # Construir query base
-        query = Employee.query
+        # Construir query base cargando la comunidad en la misma consulta
+        query = Employee.query.options(joinedload(Employee.autonomous_community))
         
-        # Aplicar filtros
+        # Aplicar filtros (ILIKE servido por índices trigram en PostgreSQL)
         if team_name:
-            query = query.filter(Employee.team_name.ilike(f'%{team_name}%'))
+            query = query.filter(Employee.team_name.ilike(_contains_pattern(team_name), escape='\\'))
         if community:
-            query = query.filter(Employee.autonomous_community == community)
+            query = query.filter(Employee.autonomous_community_id == community)
+        if search:
+            pattern = _contains_pattern(search)
+            query = query.filter(db.or_(
+                Employee.full_name.ilike(pattern, escape='\\'),
+                Employee.team_name.ilike(pattern, escape='\\')
+            ))
         
-        # Ordenar por equipo y nombre
-        query = query.order_by(Employee.team_name, Employee.full_name)
+        # Ordenar por equipo y nombre (id como desempate para el cursor)
+        query = query.order_by(Employee.team_name, Employee.full_name, Employee.id)
         
         # Paginación
         if per_page > 100:
             per_page = 100  # Límite máximo
+        if per_page < 1:
+            per_page = 1
+        
+        if page:
+            employees = query.paginate(
+                page=page, 
+                per_page=per_page, 
+                error_out=False
+            )
+            
+            return jsonify({
+                'success': True,
+                'data': [emp.to_dict() for emp in employees.items],
+                'pagination': {
+                    'page': page,
+                    'per_page': per_page,
+                    'total': employees.total,
+                    'pages': employees.pages,
+                    'has_next': employees.has_next,
+                    'has_prev': employees.has_prev
+                }
+            })
+        
+        if cursor:
+            try:
+                last_key = _decode_cursor(cursor)
+            except (ValueError, TypeError):
+                return jsonify({
+                    'success': False,
+                    'message': 'Cursor inválido'
+                }), 400
+            query = query.filter(
+                db.tuple_(Employee.team_name, Employee.full_name, Employee.id) > last_key
+            )
         
-        employees = query.paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
-        )
+        # Pedir uno de más para saber si hay página siguiente sin COUNT
+        employees = query.limit(per_page + 1).all()
+        has_next = len(employees) > per_page
+        employees = employees[:per_page]
         
         return jsonify({
             'success': True,
-            'data': [emp.to_dict() for emp in employees.items],
+            'data': [emp.to_dict() for emp in employees],
             'pagination': {
-                'page': page,
                 'per_page': per_page,
-                'total': employees.total,
-                'pages': employees.pages,
-                'has_next': employees.has_next,
-                'has_prev': employees.has_prev
+                'has_next': has_next,
+                'has_prev': bool(cursor),
+                'next_cursor': _encode_cursor(employees[-1]) if has_next else None
             }
         })
         
@@ -59,7 +135,8 @@ def get_employees():
         }), 500
 
 @employee_bp.route('/employees/teams', methods=['GET'])
-@auth_required('jwt')
+@query_budget(3)
+@auth_required('token')
 def get_teams():
     """Obtener lista de equipos únicos"""
     try:
@@ -81,7 +158,8 @@ def get_teams():
         }), 500
 
 @employee_bp.route('/employees/<int:employee_id>', methods=['GET'])
-@auth_required('jwt')
+@query_budget(3)
+@auth_required('token')
 def get_employee(employee_id):
     """Obtener un empleado específico por ID"""
     try:
@@ -103,55 +181,51 @@ def get_employee(employee_id):
             'message': f'Error al obtener empleado: {str(e)}'
         }), 500
 
+REQUIRED_EMPLOYEE_FIELDS = ['team_name', 'full_name', 'hours_mon_thu', 'hours_fri',
+                            'vacation_days', 'free_hours', 'autonomous_community']
+
+def _validate_employee_data(data, partial=False):
+    """Valida los campos de un empleado; devuelve el mensaje de error o None"""
+    if not partial:
+        for field in REQUIRED_EMPLOYEE_FIELDS:
+            if field not in data or data[field] is None:
+                return f'Campo requerido faltante: {field}'
+    
+    if 'hours_mon_thu' in data and (not isinstance(data['hours_mon_thu'], (int, float)) or data['hours_mon_thu'] < 0):
+        return 'Las horas de lunes a jueves deben ser un número positivo'
+    
+    if 'hours_fri' in data and (not isinstance(data['hours_fri'], (int, float)) or data['hours_fri'] < 0):
+        return 'Las horas de viernes deben ser un número positivo'
+    
+    if 'vacation_days' in data and (not isinstance(data['vacation_days'], int) or data['vacation_days'] < 1):
+        return 'Los días de vacaciones deben ser un número entero positivo'
+    
+    if 'free_hours' in data and (not isinstance(data['free_hours'], int) or data['free_hours'] < 0):
+        return 'Las horas libres deben ser un número entero no negativo'
+    
+    # Validar formato del nombre
+    if 'full_name' in data and (not isinstance(data['full_name'], str) or len(data['full_name'].strip()) < 2):
+        return 'El nombre debe tener al menos 2 caracteres'
+    
+    if 'team_name' in data and not isinstance(data['team_name'], str):
+        return 'El equipo debe ser un texto'
+    
+    return None
+
 @employee_bp.route('/employees', methods=['POST'])
-@auth_required('jwt')
+@query_budget(6)
+@auth_required('token')
 @roles_required('admin')
 def create_employee():
     """Crear un nuevo empleado"""
     try:
         data = request.get_json()
         
-        # Validaciones básicas
-        required_fields = ['team_name', 'full_name', 'hours_mon_thu', 'hours_fri', 
-                          'vacation_days', 'free_hours', 'autonomous_community']
-        
-        for field in required_fields:
-            if field not in data or data[field] is None:
-                return jsonify({
-                    'success': False,
-                    'message': f'Campo requerido faltante: {field}'
-                }), 400
-        
-        # Validaciones específicas
-        if not isinstance(data['hours_mon_thu'], (int, float)) or data['hours_mon_thu'] < 0:
+        error = _validate_employee_data(data)
+        if error:
             return jsonify({
                 'success': False,
-                'message': 'Las horas de lunes a jueves deben ser un número positivo'
-            }), 400
-        
-        if not isinstance(data['hours_fri'], (int, float)) or data['hours_fri'] < 0:
-            return jsonify({
-                'success': False,
-                'message': 'Las horas de viernes deben ser un número positivo'
-            }), 400
-        
-        if not isinstance(data['vacation_days'], int) or data['vacation_days'] < 1:
-            return jsonify({
-                'success': False,
-                'message': 'Los días de vacaciones deben ser un número entero positivo'
-            }), 400
-        
-        if not isinstance(data['free_hours'], int) or data['free_hours'] < 0:
-            return jsonify({
-                'success': False,
-                'message': 'Las horas libres deben ser un número entero no negativo'
-            }), 400
-        
-        # Validar formato del nombre
-        if len(data['full_name'].strip()) < 2:
-            return jsonify({
-                'success': False,
-                'message': 'El nombre debe tener al menos 2 caracteres'
+                'message': error
             }), 400
         
         # Validar que no exista empleado con el mismo nombre
@@ -175,6 +249,9 @@ def create_employee():
         
         db.session.add(employee)
         db.session.commit()
+        hours_ledger.schedule([employee.id])
+        HoursCalculator.invalidate_cache()
+        employee_stats.apply(new=employee_stats.snapshot(employee))
         
         return jsonify({
             'success': True,
@@ -190,7 +267,8 @@ def create_employee():
         }), 500
 
 @employee_bp.route('/employees/<int:employee_id>', methods=['PUT'])
-@auth_required('jwt')
+@query_budget(12)
+@auth_required('token')
 @roles_required('admin')
 def update_employee(employee_id):
     """Actualizar un empleado existente"""
@@ -203,6 +281,25 @@ def update_employee(employee_id):
             }), 404
         
         data = request.get_json()
+        previous_stats = employee_stats.snapshot(employee)
+        
+        # Los cambios de jornada se historizan con fecha de efecto
+        new_hours_mon_thu = float(data.get('hours_mon_thu', employee.hours_mon_thu))
+        new_hours_fri = float(data.get('hours_fri', employee.hours_fri))
+        hours_changed = (new_hours_mon_thu, new_hours_fri) != (employee.hours_mon_thu, employee.hours_fri)
+        other_changes = any(
+            field in data and data[field] != getattr(employee, field)
+            for field in ('team_name', 'full_name', 'autonomous_community')
+        )
+        effective_from = None
+        if hours_changed:
+            try:
+                effective_from = _parse_effective_from(data)
+            except ValueError:
+                return jsonify({
+                    'success': False,
+                    'message': 'Formato de effective_from inválido. Use YYYY-MM-DD'
+                }), 400
         
         # Actualizar campos si están presentes
         if 'team_name' in data:
@@ -217,19 +314,26 @@ def update_employee(employee_id):
                         'message': 'Ya existe un empleado con ese nombre'
                     }), 400
             employee.full_name = data['full_name'].strip()
-        if 'hours_mon_thu' in data:
-            employee.hours_mon_thu = float(data['hours_mon_thu'])
-        if 'hours_fri' in data:
-            employee.hours_fri = float(data['hours_fri'])
         if 'vacation_days' in data:
             employee.vacation_days = int(data['vacation_days'])
         if 'free_hours' in data:
             employee.free_hours = int(data['free_hours'])
         if 'autonomous_community' in data:
             employee.autonomous_community = data['autonomous_community'].strip()
+        if hours_changed:
+            schedule_service.set_schedule(employee, effective_from, new_hours_mon_thu, new_hours_fri)
         
         employee.updated_at = datetime.utcnow()
         db.session.commit()
+        if other_changes:
+            hours_ledger.schedule([employee.id])
+            HoursCalculator.invalidate_cache()
+        else:
+            # Solo cambian los meses de este empleado desde la fecha de efecto
+            if hours_changed:
+                hours_ledger.schedule([employee.id], effective_from)
+            HoursCalculator.invalidate_cache(since=effective_from, employee_id=employee.id)
+        employee_stats.apply(old=previous_stats, new=employee_stats.snapshot(employee))
         
         return jsonify({
             'success': True,
@@ -244,8 +348,104 @@ def update_employee(employee_id):
             'message': f'Error al actualizar empleado: {str(e)}'
         }), 500
 
+@employee_bp.route('/employees/<int:employee_id>/schedules', methods=['GET'])
+@query_budget(3)
+@auth_required('token')
+def get_employee_schedules(employee_id):
+    """Obtener el histórico de horarios de un empleado"""
+    try:
+        employee = Employee.query.get(employee_id)
+        if not employee:
+            return jsonify({
+                'success': False,
+                'message': 'Empleado no encontrado'
+            }), 404
+        
+        schedules = schedule_service.get_schedules(employee_id)
+        
+        return jsonify({
+            'success': True,
+            'data': [schedule.to_dict() for schedule in schedules]
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error al obtener horarios: {str(e)}'
+        }), 500
+
+@employee_bp.route('/employees/<int:employee_id>/schedules', methods=['POST'])
+@query_budget(12)
+@auth_required('token')
+@roles_required('admin')
+def create_employee_schedule(employee_id):
+    """Registrar un horario con fecha de efecto para un empleado"""
+    try:
+        employee = Employee.query.get(employee_id)
+        if not employee:
+            return jsonify({
+                'success': False,
+                'message': 'Empleado no encontrado'
+            }), 404
+        
+        data = request.get_json() or {}
+        for field in ('effective_from', 'hours_mon_thu', 'hours_fri'):
+            if data.get(field) is None:
+                return jsonify({
+                    'success': False,
+                    'message': f'Campo requerido faltante: {field}'
+                }), 400
+        
+        error = _validate_employee_data(data, partial=True)
+        if error:
+            return jsonify({
+                'success': False,
+                'message': error
+            }), 400
+        
+        try:
+            effective_from = _parse_effective_from(data)
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'message': 'Formato de effective_from inválido. Use YYYY-MM-DD'
+            }), 400
+        
+        profile = data.get('profile')
+        if profile is not None and profile not in SCHEDULE_PROFILES:
+            return jsonify({
+                'success': False,
+                'message': f'Perfil de jornada desconocido: {profile}. Válidos: {", ".join(sorted(SCHEDULE_PROFILES))}'
+            }), 400
+        
+        # Sin 'profile' se mantiene el del tramo vigente; null vuelve al perfil por defecto
+        profile_option = {'profile': profile} if 'profile' in data else {}
+        previous_stats = employee_stats.snapshot(employee)
+        schedule = schedule_service.set_schedule(
+            employee, effective_from, float(data['hours_mon_thu']), float(data['hours_fri']),
+            **profile_option
+        )
+        db.session.commit()
+        hours_ledger.schedule([employee.id], effective_from)
+        HoursCalculator.invalidate_cache(since=effective_from, employee_id=employee.id)
+        employee_stats.apply(old=previous_stats, new=employee_stats.snapshot(employee))
+        
+        return jsonify({
+            'success': True,
+            'data': schedule.to_dict(),
+            'message': 'Horario registrado exitosamente'
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'Error al registrar horario: {str(e)}'
+        }), 500
+
 @employee_bp.route('/employees/<int:employee_id>', methods=['DELETE'])
-@auth_required('jwt')
+@query_budget(10)
+@auth_required('token')
 @roles_required('admin')
 def delete_employee(employee_id):
     """Eliminar un empleado"""
@@ -259,9 +459,13 @@ def delete_employee(employee_id):
         
         # Guardar información para respuesta
         employee_info = employee.to_dict()
+        previous_stats = employee_stats.snapshot(employee)
         
+        hours_ledger.delete_employee(employee.id)
         db.session.delete(employee)
         db.session.commit()
+        HoursCalculator.invalidate_cache()
+        employee_stats.apply(old=previous_stats)
         
         return jsonify({
             'success': True,
@@ -276,47 +480,177 @@ def delete_employee(employee_id):
             'message': f'Error al eliminar empleado: {str(e)}'
         }), 500
 
-@employee_bp.route('/employees/stats', methods=['GET'])
-@auth_required('jwt')
-def get_employee_stats():
-    """Obtener estadísticas generales de empleados"""
+MAX_BULK_EMPLOYEES = 5000
+
+@employee_bp.route('/employees/bulk', methods=['POST'])
+@query_budget(12)
+@auth_required('token')
+@roles_required('admin')
+def bulk_upsert_employees():
+    """
+    Crear o actualizar empleados en bloque.
+
+    Cada elemento con `id` actualiza ese empleado; sin `id` se busca por
+    `full_name` y se actualiza o se crea. Todo se valida en memoria, los
+    existentes se cargan con una única consulta IN y se guarda en una sola
+    transacción.
+    """
     try:
-        total_employees = Employee.query.count()
-        teams_count = db.session.query(Employee.team_name).distinct().count()
-        
-        # Estadísticas por comunidad autónoma
-        communities = db.session.query(
-            Employee.autonomous_community,
-            db.func.count(Employee.id).label('count')
-        ).group_by(Employee.autonomous_community).all()
-        
-        # Estadísticas por equipo
-        teams = db.session.query(
-            Employee.team_name,
-            db.func.count(Employee.id).label('count'),
-            db.func.avg(Employee.hours_mon_thu).label('avg_hours_mon_thu'),
-            db.func.avg(Employee.hours_fri).label('avg_hours_fri')
-        ).group_by(Employee.team_name).all()
+        data = request.get_json()
+        items = data.get('employees') if isinstance(data, dict) else data
+        if not isinstance(items, list) or not items:
+            return jsonify({
+                'success': False,
+                'message': 'Se requiere una lista de empleados'
+            }), 400
+        if len(items) > MAX_BULK_EMPLOYEES:
+            return jsonify({
+                'success': False,
+                'message': f'Máximo {MAX_BULK_EMPLOYEES} empleados por petición'
+            }), 400
+        
+        # Comunidades por nombre para aceptar tanto id como nombre
+        communities = {c.name: c.id for c in db.session.query(AutonomousCommunity.id, AutonomousCommunity.name)}
+        
+        # Validación en memoria
+        errors = []
+        seen_names = set()
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                errors.append({'index': index, 'message': 'Formato inválido'})
+                continue
+            if 'autonomous_community_id' in item and 'autonomous_community' not in item:
+                item['autonomous_community'] = item['autonomous_community_id']
+            error = _validate_employee_data(item, partial='id' in item)
+            if not error and 'autonomous_community' in item:
+                community = item['autonomous_community']
+                if isinstance(community, str):
+                    community = communities.get(community.strip())
+                if community not in communities.values():
+                    error = 'Comunidad autónoma no encontrada'
+                item['autonomous_community_id'] = community
+            if not error and 'full_name' in item:
+                name = item['full_name'].strip()
+                if name in seen_names:
+                    error = 'Nombre duplicado en la petición'
+                seen_names.add(name)
+            if error:
+                errors.append({'index': index, 'message': error})
+        
+        if errors:
+            return jsonify({
+                'success': False,
+                'message': 'Errores de validación',
+                'errors': errors
+            }), 400
+        
+        # Una sola consulta para empleados existentes (por id o por nombre)
+        ids = [item['id'] for item in items if 'id' in item]
+        existing = Employee.query.filter(db.or_(
+            Employee.id.in_(ids),
+            Employee.full_name.in_(seen_names)
+        )).all()
+        by_id = {emp.id: emp for emp in existing}
+        by_name = {emp.full_name: emp for emp in existing}
+        
+        created = []
+        updates = []
+        schedule_changes = []
+        now = datetime.utcnow()
+        for index, item in enumerate(items):
+            name = item['full_name'].strip() if 'full_name' in item else None
+            if 'id' in item:
+                employee = by_id.get(item['id'])
+                if not employee:
+                    errors.append({'index': index, 'message': 'Empleado no encontrado'})
+                    continue
+                owner = by_name.get(name)
+                if name and owner and owner.id != employee.id:
+                    errors.append({'index': index, 'message': 'Ya existe un empleado con ese nombre'})
+                    continue
+            else:
+                employee = by_name.get(name)
+            
+            values = {}
+            if 'team_name' in item:
+                values['team_name'] = item['team_name'].strip()
+            if name:
+                values['full_name'] = name
+            if 'hours_mon_thu' in item:
+                values['hours_mon_thu'] = float(item['hours_mon_thu'])
+            if 'hours_fri' in item:
+                values['hours_fri'] = float(item['hours_fri'])
+            if 'vacation_days' in item:
+                values['vacation_days'] = int(item['vacation_days'])
+            if 'free_hours' in item:
+                values['free_hours'] = int(item['free_hours'])
+            if 'autonomous_community_id' in item:
+                values['autonomous_community_id'] = item['autonomous_community_id']
+            
+            if employee is None:
+                created.append({'created_at': now, 'updated_at': now, **values})
+            else:
+                updates.append({'id': employee.id, 'updated_at': now, **values})
+                new_hours = (values.get('hours_mon_thu', employee.hours_mon_thu),
+                             values.get('hours_fri', employee.hours_fri))
+                if new_hours != (employee.hours_mon_thu, employee.hours_fri):
+                    schedule_changes.append((employee, new_hours))
+        
+        if errors:
+            db.session.rollback()
+            return jsonify({
+                'success': False,
+                'message': 'Errores de validación',
+                'errors': errors
+            }), 400
+        
+        # Escritura en una única transacción (un INSERT y un UPDATE multi-fila)
+        if created:
+            db.session.execute(db.insert(Employee), created)
+        if updates:
+            db.session.bulk_update_mappings(Employee, updates)
+        if schedule_changes:
+            # Historizar cambios de jornada (efecto hoy) cargando los tramos de una vez
+            schedules = schedule_service.get_schedules_by_employee([emp.id for emp, _ in schedule_changes])
+            for employee, (hours_mon_thu, hours_fri) in schedule_changes:
+                schedule_service.set_schedule(employee, now.date(), hours_mon_thu, hours_fri,
+                                              schedules=schedules[employee.id])
+        created_ids = []
+        if created:
+            created_ids = [row.id for row in db.session.query(Employee.id).filter(
+                Employee.full_name.in_([values['full_name'] for values in created])
+            )]
+        db.session.commit()
+        hours_ledger.schedule(created_ids + [values['id'] for values in updates])
+        HoursCalculator.invalidate_cache()
+        employee_stats.invalidate()
         
         return jsonify({
             'success': True,
             'data': {
-                'total_employees': total_employees,
-                'total_teams': teams_count,
-                'by_community': [
-                    {'community': comm[0], 'count': comm[1]} 
-                    for comm in communities
-                ],
-                'by_team': [
-                    {
-                        'team': team[0],
-                        'count': team[1],
-                        'avg_hours_mon_thu': round(float(team[2] or 0), 1),
-                        'avg_hours_fri': round(float(team[3] or 0), 1)
-                    }
-                    for team in teams
-                ]
-            }
+                'created': len(created),
+                'updated': len(updates),
+                'ids': created_ids + [values['id'] for values in updates]
+            },
+            'message': 'Empleados guardados exitosamente'
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'Error al guardar empleados: {str(e)}'
+        }), 500
+
+@employee_bp.route('/employees/stats', methods=['GET'])
+@query_budget(3)
+@auth_required('token')
+def get_employee_stats():
+    """Obtener estadísticas generales de empleados (desde el rollup en memoria)"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': employee_stats.get_stats()
         })
         
     except Exception as e:
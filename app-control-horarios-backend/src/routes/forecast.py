@@ -1,15 +1,36 @@
+import logging
 from flask import Blueprint, request, jsonify
 from src.models.employee import Employee, CalendarEntry, Holiday, db
 from src.utils.hours_calculator import HoursCalculator
+from src.services.month_close_service import MonthCloseService
+from src.utils.instrumentation import query_budget
+from src.utils.admission import concurrency_limit
+from src.utils.compression import mark_cache_compressed
 from datetime import datetime
 import calendar
-from flask_security import auth_required
+from flask_security import auth_required, roles_required, current_user
 
 forecast_bp = Blueprint('forecast', __name__)
+logger = logging.getLogger(__name__)
 calculator = HoursCalculator()
+month_close_service = MonthCloseService()
+
+def _closed_response(data):
+    """Respuesta servida desde la foto de un mes cerrado (inmutable: cacheable por ETag)"""
+    mark_cache_compressed()
+    return jsonify({
+        'success': True,
+        'data': data,
+        'closed': True
+    })
+
+def _current_user_email():
+    return getattr(current_user, 'email', None)
 
 @forecast_bp.route('/forecast/<int:year>/<int:month>', methods=['GET'])
-@auth_required('jwt')
+@query_budget(25)
+@concurrency_limit()
+@auth_required('token')
 def get_monthly_forecast(year, month):
     """Obtener forecast mensual para todos los empleados o uno específico"""
     try:
@@ -38,6 +59,10 @@ def get_monthly_forecast(year, month):
                     'message': 'Empleado no encontrado'
                 }), 404
             
+            snapshot = month_close_service.get_snapshot(year, month)
+            if snapshot and str(employee_id) in snapshot['employees']:
+                return _closed_response(snapshot['employees'][str(employee_id)])
+            
             forecast_data = calculator.calculate_employee_forecast(employee, year, month)
             if forecast_data:
                 return jsonify({
@@ -51,6 +76,10 @@ def get_monthly_forecast(year, month):
                 }), 500
         else:
             # Forecast de todos los equipos para Dashboard
+            snapshot = month_close_service.get_snapshot(year, month)
+            if snapshot:
+                return _closed_response(snapshot['dashboard'])
+            
             dashboard_data = calculator.calculate_dashboard_summary(year, month)
             if dashboard_data:
                 return jsonify({
@@ -65,7 +94,8 @@ def get_monthly_forecast(year, month):
         }), 500
 
 @forecast_bp.route('/forecast/employee/<int:employee_id>/<int:year>/<int:month>', methods=['GET'])
-@auth_required('jwt')
+@query_budget(15)
+@auth_required('token')
 def get_employee_forecast(employee_id, year, month):
     """Obtener forecast de un empleado específico"""
     try:
@@ -89,6 +119,10 @@ def get_employee_forecast(employee_id, year, month):
                 'message': 'Empleado no encontrado'
             }), 404
         
+        snapshot = month_close_service.get_snapshot(year, month)
+        if snapshot and str(employee_id) in snapshot['employees']:
+            return _closed_response(snapshot['employees'][str(employee_id)])
+        
         forecast_data = calculator.calculate_employee_forecast(employee, year, month)
         
         if forecast_data:
@@ -109,7 +143,9 @@ def get_employee_forecast(employee_id, year, month):
         }), 500
 
 @forecast_bp.route('/forecast/team/<string:team_name>/<int:year>/<int:month>', methods=['GET'])
-@auth_required('jwt')
+@query_budget(15)
+@concurrency_limit()
+@auth_required('token')
 def get_team_forecast(team_name, year, month):
     """Obtener forecast de un equipo específico"""
     try:
@@ -134,6 +170,12 @@ def get_team_forecast(team_name, year, month):
                 'message': 'Equipo no encontrado'
             }), 404
         
+        snapshot = month_close_service.get_snapshot(year, month)
+        if snapshot:
+            for team_data in snapshot['all_teams']['teams']:
+                if team_data['team_name'] == team_name:
+                    return _closed_response(team_data)
+        
         team_data = calculator.calculate_team_summary(team_name, year, month)
         
         if team_data:
@@ -154,7 +196,9 @@ def get_team_forecast(team_name, year, month):
         }), 500
 
 @forecast_bp.route('/forecast/monthly/<int:year>/<int:month>', methods=['GET'])
-@auth_required('jwt')
+@query_budget(25)
+@concurrency_limit()
+@auth_required('token')
 def get_monthly_summary(year, month):
     """Obtener resumen mensual de todos los equipos"""
     try:
@@ -171,6 +215,10 @@ def get_monthly_summary(year, month):
                 'message': 'Año inválido'
             }), 400
         
+        snapshot = month_close_service.get_snapshot(year, month)
+        if snapshot:
+            return _closed_response(snapshot['all_teams'])
+        
         all_teams_data = calculator.calculate_all_teams_summary(year, month)
         
         if all_teams_data:
@@ -191,7 +239,8 @@ def get_monthly_summary(year, month):
         }), 500
 
 @forecast_bp.route('/forecast/working-days/<int:year>/<int:month>', methods=['GET'])
-@auth_required('jwt')
+@query_budget(3)
+@auth_required('token')
 def get_working_days(year, month):
     """Obtener días laborables de un mes"""
     try:
@@ -227,7 +276,8 @@ def get_working_days(year, month):
         }), 500
 
 @forecast_bp.route('/forecast/indra-inditex/<int:employee_id>/<int:year>/<int:month>', methods=['GET'])
-@auth_required('jwt')
+@query_budget(12)
+@auth_required('token')
 def get_indra_inditex_hours(employee_id, year, month):
     """Obtener cálculo específico de horas INDRA e INDITEX"""
     try:
@@ -251,30 +301,57 @@ def get_indra_inditex_hours(employee_id, year, month):
                 'message': 'Empleado no encontrado'
             }), 404
         
-        # Calcular horas específicas
-        theoretical_hours = calculator.calculate_theoretical_hours(employee, year, month)
-        actual_hours = calculator.calculate_actual_hours(employee, year, month)
-        indra_hours = calculator.calculate_indra_hours(employee, year, month)
-        inditex_hours = calculator.calculate_inditex_hours(employee, year, month)
+        # Meses cerrados: las horas salen de la foto del cierre
+        snapshot = month_close_service.get_snapshot(year, month)
+        closed_forecast = snapshot['employees'].get(str(employee_id)) if snapshot else None
+        if closed_forecast:
+            hours = {name: closed_forecast[name]
+                     for name in ('theoretical_hours', 'actual_hours', 'indra_hours', 'inditex_hours')}
+        else:
+            # Calcular horas específicas
+            hours = {
+                'theoretical_hours': round(calculator.calculate_theoretical_hours(employee, year, month), 1),
+                'actual_hours': round(calculator.calculate_actual_hours(employee, year, month), 1),
+                'indra_hours': round(calculator.calculate_indra_hours(employee, year, month), 1),
+                'inditex_hours': round(calculator.calculate_inditex_hours(employee, year, month), 1)
+            }
         
+        data = {
+            'employee_id': employee_id,
+            'employee_name': employee.full_name,
+            'year': year,
+            'month': month,
+            **hours,
+            'indra_percentage': 60,
+            'inditex_percentage': 40,
+            'calculation_method': {
+                'indra': 'Día 1 al último del mes (60% de horas reales)',
+                'inditex': 'Día 26 del mes anterior al 25 del mes actual (40% de horas del período)'
+            }
+        }
+        if closed_forecast:
+            return _closed_response(data)
         return jsonify({
             'success': True,
-            'data': {
-                'employee_id': employee_id,
-                'employee_name': employee.full_name,
-                'year': year,
-                'month': month,
-                'theoretical_hours': round(theoretical_hours, 1),
-                'actual_hours': round(actual_hours, 1),
-                'indra_hours': round(indra_hours, 1),
-                'inditex_hours': round(inditex_hours, 1),
-                'indra_percentage': 60,
-                'inditex_percentage': 40,
-                'calculation_method': {
-                    'indra': 'Día 1 al último del mes (60% de horas reales)',
-                    'inditex': 'Día 26 del mes anterior al 25 del mes actual (40% de horas del período)'
-                }
-            }
+            'data': data
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error interno del servidor: {str(e)}'
+        }), 500
+
+@forecast_bp.route('/forecast/closures', methods=['GET'])
+@query_budget(2)
+@auth_required('token')
+def get_month_closures():
+    """Listar los cierres de mes (cerrados y reabiertos)"""
+    try:
+        closures = month_close_service.get_closures()
+        return jsonify({
+            'success': True,
+            'data': [closure.to_dict() for closure in closures]
         })
         
     except Exception as e:
@@ -283,3 +360,71 @@ def get_indra_inditex_hours(employee_id, year, month):
             'message': f'Error interno del servidor: {str(e)}'
         }), 500
 
+@forecast_bp.route('/forecast/close/<int:year>/<int:month>', methods=['POST'])
+@query_budget(30)
+@auth_required('token')
+@roles_required('admin')
+def close_month(year, month):
+    """Cerrar un mes: congela su forecast y bloquea cambios en sus entradas"""
+    try:
+        if not (1 <= month <= 12):
+            return jsonify({
+                'success': False,
+                'message': 'Mes inválido'
+            }), 400
+        
+        if not (2020 <= year <= 2030):
+            return jsonify({
+                'success': False,
+                'message': 'Año inválido'
+            }), 400
+        
+        if month_close_service.is_closed(year, month):
+            return jsonify({
+                'success': False,
+                'message': 'El mes ya está cerrado'
+            }), 409
+        
+        closure = month_close_service.close_month(year, month, closed_by=_current_user_email())
+        logger.info("🔒 Mes %d-%02d cerrado (%d bytes)", year, month, len(closure.snapshot))
+        
+        return jsonify({
+            'success': True,
+            'data': closure.to_dict(),
+            'message': 'Mes cerrado exitosamente'
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'Error al cerrar el mes: {str(e)}'
+        }), 500
+
+@forecast_bp.route('/forecast/reopen/<int:year>/<int:month>', methods=['POST'])
+@query_budget(4)
+@auth_required('token')
+@roles_required('admin')
+def reopen_month(year, month):
+    """Reabrir un mes cerrado para permitir correcciones"""
+    try:
+        closure = month_close_service.reopen_month(year, month, reopened_by=_current_user_email())
+        if closure is None:
+            return jsonify({
+                'success': False,
+                'message': 'El mes no está cerrado'
+            }), 404
+        logger.info("🔓 Mes %d-%02d reabierto", year, month)
+        
+        return jsonify({
+            'success': True,
+            'data': closure.to_dict(),
+            'message': 'Mes reabierto exitosamente'
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'Error al reabrir el mes: {str(e)}'
+        }), 500
@@ -1,15 +1,26 @@
+import logging
 from flask import Blueprint, request, jsonify # type: ignore
-from src.models.employee import db, Holiday, AutonomousCommunity, Province
+from src.models.employee import db, Holiday
 from src.services.holiday_service import HolidayService
+from src.services.holiday_generator import SpanishHolidayGenerator, upsert_holidays
+from src.services.holiday_index import get_holiday_index, weekdays_for_ordinals
+from src.services.reference_data import reference_response
+from src.utils.instrumentation import query_budget
+from src.utils.json_provider import stream_json_list
+from src.utils.compression import cache_compressed
 from datetime import datetime, date
 import calendar as cal
-from flask_security import auth_required # type: ignore
+from flask_security import auth_required, roles_required # type: ignore
 
 holiday_bp = Blueprint('holiday', __name__)
+logger = logging.getLogger(__name__)
 holiday_service = HolidayService()
+holiday_generator = SpanishHolidayGenerator()
 
 @holiday_bp.route('/holidays/<int:year>/<int:month>', methods=['GET'])
-@auth_required('jwt')
+@query_budget(3)
+@cache_compressed
+@auth_required('token')
 def get_holidays_by_month(year, month):
     """Obtener festivos de un mes específico"""
     try:
@@ -56,7 +67,7 @@ def get_holidays_by_month(year, month):
         for holiday in holidays:
             holidays_data.append({
                 'id': holiday.id,
-                'date': holiday.date.strftime('%Y-%m-%d'),
+                'date': holiday.date,
                 'name': holiday.name,
                 'autonomous_community': holiday.autonomous_community_id,
                 'province': holiday.province_id
@@ -68,14 +79,14 @@ def get_holidays_by_month(year, month):
         for day in range(1, days_in_month + 1):
             current_date = date(year, month, day)
             if current_date.weekday() >= 5:
-                weekend_days.append(current_date.strftime('%Y-%m-%d'))
+                weekend_days.append(current_date)
 
         # Calcular días laborables (sin festivos ni fines de semana)
-        holiday_dates = [h['date'] for h in holidays_data]
+        holiday_dates = {h['date'] for h in holidays_data}
         working_days = 0
         for day in range(1, days_in_month + 1):
             current_date = date(year, month, day)
-            if current_date.weekday() < 5 and current_date.strftime('%Y-%m-%d') not in holiday_dates:
+            if current_date.weekday() < 5 and current_date not in holiday_dates:
                 working_days += 1
 
         return jsonify({
@@ -95,11 +106,13 @@ def get_holidays_by_month(year, month):
         })
 
     except Exception as e:
-        print(f"Error en get_holidays_by_month: {e}")
+        logger.exception("Error en get_holidays_by_month")
         return jsonify({'success': False, 'message': f'Error al obtener festivos del mes: {str(e)}'}), 500
 
 @holiday_bp.route('/holidays/<int:year>', methods=['GET'])
-@auth_required('jwt')
+@query_budget(3)
+@cache_compressed
+@auth_required('token')
 def get_holidays_by_year(year):
     """Obtener todos los festivos de un año específico"""
     try:
@@ -115,7 +128,7 @@ def get_holidays_by_year(year):
         for holiday in holidays:
             holidays_data.append({
                 'id': holiday.id,
-                'date': holiday.date.strftime('%Y-%m-%d'),
+                'date': holiday.date,
                 'name': holiday.name,
                 'autonomous_community': holiday.autonomous_community_id,
                 'province': holiday.province_id
@@ -133,11 +146,13 @@ def get_holidays_by_year(year):
         })
 
     except Exception as e:
-        print(f"Error en get_holidays_by_year: {e}")
+        logger.exception("Error en get_holidays_by_year")
         return jsonify({'success': False, 'message': f'Error al obtener festivos del año: {str(e)}'}), 500
 
 @holiday_bp.route('/holidays/working-days/<int:year>/<int:month>', methods=['GET'])
-@auth_required('jwt')
+@query_budget(3)
+@cache_compressed
+@auth_required('token')
 def get_working_days(year, month):
     """Obtener días laborables de un mes"""
     try:
@@ -163,33 +178,38 @@ def get_working_days(year, month):
         })
 
     except Exception as e:
-        print(f"Error en get_working_days: {e}")
+        logger.exception("Error en get_working_days")
         return jsonify({'success': False, 'message': f'Error al calcular días laborables: {str(e)}'}), 500
 
 @holiday_bp.route('/holidays/communities', methods=['GET'])
-@auth_required('jwt')
+@query_budget(2)
+@cache_compressed
+@auth_required('token')
 def get_autonomous_communities():
     """Obtener lista de comunidades autónomas disponibles"""
     try:
-        communities = holiday_service.get_autonomous_communities()
-        
-        return jsonify({
-            'success': True,
-            'data': {
-                'communities': communities,
-                'total_communities': len(communities)
-            }
-        })
+        return reference_response('holiday_communities', private=True)
         
     except Exception as e:
-        print(f"Error en get_autonomous_communities: {e}")
+        logger.exception("Error en get_autonomous_communities")
         return jsonify({
             'success': False,
             'message': f'Error al obtener comunidades: {str(e)}'
         }), 500
 
+def _location_key(item):
+    """(comunidad, provincia) como enteros, igual que type=int en las rutas GET; None si no son numéricos"""
+    try:
+        return tuple(None if item.get(field) in (None, '') else int(item[field])
+                     for field in ('community', 'province'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+INVALID_LOCATION_MESSAGE = 'community y province deben ser identificadores numéricos'
+
 @holiday_bp.route('/holidays/check', methods=['POST'])
-@auth_required('jwt')
+@query_budget(3)
+@auth_required('token')
 def check_holiday():
     """Verificar si una fecha específica es festivo"""
     try:
@@ -202,8 +222,10 @@ def check_holiday():
         except ValueError:
             return jsonify({'success': False, 'message': 'Formato de fecha inválido. Use YYYY-MM-DD'}), 400
 
-        community_id = data.get('community')
-        province_id = data.get('province')
+        location = _location_key(data)
+        if location is None:
+            return jsonify({'success': False, 'message': INVALID_LOCATION_MESSAGE}), 400
+        community_id, province_id = location
 
         is_holiday = holiday_service.is_holiday(check_date, community_id, province_id)
 
@@ -225,30 +247,105 @@ def check_holiday():
         })
 
     except Exception as e:
-        print(f"Error en check_holiday: {e}")
+        logger.exception("Error en check_holiday")
         return jsonify({'success': False, 'message': f'Error al verificar festivo: {str(e)}'}), 500
 
+MAX_BATCH_CHECKS = 20000
+
+@holiday_bp.route('/holidays/check/batch', methods=['POST'])
+@query_budget(3)
+@auth_required('token')
+def check_holidays_batch():
+    """
+    Verificar muchas fechas de una vez.
+
+    Acepta `checks` (lista de {date, community, province}) y/o `ranges`
+    (lista de {start, end, community, province}). Responde desde el índice
+    de festivos en memoria, sin consultas por fecha.
+    """
+    try:
+        data = request.get_json()
+        if isinstance(data, list):
+            data = {'checks': data}
+        if not isinstance(data, dict) or not (data.get('checks') or data.get('ranges')):
+            return jsonify({'success': False, 'message': 'Se requiere una lista checks o ranges'}), 400
+
+        # Expandir peticiones a (ordinal, comunidad, provincia)
+        ordinals = []
+        keys = []
+        try:
+            for item in data.get('checks') or []:
+                key = _location_key(item)
+                if key is None:
+                    return jsonify({'success': False, 'message': INVALID_LOCATION_MESSAGE}), 400
+                ordinals.append(datetime.strptime(item['date'], '%Y-%m-%d').toordinal())
+                keys.append(key)
+            for item in data.get('ranges') or []:
+                start = datetime.strptime(item['start'], '%Y-%m-%d').toordinal()
+                end = datetime.strptime(item['end'], '%Y-%m-%d').toordinal()
+                if end < start:
+                    return jsonify({'success': False, 'message': 'Rango inválido: end es anterior a start'}), 400
+                if len(ordinals) + (end - start + 1) > MAX_BATCH_CHECKS:
+                    return jsonify({'success': False, 'message': f'Máximo {MAX_BATCH_CHECKS} fechas por petición'}), 400
+                key = _location_key(item)
+                if key is None:
+                    return jsonify({'success': False, 'message': INVALID_LOCATION_MESSAGE}), 400
+                ordinals.extend(range(start, end + 1))
+                keys.extend([key] * (end - start + 1))
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'success': False, 'message': 'Formato de fecha inválido. Use YYYY-MM-DD'}), 400
+
+        if len(ordinals) > MAX_BATCH_CHECKS:
+            return jsonify({'success': False, 'message': f'Máximo {MAX_BATCH_CHECKS} fechas por petición'}), 400
+
+        index = get_holiday_index()
+        weekdays = weekdays_for_ordinals(ordinals)
+        results = []
+        for ordinal, weekday, (community_id, province_id) in zip(ordinals, weekdays, keys):
+            is_holiday = ordinal in index.holiday_ordinals(community_id, province_id)
+            is_weekend = weekday >= 5
+            results.append({
+                'date': date.fromordinal(ordinal),
+                'community': community_id,
+                'province': province_id,
+                'is_holiday': is_holiday,
+                'is_weekend': is_weekend,
+                'is_working_day': not (is_holiday or is_weekend),
+                'weekday': weekday
+            })
+
+        return jsonify({
+            'success': True,
+            'data': results,
+            'count': len(results)
+        })
+
+    except Exception as e:
+        logger.exception("Error en check_holidays_batch")
+        return jsonify({'success': False, 'message': f'Error al verificar festivos: {str(e)}'}), 500
+
 # --- NUEVOS ENDPOINTS PARA GESTIÓN GENERAL DE FESTIVOS ---
 
 @holiday_bp.route('/holidays', methods=['GET'])
+@query_budget(3)
 def get_all_holidays():
-    """Obtener todos los festivos"""
+    """Obtener todos los festivos (respuesta en streaming)"""
     try:
-        holidays = Holiday.query.order_by(Holiday.date).all()
-        holidays_data = []
-        for holiday in holidays:
-            holidays_data.append({
-                'id': holiday.id,
-                'date': holiday.date.strftime('%Y-%m-%d'),
-                'name': holiday.name,
-                'autonomous_community': holiday.autonomous_community_id,
-                'province': holiday.province_id
-            })
-        return jsonify({'success': True, 'data': holidays_data})
+        holidays = db.session.query(
+            Holiday.id, Holiday.date, Holiday.name, Holiday.autonomous_community_id, Holiday.province_id
+        ).order_by(Holiday.date).all()
+        return stream_json_list(holidays, lambda holiday: {
+            'id': holiday.id,
+            'date': holiday.date,
+            'name': holiday.name,
+            'autonomous_community': holiday.autonomous_community_id,
+            'province': holiday.province_id
+        }, success=True)
     except Exception as e:
         return jsonify({'success': False, 'message': f'Error al obtener festivos: {str(e)}'}), 500
 
 @holiday_bp.route('/holidays', methods=['POST'])
+@query_budget(6)
 def create_holiday():
     """Crear un nuevo festivo"""
     try:
@@ -268,6 +365,7 @@ def create_holiday():
         )
         db.session.add(holiday)
         db.session.commit()
+        HolidayService.invalidate_holidays([(holiday.date, holiday.autonomous_community_id, holiday.province_id)])
         return jsonify({'success': True, 'data': {
             'id': holiday.id,
             'date': holiday.date.strftime('%Y-%m-%d'),
@@ -280,48 +378,181 @@ def create_holiday():
         return jsonify({'success': False, 'message': f'Error al crear festivo: {str(e)}'}), 500
 
 @holiday_bp.route('/holidays/<int:holiday_id>', methods=['DELETE'])
+@query_budget(6)
 def delete_holiday(holiday_id):
     """Eliminar un festivo por ID"""
     try:
         holiday = Holiday.query.get(holiday_id)
         if not holiday:
             return jsonify({'success': False, 'message': 'Festivo no encontrado'}), 404
+        change = (holiday.date, holiday.autonomous_community_id, holiday.province_id)
         db.session.delete(holiday)
         db.session.commit()
+        HolidayService.invalidate_holidays([change])
         return jsonify({'success': True, 'message': 'Festivo eliminado'})
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': f'Error al eliminar festivo: {str(e)}'}), 500
 
-# ENDPOINTS PARA COMUNIDADES Y PROVINCIAS (mejorados)
+@holiday_bp.route('/holidays/sync/<int:year>', methods=['POST'])
+@query_budget(8)
+@auth_required('token')
+@roles_required('admin')
+def sync_holidays(year):
+    """Generar y guardar los festivos nacionales y autonómicos de un año"""
+    try:
+        if not (2020 <= year <= 2030):
+            return jsonify({'success': False, 'message': 'Año inválido. Debe estar entre 2020 y 2030'}), 400
+
+        result = holiday_generator.sync_year(year)
+
+        return jsonify({
+            'success': True,
+            'data': {'year': year, **result},
+            'message': f'Festivos de {year} sincronizados'
+        })
+    except Exception as e:
+        logger.exception("Error en sync_holidays")
+        return jsonify({'success': False, 'message': f'Error al sincronizar festivos: {str(e)}'}), 500
+
+@holiday_bp.route('/holidays/bulk', methods=['POST'])
+@query_budget(6)
+@auth_required('token')
+@roles_required('admin')
+def create_bulk_holidays():
+    """Crear o actualizar varios festivos en una sola operación"""
+    try:
+        data = request.get_json()
+        items = data.get('holidays') if isinstance(data, dict) else data
+        if not isinstance(items, list) or not items:
+            return jsonify({'success': False, 'message': 'Se requiere una lista de festivos'}), 400
+
+        rows = []
+        for index, item in enumerate(items):
+            date_str = item.get('date')
+            name = item.get('name')
+            if not date_str or not name:
+                return jsonify({'success': False, 'message': f'Faltan campos obligatorios en el festivo {index}'}), 400
+            try:
+                date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
+            except ValueError:
+                return jsonify({'success': False, 'message': f'Formato de fecha inválido en el festivo {index}. Use YYYY-MM-DD'}), 400
+            community = item.get('autonomous_community')
+            province = item.get('province')
+            rows.append({
+                'date': date_obj,
+                'name': name,
+                'autonomous_community_id': None if not community or community == 'Nacional' else int(community),
+                'province_id': None if not province else int(province)
+            })
+
+        result = upsert_holidays(rows)
+
+        return jsonify({'success': True, 'data': result})
+    except Exception as e:
+        logger.exception("Error en create_bulk_holidays")
+        return jsonify({'success': False, 'message': f'Error al crear festivos: {str(e)}'}), 500
+
+@holiday_bp.route('/workdays/add', methods=['GET'])
+@query_budget(3)
+@auth_required('token')
+def add_workdays():
+    """Calcular la fecha en la que termina un periodo de N días laborables"""
+    try:
+        start_str = request.args.get('start')
+        days = request.args.get('days', type=int)
+        community_id = request.args.get('community', type=int)
+        province_id = request.args.get('province', type=int)
+        if not start_str or days is None:
+            return jsonify({'success': False, 'message': 'Se requieren los parámetros start y days'}), 400
+
+        try:
+            start_date = datetime.strptime(start_str, '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Formato de fecha inválido. Use YYYY-MM-DD'}), 400
+
+        try:
+            end_date = holiday_service.add_working_days(start_date, days, community_id, province_id)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'start': start_date.isoformat(),
+                'days': days,
+                'end': end_date.isoformat(),
+                'community': community_id,
+                'province': province_id
+            }
+        })
+
+    except Exception as e:
+        logger.exception("Error en add_workdays")
+        return jsonify({'success': False, 'message': f'Error al calcular días laborables: {str(e)}'}), 500
+
+@holiday_bp.route('/workdays/between', methods=['GET'])
+@query_budget(3)
+@auth_required('token')
+def count_workdays_between():
+    """Contar los días laborables entre dos fechas (ambas incluidas)"""
+    try:
+        start_str = request.args.get('start')
+        end_str = request.args.get('end')
+        community_id = request.args.get('community', type=int)
+        province_id = request.args.get('province', type=int)
+        if not start_str or not end_str:
+            return jsonify({'success': False, 'message': 'Se requieren los parámetros start y end'}), 400
+
+        try:
+            start_date = datetime.strptime(start_str, '%Y-%m-%d').date()
+            end_date = datetime.strptime(end_str, '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Formato de fecha inválido. Use YYYY-MM-DD'}), 400
+
+        try:
+            working_days = holiday_service.count_working_days(start_date, end_date, community_id, province_id)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'start': start_date.isoformat(),
+                'end': end_date.isoformat(),
+                'working_days': working_days,
+                'calendar_days': (end_date - start_date).days + 1,
+                'community': community_id,
+                'province': province_id
+            }
+        })
+
+    except Exception as e:
+        logger.exception("Error en count_workdays_between")
+        return jsonify({'success': False, 'message': f'Error al calcular días laborables: {str(e)}'}), 500
+
+# ENDPOINTS PARA COMUNIDADES Y PROVINCIAS (servidos desde los datos de referencia precargados)
 @holiday_bp.route('/autonomous_communities', methods=['GET'])
+@query_budget(2)
+@cache_compressed
 def get_communities():
     """
     Devuelve la lista de comunidades autónomas ordenadas por nombre.
     """
     try:
-        communities = AutonomousCommunity.query.order_by(AutonomousCommunity.name).all()
-        data = [{'id': c.id, 'name': c.name} for c in communities]
-        return jsonify(data)
+        return reference_response('autonomous_communities')
     except Exception as e:
         return jsonify({'success': False, 'message': f'Error al obtener comunidades: {str(e)}'}), 500
 
 @holiday_bp.route('/provinces', methods=['GET'])
+@query_budget(2)
+@cache_compressed
 def get_provinces():
     """
     Devuelve la lista de provincias ordenadas por nombre, incluyendo el id de la comunidad autónoma.
     """
     try:
-        provinces = Province.query.order_by(Province.name).all()
-        data = [
-            {
-                'id': p.id,
-                'name': p.name,
-                'autonomous_community_id': p.autonomous_community_id
-            }
-            for p in provinces
-        ]
-        return jsonify(data)
+        return reference_response('provinces')
     except Exception as e:
         return jsonify({'success': False, 'message': f'Error al obtener provincias: {str(e)}'}), 500
 
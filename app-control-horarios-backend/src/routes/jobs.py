@@ -0,0 +1,115 @@
+import logging
+import zlib
+from flask import Blueprint, request, jsonify, current_app, url_for
+from src.models.employee import db, Job
+from src.services.job_runner import job_runner, JOB_KINDS
+from src.utils.instrumentation import query_budget
+from src.utils.compression import mark_cache_compressed
+from flask_security import auth_required, current_user
+
+jobs_bp = Blueprint('jobs', __name__)
+logger = logging.getLogger(__name__)
+
+def _current_user_email():
+    return getattr(current_user, 'email', None)
+
+def _visible_job(job_id):
+    """Trabajo si existe y lo puede ver el usuario actual (su autor o un admin)"""
+    job = db.session.get(Job, job_id)
+    if job is None:
+        return None
+    if job.created_by != _current_user_email() and not current_user.has_role('admin'):
+        return None
+    return job
+
+@jobs_bp.route('/jobs/<string:kind>', methods=['POST'])
+@query_budget(3)
+@auth_required('token')
+def create_job(kind):
+    """Encolar un trabajo pesado; responde 202 con el trabajo para consultar su estado"""
+    try:
+        job_kind = JOB_KINDS.get(kind)
+        if job_kind is None:
+            return jsonify({
+                'success': False,
+                'message': f'Tipo de trabajo desconocido. Disponibles: {", ".join(sorted(JOB_KINDS))}'
+            }), 404
+
+        if job_kind.admin_only and not current_user.has_role('admin'):
+            return jsonify({
+                'success': False,
+                'message': 'Este trabajo requiere permisos de administrador'
+            }), 403
+
+        try:
+            params = job_kind.parse(request.get_json(silent=True) or {})
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+
+        job = job_runner.submit(kind, params, created_by=_current_user_email())
+        logger.info("📥 Trabajo %s encolado", kind, extra={'job_id': job.id})
+
+        response = jsonify({
+            'success': True,
+            'data': job.to_dict(),
+            'message': 'Trabajo encolado'
+        })
+        response.status_code = 202
+        response.headers['Location'] = url_for('jobs.get_job', job_id=job.id)
+        return response
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'Error al encolar el trabajo: {str(e)}'
+        }), 500
+
+@jobs_bp.route('/jobs/<string:job_id>', methods=['GET'])
+@query_budget(2)
+@auth_required('token')
+def get_job(job_id):
+    """Estado y progreso de un trabajo"""
+    job = _visible_job(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'message': 'Trabajo no encontrado'
+        }), 404
+
+    data = job.to_dict()
+    if job.status == 'succeeded':
+        data['result_url'] = url_for('jobs.get_job_result', job_id=job.id)
+    return jsonify({
+        'success': True,
+        'data': data
+    })
+
+@jobs_bp.route('/jobs/<string:job_id>/result', methods=['GET'])
+@query_budget(3)
+@auth_required('token')
+def get_job_result(job_id):
+    """Descargar el resultado de un trabajo terminado (JSON o fichero)"""
+    job = _visible_job(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'message': 'Trabajo no encontrado'
+        }), 404
+
+    if job.status != 'succeeded':
+        return jsonify({
+            'success': False,
+            'message': f'El trabajo no ha terminado (estado: {job.status})',
+            'data': job.to_dict()
+        }), 409
+
+    # El resultado no cambia: ETag, 304 y cuerpo comprimido reutilizable
+    mark_cache_compressed()
+    response = current_app.response_class(zlib.decompress(job.result), mimetype=job.result_content_type)
+    if job.result_content_type != 'application/json':
+        response.headers['Content-Disposition'] = f'attachment; filename="{job.result_filename}"'
+    return response
@@ -0,0 +1,45 @@
+import logging
+from flask import Blueprint, jsonify
+from src.services.reference_data import reference_response, invalidate_reference, get_reference
+from src.utils.instrumentation import query_budget
+from src.utils.compression import cache_compressed
+from flask_security import auth_required, roles_required
+
+reference_bp = Blueprint('reference', __name__)
+logger = logging.getLogger(__name__)
+
+@reference_bp.route('/reference', methods=['GET'])
+@query_budget(2)
+@cache_compressed
+@auth_required('token')
+def get_reference_bundle():
+    """Todos los datos de referencia en una petición: comunidades, provincias y tipos de actividad"""
+    try:
+        return reference_response('bundle', private=True)
+    except Exception as e:
+        logger.exception("Error en get_reference_bundle")
+        return jsonify({
+            'success': False,
+            'message': f'Error al obtener los datos de referencia: {str(e)}'
+        }), 500
+
+@reference_bp.route('/reference/reload', methods=['POST'])
+@query_budget(2)
+@auth_required('token')
+@roles_required('admin')
+def reload_reference():
+    """Recargar los datos de referencia tras cambios hechos fuera de la API (SQL, scripts)"""
+    try:
+        invalidate_reference()
+        snapshot = get_reference()
+        return jsonify({
+            'success': True,
+            'data': {'version': snapshot.version},
+            'message': 'Datos de referencia recargados'
+        })
+    except Exception as e:
+        logger.exception("Error en reload_reference")
+        return jsonify({
+            'success': False,
+            'message': f'Error al recargar los datos de referencia: {str(e)}'
+        }), 500
@@ -0,0 +1,207 @@
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import date, datetime, timedelta
+import click
+from flask.cli import with_appcontext
+from src.models.employee import db, AutonomousCommunity
+from src.utils.admission import admission, BACKGROUND
+from src.utils.cache_backend import try_lock
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin candado entre procesos locales
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CACHE_WARMUP_ENABLED = os.getenv('CACHE_WARMUP_ENABLED', 'true').lower() == 'true'
+# Segundos tras el arranque antes del primer calentamiento (deja arrancar al servidor)
+CACHE_WARMUP_DELAY = float(os.getenv('CACHE_WARMUP_DELAY', '5'))
+# Días en los que se recalienta poco después de medianoche: 1 (cambio de mes) y 26 (período INDITEX)
+WARMUP_DAYS = (1, 26)
+WARMUP_AFTER_MIDNIGHT = timedelta(minutes=5)
+# Vida del candado que elige al worker que calienta (los demás se saltan esa ronda)
+CACHE_WARMUP_LOCK_TTL = int(os.getenv('CACHE_WARMUP_LOCK_TTL', '900'))
+# Espera máxima a que el libro de horas no tenga regeneraciones pendientes
+CACHE_WARMUP_LEDGER_WAIT = float(os.getenv('CACHE_WARMUP_LEDGER_WAIT', '600'))
+CACHE_WARMUP_POLL = 5.0
+
+
+def warmup_months(today=None):
+    """(año, mes) del mes anterior, el actual y el siguiente"""
+    today = today or date.today()
+    current = today.year * 12 + today.month - 1
+    return [(value // 12, value % 12 + 1) for value in (current - 1, current, current + 1)]
+
+
+def next_run(now):
+    """Siguiente momento programado (WARMUP_DAYS a las 00:05) posterior a `now`"""
+    day = now.date()
+    for _ in range(62):
+        if day.day in WARMUP_DAYS:
+            moment = datetime.combine(day, datetime.min.time()) + WARMUP_AFTER_MIDNIGHT
+            if moment > now:
+                return moment
+        day += timedelta(days=1)
+    raise RuntimeError('Sin fecha de calentamiento')  # inalcanzable con WARMUP_DAYS válidos
+
+
+class CacheWarmup:
+    """
+    Precalcula las cachés en proceso del forecast y de festivos.
+
+    Se calienta al arrancar (tras un despliegue) y poco después de medianoche
+    los días 1 y 26, cuando cambian los meses que abre todo el mundo, y
+    siempre después de que el libro de horas termine sus regeneraciones
+    pendientes (si no, se calcularía en memoria y se leería un libro a medio
+    escribir). Con CACHE_BACKEND compartido calienta un solo worker, elegido
+    con un candado en el almacén, y los demás leen sus resultados; solo en
+    memoria cada worker calienta su LRU, de uno en uno. Se calculan el Dashboard, los
+    resúmenes de equipos con el forecast de cada empleado, las entradas del
+    calendario y los índices de festivos para el mes anterior, el actual y el
+    siguiente; los meses cerrados solo cargan su foto.
+    """
+
+    def __init__(self):
+        self._app = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.last_run = None  # resultado del último calentamiento
+
+    def init_app(self, app):
+        self._app = app
+        app.cli.add_command(warm_cache_command)
+        # Los procesos de trabajos en segundo plano (job_runner) no sirven peticiones
+        if not CACHE_WARMUP_ENABLED or multiprocessing.parent_process() is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='cache-warmup', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        if self._stop.wait(CACHE_WARMUP_DELAY):
+            return
+        self._warm_safely()
+        while True:
+            delay = (next_run(datetime.now()) - datetime.now()).total_seconds()
+            if self._stop.wait(max(delay, 0)):
+                return
+            self._warm_safely()
+
+    def _warm_safely(self):
+        try:
+            with self._app.app_context():
+                if not self._wait_for_ledger():
+                    return
+                elected = try_lock('cache-warmup', CACHE_WARMUP_LOCK_TTL)
+                if elected is False:
+                    logger.info("🔥 Otro worker calienta las cachés")
+                    return
+                with _serialized() if elected is None else nullcontext():
+                    self.warm()
+        except Exception:
+            logger.exception("❌ Error calentando las cachés")
+
+    def _wait_for_ledger(self):
+        """Esperar a que el libro de horas esté al día; False si se para el hilo"""
+        from src.services.hours_ledger import hours_ledger
+
+        deadline = time.monotonic() + CACHE_WARMUP_LEDGER_WAIT
+        while True:
+            idle = hours_ledger.is_idle()
+            db.session.remove()
+            if idle:
+                return True
+            if time.monotonic() >= deadline:
+                logger.warning("⚠️ El libro de horas sigue con regeneraciones pendientes: se calienta igualmente")
+                return True
+            if self._stop.wait(CACHE_WARMUP_POLL):
+                return False
+
+    def warm(self, today=None):
+        """Calentar las cachés para los meses alrededor de `today` (requiere contexto de aplicación)"""
+        from src.utils.hours_calculator import HoursCalculator
+        from src.services.holiday_service import HolidayService
+        from src.services.holiday_index import get_holiday_index, get_working_day_calendar
+        from src.services.month_close_service import MonthCloseService
+        from src.services.calendar_cache import get_month_entries
+
+        with self._lock:
+            started = time.perf_counter()
+            calculator = HoursCalculator()
+            holiday_service = HolidayService()
+            month_close_service = MonthCloseService()
+            timings = {}
+
+            # Cada parte ocupa un hueco de admisión en segundo plano y devuelve la conexión al terminar
+            part_started = time.perf_counter()
+            with admission.slot(BACKGROUND, 'cache-warmup'):
+                community_ids = [community_id for (community_id,) in db.session.query(AutonomousCommunity.id)]
+                get_holiday_index()
+                for community_id in [None] + community_ids:
+                    get_working_day_calendar(community_id)
+                db.session.remove()
+            timings['holiday_index'] = time.perf_counter() - part_started
+
+            for year, month in warmup_months(today):
+                part_started = time.perf_counter()
+                with admission.slot(BACKGROUND, 'cache-warmup'):
+                    for community_id in [None] + community_ids:
+                        holiday_service.get_working_days_in_month(year, month, community_id)
+                    get_month_entries(year, month)
+                    if month_close_service.is_closed(year, month):
+                        month_close_service.get_snapshot(year, month)
+                    else:
+                        calculator.calculate_dashboard_summary(year, month)
+                        # Incluye el resumen de cada equipo y el forecast de cada empleado
+                        calculator.calculate_all_teams_summary(year, month)
+                    db.session.remove()  # libera las entradas cargadas del mes
+                timings[f'{year}-{month:02d}'] = time.perf_counter() - part_started
+
+            elapsed = time.perf_counter() - started
+            self.last_run = {
+                'finished_at': datetime.utcnow().isoformat(),
+                'seconds': round(elapsed, 3),
+                'timings': {name: round(seconds, 3) for name, seconds in timings.items()}
+            }
+            logger.info("🔥 Cachés calentadas en %.1fs", elapsed, extra={'timings': self.last_run['timings']})
+            return self.last_run
+
+
+@contextmanager
+def _serialized():
+    """Sin almacén compartido: los workers de la máquina calientan de uno en uno"""
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(tempfile.gettempdir(), 'control_horarios_warmup.lock'), 'w') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+cache_warmup = CacheWarmup()
+
+
+@click.command('warm-cache')
+@click.option('--date', 'reference', default=None, help='Fecha de referencia YYYY-MM-DD (hoy por defecto)')
+@with_appcontext
+def warm_cache_command(reference):
+    """Calentar ahora las cachés de forecast y festivos (mes anterior, actual y siguiente)"""
+    # Un comando de consola calienta solo su propio proceso: no hace falta el hilo programado
+    cache_warmup.stop()
+    today = date.fromisoformat(reference) if reference else None
+    result = cache_warmup.warm(today)
+    click.echo(f"🔥 Cachés calentadas en {result['seconds']:.1f}s")
+    for name, seconds in result['timings'].items():
+        click.echo(f"   {name}: {seconds:.2f}s")
@@ -0,0 +1,64 @@
+import calendar as cal
+from datetime import date
+from itertools import chain
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from src.models.employee import db, CalendarEntry
+from src.utils.cache_backend import get_cache
+
+# Entradas de calendario por mes: ('month', año, mes) -> {employee_id: [entrada, ...]}
+calendar_cache = get_cache('calendar')
+
+
+def get_month_entries(year, month):
+    """Entradas del mes agrupadas por empleado (cacheadas hasta que cambie alguna)"""
+    return calendar_cache.get_or_compute(('month', year, month), lambda: _load_month(year, month))
+
+
+def _load_month(year, month):
+    start_date = date(year, month, 1)
+    end_date = date(year, month, cal.monthrange(year, month)[1])
+    rows = db.session.query(
+        CalendarEntry.id, CalendarEntry.employee_id, CalendarEntry.date,
+        CalendarEntry.activity_type, CalendarEntry.hours, CalendarEntry.notes
+    ).filter(
+        CalendarEntry.date >= start_date,
+        CalendarEntry.date <= end_date
+    ).order_by(CalendarEntry.date, CalendarEntry.id)
+
+    entries = {}
+    for row in rows:
+        entries.setdefault(row.employee_id, []).append({
+            'id': row.id,
+            'date': row.date,
+            'activity_type': row.activity_type,
+            'hours': row.hours,
+            'notes': row.notes
+        })
+    return entries
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_months(session, flush_context):
+    """Meses con entradas creadas, modificadas o borradas (también el de la fecha anterior si cambia)"""
+    months = None
+    for instance in chain(session.new, session.dirty, session.deleted):
+        if isinstance(instance, CalendarEntry):
+            if months is None:
+                months = session.info.setdefault('_calendar_months', set())
+            history = db.inspect(instance).attrs.date.history
+            for value in chain(history.added or (), history.deleted or (), history.unchanged or ()):
+                if value is not None:
+                    months.add((value.year, value.month))
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_changed_months(session):
+    # Tras el commit: invalidar antes dejaría que otra petición volviera a cachear datos viejos
+    for year, month in session.info.pop('_calendar_months', ()):
+        calendar_cache.pop(('month', year, month), None)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changed_months(session):
+    session.info.pop('_calendar_months', None)
@@ -0,0 +1,127 @@
+import os
+import threading
+import time
+from src.models.employee import db, Employee, AutonomousCommunity
+from src.utils.cache_backend import get_cache
+
+# Segundos máximos que se sirve un agregado sin recargarlo (red de seguridad sin almacén compartido)
+EMPLOYEE_STATS_MAX_AGE = float(os.getenv('EMPLOYEE_STATS_MAX_AGE', '300'))
+
+
+class EmployeeStatsRollup:
+    """
+    Estadísticas de empleados agregadas en memoria.
+
+    Se carga con una única consulta agrupada por (comunidad, equipo) y después
+    se mantiene con los altas, cambios y bajas de empleados, de modo que el
+    endpoint de estadísticas no recorre la tabla en cada llamada. Cada cambio
+    incrementa la generación compartida de la caché 'employee_stats': el
+    worker que lo sirve aplica el delta y el resto recarga en la siguiente
+    lectura. Sin almacén compartido, EMPLOYEE_STATS_MAX_AGE acota cuánto
+    tiempo puede servir otro worker un agregado viejo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 'rollup' -> (cargado en, {(community_id, team_name): [count, sum_mon_thu, sum_fri]}, nombres)
+        self._cache = get_cache('employee_stats', share_values=False)
+
+    def _load(self):
+        rows = db.session.query(
+            Employee.autonomous_community_id,
+            AutonomousCommunity.name,
+            Employee.team_name,
+            db.func.count(Employee.id),
+            db.func.sum(Employee.hours_mon_thu),
+            db.func.sum(Employee.hours_fri)
+        ).outerjoin(
+            AutonomousCommunity, AutonomousCommunity.id == Employee.autonomous_community_id
+        ).group_by(
+            Employee.autonomous_community_id, AutonomousCommunity.name, Employee.team_name
+        ).all()
+
+        groups = {}
+        community_names = {}
+        for community_id, community_name, team_name, count, sum_mon_thu, sum_fri in rows:
+            groups[(community_id, team_name)] = [count, float(sum_mon_thu or 0), float(sum_fri or 0)]
+            community_names[community_id] = community_name
+        return time.monotonic(), groups, community_names
+
+    def invalidate(self):
+        """Forzar la recarga en la siguiente consulta en todos los workers (p. ej. tras cargas masivas)"""
+        with self._lock:
+            self._cache.pop('rollup')
+
+    @staticmethod
+    def snapshot(employee):
+        """Valores de un empleado relevantes para las estadísticas"""
+        return (employee.autonomous_community_id, employee.team_name,
+                employee.hours_mon_thu or 0, employee.hours_fri or 0)
+
+    def apply(self, old=None, new=None):
+        """Aplicar un cambio: old/new son snapshot() antes y después (None en alta/baja)"""
+        with self._lock:
+            # pop invalida el agregado de los demás workers aunque este no lo tenga cargado
+            rollup = self._cache.pop('rollup')
+            if rollup is None:
+                return
+            loaded_at, groups, community_names = rollup
+            if new is not None and new[0] not in community_names:
+                # Comunidad desconocida para el rollup: recargar en la próxima lectura
+                return
+            for values, sign in ((old, -1), (new, 1)):
+                if values is None:
+                    continue
+                community_id, team_name, hours_mon_thu, hours_fri = values
+                group = groups.setdefault((community_id, team_name), [0, 0.0, 0.0])
+                group[0] += sign
+                group[1] += sign * hours_mon_thu
+                group[2] += sign * hours_fri
+                if group[0] <= 0:
+                    del groups[(community_id, team_name)]
+            self._cache.set('rollup', rollup)
+
+    def get_stats(self):
+        with self._lock:
+            rollup = self._cache.get_or_compute('rollup', self._load)
+            if time.monotonic() - rollup[0] > EMPLOYEE_STATS_MAX_AGE:
+                # Caducado solo en este worker: se recarga sin invalidar a los demás
+                rollup = self._load()
+                self._cache.set('rollup', rollup)
+            _, groups, community_names = rollup
+            groups = dict(groups)
+            community_names = dict(community_names)
+
+        by_community = {}
+        by_team = {}
+        for (community_id, team_name), (count, sum_mon_thu, sum_fri) in groups.items():
+            by_community[community_id] = by_community.get(community_id, 0) + count
+            team = by_team.setdefault(team_name, [0, 0.0, 0.0])
+            team[0] += count
+            team[1] += sum_mon_thu
+            team[2] += sum_fri
+
+        return {
+            'total_employees': sum(by_community.values()),
+            'total_teams': len(by_team),
+            'by_community': [
+                {
+                    'community_id': community_id,
+                    'community': community_names.get(community_id),
+                    'count': count
+                }
+                for community_id, count in sorted(by_community.items(), key=lambda item: str(community_names.get(item[0])))
+            ],
+            'by_team': [
+                {
+                    'team': team_name,
+                    'count': count,
+                    'avg_hours_mon_thu': round(sum_mon_thu / count, 1) if count else 0,
+                    'avg_hours_fri': round(sum_fri / count, 1) if count else 0
+                }
+                for team_name, (count, sum_mon_thu, sum_fri) in sorted(by_team.items())
+            ]
+        }
+
+
+employee_stats = EmployeeStatsRollup()
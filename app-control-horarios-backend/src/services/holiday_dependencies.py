@@ -0,0 +1,103 @@
+from src.models.employee import db, Employee
+
+
+def affected_months(date_obj):
+    """
+    Meses cuyo forecast depende de una fecha.
+
+    Siempre su propio mes; desde el día 26 también el siguiente, porque cae en
+    su período INDITEX (26 del mes anterior al 25).
+    """
+    months = [(date_obj.year, date_obj.month)]
+    if date_obj.day >= 26:
+        months.append((date_obj.year + 1, 1) if date_obj.month == 12 else (date_obj.year, date_obj.month + 1))
+    return months
+
+
+class HolidayDependencies:
+    """
+    Mapa de dependencias de un conjunto de cambios de festivos.
+
+    Traduce cada (fecha, comunidad, provincia) modificado a los empleados,
+    equipos, meses y claves de caché afectados. Un festivo sin comunidad es
+    nacional y afecta a todos los empleados.
+    """
+
+    def __init__(self, changes, employees=None):
+        self.dates = set()
+        self.community_ids = set()
+        self.province_ids = set()
+        self.national = False
+        for date_obj, community_id, province_id in changes:
+            self.dates.add(date_obj)
+            if community_id is None:
+                self.national = True
+            else:
+                self.community_ids.add(community_id)
+            if province_id is not None:
+                self.province_ids.add(province_id)
+
+        self.months = {month for date_obj in self.dates for month in affected_months(date_obj)}
+        self.years = {date_obj.year for date_obj in self.dates}
+        self.forecast_years = {year for year, _ in self.months}
+        self.start = min(self.dates) if self.dates else None
+        self.end = max(self.dates) if self.dates else None
+
+        # None = todos los empleados/equipos
+        self.employee_ids = None
+        self.team_names = None
+        if not self.national and employees is not None:
+            self.employee_ids = {employee_id for employee_id, _ in employees}
+            self.team_names = {team_name for _, team_name in employees}
+
+    @classmethod
+    def resolve(cls, changes):
+        """Construye el mapa consultando de una vez los empleados de las comunidades afectadas"""
+        changes = list(changes)
+        if any(community_id is None for _, community_id, _ in changes):
+            return cls(changes)
+        community_ids = {community_id for _, community_id, _ in changes}
+        employees = db.session.query(Employee.id, Employee.team_name).filter(
+            Employee.autonomous_community_id.in_(list(community_ids))
+        ).all() if community_ids else []
+        return cls(changes, employees)
+
+    @property
+    def is_empty(self):
+        return not self.dates
+
+    def _affects_region(self, community_id=None, province_id=None):
+        return (self.national or community_id in self.community_ids
+                or (province_id is not None and province_id in self.province_ids))
+
+    def affects_holiday_cache_key(self, key):
+        """Si una clave de HolidayService._cache depende de los festivos cambiados"""
+        if not isinstance(key, tuple):
+            return True  # Índice global de festivos
+        kind = key[0]
+        if kind == 'hours_vector':
+            _, _, year, _, _, community_id = key
+            return year in self.years and self._affects_region(community_id)
+        if kind == 'working_days':
+            _, year, month, community_id, province_id = key
+            return (year, month) in self.months and self._affects_region(community_id, province_id)
+        if kind == 'workdays':
+            _, community_id, province_id = key
+            return self._affects_region(community_id, province_id)
+        return True
+
+    def affects_forecast_key(self, key):
+        """Si una clave de HoursCalculator._cache depende de los festivos cambiados"""
+        kind = key[0]
+        if kind == 'employee_forecast':
+            _, employee_id, year, month = key
+            return (year, month) in self.months and (self.employee_ids is None or employee_id in self.employee_ids)
+        if kind == 'annual_summary':
+            _, employee_id, year, _ = key
+            return year in self.forecast_years and (self.employee_ids is None or employee_id in self.employee_ids)
+        if kind == 'team_summary':
+            _, team_name, year, month = key
+            return (year, month) in self.months and (self.team_names is None or team_name in self.team_names)
+        if self.employee_ids is not None and not self.employee_ids:
+            return False  # Comunidades sin empleados: los agregados no cambian
+        return (key[-2], key[-1]) in self.months
@@ -0,0 +1,192 @@
+from datetime import date, timedelta
+import unicodedata
+from src.models.employee import db, Holiday, AutonomousCommunity, Province
+
+
+def easter_sunday(year):
+    """Domingo de Pascua (cómputo gregoriano anónimo de Meeus/Jones/Butcher)"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _normalize(name):
+    """Normaliza un nombre para compararlo sin tildes ni mayúsculas"""
+    if not name:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', name)
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).lower().strip()
+
+
+# Festivos nacionales de fecha fija (mes, día, nombre)
+NATIONAL_FIXED_HOLIDAYS = [
+    (1, 1, 'Año Nuevo'),
+    (1, 6, 'Epifanía del Señor'),
+    (5, 1, 'Fiesta del Trabajo'),
+    (8, 15, 'Asunción de la Virgen'),
+    (10, 12, 'Fiesta Nacional de España'),
+    (11, 1, 'Todos los Santos'),
+    (12, 6, 'Día de la Constitución Española'),
+    (12, 8, 'Inmaculada Concepción'),
+    (12, 25, 'Natividad del Señor'),
+]
+
+# Festivos móviles (desplazamiento en días respecto al Domingo de Pascua)
+HOLY_THURSDAY = (-3, 'Jueves Santo')
+GOOD_FRIDAY = (-2, 'Viernes Santo')
+EASTER_MONDAY = (1, 'Lunes de Pascua')
+
+# Reglas autonómicas por nombre de comunidad (ver Employee.get_autonomous_communities)
+REGIONAL_RULES = {
+    'Andalucía': {'movable': [HOLY_THURSDAY], 'fixed': [(2, 28, 'Día de Andalucía')]},
+    'Aragón': {'movable': [HOLY_THURSDAY], 'fixed': [(4, 23, 'San Jorge / Día de Aragón')]},
+    'Asturias': {'movable': [HOLY_THURSDAY], 'fixed': [(9, 8, 'Día de Asturias')]},
+    'Baleares': {'movable': [HOLY_THURSDAY, EASTER_MONDAY], 'fixed': [(3, 1, 'Día de las Illes Balears')]},
+    'Canarias': {'movable': [HOLY_THURSDAY], 'fixed': [(5, 30, 'Día de Canarias')]},
+    'Cantabria': {'movable': [HOLY_THURSDAY], 'fixed': [(7, 28, 'Día de las Instituciones de Cantabria'),
+                                                        (9, 15, 'La Bien Aparecida')]},
+    'Castilla-La Mancha': {'movable': [HOLY_THURSDAY], 'fixed': [(5, 31, 'Día de Castilla-La Mancha')]},
+    'Castilla y León': {'movable': [HOLY_THURSDAY], 'fixed': [(4, 23, 'Día de Castilla y León')]},
+    'Cataluña': {'movable': [EASTER_MONDAY], 'fixed': [(6, 24, 'Sant Joan'),
+                                                      (9, 11, 'Diada Nacional de Catalunya'),
+                                                      (12, 26, 'Sant Esteve')]},
+    'Comunidad Valenciana': {'movable': [EASTER_MONDAY], 'fixed': [(3, 19, 'San José'),
+                                                                  (10, 9, 'Día de la Comunitat Valenciana')]},
+    'Extremadura': {'movable': [HOLY_THURSDAY], 'fixed': [(9, 8, 'Día de Extremadura')]},
+    'Galicia': {'movable': [HOLY_THURSDAY], 'fixed': [(5, 17, 'Día de las Letras Gallegas'),
+                                                     (7, 25, 'Día Nacional de Galicia')]},
+    'La Rioja': {'movable': [HOLY_THURSDAY, EASTER_MONDAY], 'fixed': [(6, 9, 'Día de La Rioja')]},
+    'Madrid': {'movable': [HOLY_THURSDAY], 'fixed': [(5, 2, 'Fiesta de la Comunidad de Madrid')]},
+    'Murcia': {'movable': [HOLY_THURSDAY], 'fixed': [(6, 9, 'Día de la Región de Murcia')]},
+    'Navarra': {'movable': [HOLY_THURSDAY, EASTER_MONDAY], 'fixed': [(12, 3, 'San Francisco Javier')]},
+    'País Vasco': {'movable': [HOLY_THURSDAY, EASTER_MONDAY], 'fixed': [(7, 25, 'Santiago Apóstol')]},
+    'Ceuta': {'movable': [HOLY_THURSDAY], 'fixed': [(9, 2, 'Día de Ceuta')]},
+    'Melilla': {'movable': [HOLY_THURSDAY], 'fixed': [(9, 17, 'Día de Melilla')]},
+}
+
+# Festivos provinciales (nombre de provincia -> lista de (mes, día, nombre)).
+# Vacío por defecto: en España los festivos por debajo de la comunidad son locales
+# y se dan de alta mediante /holidays/bulk.
+PROVINCIAL_RULES = {}
+
+
+class SpanishHolidayGenerator:
+    """Generador offline de festivos nacionales, autonómicos y provinciales"""
+
+    def generate(self, year, communities, provinces=None):
+        """
+        Genera los festivos de un año.
+
+        `communities` es una lista de (id, nombre) y `provinces` de
+        (id, nombre, id_comunidad).
+        Devuelve una lista de diccionarios con date, name, autonomous_community_id
+        y province_id listos para insertar.
+        """
+        easter = easter_sunday(year)
+        rows = []
+
+        for month, day, name in NATIONAL_FIXED_HOLIDAYS:
+            rows.append(self._row(date(year, month, day), name))
+        rows.append(self._row(easter + timedelta(days=GOOD_FRIDAY[0]), GOOD_FRIDAY[1]))
+
+        rules_by_name = {_normalize(name): rules for name, rules in REGIONAL_RULES.items()}
+        for community_id, community_name in communities:
+            rules = rules_by_name.get(_normalize(community_name))
+            if not rules:
+                continue
+            for offset, name in rules['movable']:
+                rows.append(self._row(easter + timedelta(days=offset), name, community_id))
+            for month, day, name in rules['fixed']:
+                rows.append(self._row(date(year, month, day), name, community_id))
+
+        provincial_by_name = {_normalize(name): rules for name, rules in PROVINCIAL_RULES.items()}
+        for province_id, province_name, community_id in provinces or []:
+            for month, day, name in provincial_by_name.get(_normalize(province_name), []):
+                rows.append(self._row(date(year, month, day), name, community_id, province_id))
+
+        return rows
+
+    def _row(self, date_obj, name, community_id=None, province_id=None):
+        return {
+            'date': date_obj,
+            'name': name,
+            'autonomous_community_id': community_id,
+            'province_id': province_id
+        }
+
+    def sync_year(self, year):
+        """Genera y guarda (upsert) todos los festivos de un año para todas las comunidades"""
+        communities = db.session.query(AutonomousCommunity.id, AutonomousCommunity.name).all()
+        provinces = db.session.query(Province.id, Province.name, Province.autonomous_community_id).all()
+        rows = self.generate(year, communities, provinces)
+        return upsert_holidays(rows)
+
+
+def upsert_holidays(rows):
+    """
+    Inserta o actualiza festivos en bloque.
+
+    Carga de una vez las claves (fecha, comunidad, provincia) existentes en el rango
+    afectado, inserta las nuevas con un único INSERT multi-fila y renombra las que
+    hayan cambiado. Se resuelve en memoria porque la restricción única no cubre los
+    festivos nacionales (NULL) en PostgreSQL.
+    """
+    from src.services.holiday_service import HolidayService
+
+    if not rows:
+        return {'created': 0, 'updated': 0, 'unchanged': 0}
+
+    # Eliminar duplicados dentro de la propia petición (gana el último)
+    unique_rows = {}
+    for row in rows:
+        key = (row['date'], row.get('autonomous_community_id'), row.get('province_id'))
+        unique_rows[key] = row
+
+    dates = [key[0] for key in unique_rows]
+    existing = db.session.query(
+        Holiday.id, Holiday.date, Holiday.autonomous_community_id, Holiday.province_id, Holiday.name
+    ).filter(Holiday.date >= min(dates), Holiday.date <= max(dates)).all()
+    existing_by_key = {(h.date, h.autonomous_community_id, h.province_id): h for h in existing}
+
+    to_insert = []
+    to_update = []
+    unchanged = 0
+    for key, row in unique_rows.items():
+        current = existing_by_key.get(key)
+        if current is None:
+            to_insert.append({
+                'date': row['date'],
+                'name': row['name'],
+                'autonomous_community_id': row.get('autonomous_community_id'),
+                'province_id': row.get('province_id')
+            })
+        elif current.name != row['name']:
+            to_update.append({'id': current.id, 'name': row['name']})
+        else:
+            unchanged += 1
+
+    try:
+        if to_insert:
+            db.session.execute(db.insert(Holiday), to_insert)
+        if to_update:
+            db.session.bulk_update_mappings(Holiday, to_update)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    # Los renombrados no afectan a las horas: solo se invalidan los días nuevos
+    if to_insert:
+        HolidayService.invalidate_holidays(
+            (row['date'], row['autonomous_community_id'], row['province_id']) for row in to_insert
+        )
+
+    return {'created': len(to_insert), 'updated': len(to_update), 'unchanged': unchanged}
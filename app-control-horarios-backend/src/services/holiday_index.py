@@ -0,0 +1,119 @@
+from src.models.employee import db, Holiday
+
+
+class HolidayIndex:
+    """
+    Índice en memoria de festivos por ordinal de fecha.
+
+    Reproduce la semántica de HolidayService.is_holiday: con provincia solo cuentan
+    los festivos de esa provincia; con comunidad, los de la comunidad más los
+    nacionales; sin ninguna de las dos, solo los nacionales.
+    """
+
+    def __init__(self, rows):
+        self.national = set()
+        self.by_community = {}
+        self.by_province = {}
+        self._merged = {}
+        for date_obj, community_id, province_id in rows:
+            ordinal = date_obj.toordinal()
+            if community_id is None:
+                self.national.add(ordinal)
+            else:
+                self.by_community.setdefault(community_id, set()).add(ordinal)
+            if province_id is not None:
+                self.by_province.setdefault(province_id, set()).add(ordinal)
+
+    @classmethod
+    def load(cls):
+        """Construye el índice con una única consulta de columnas"""
+        rows = db.session.query(
+            Holiday.date, Holiday.autonomous_community_id, Holiday.province_id
+        ).all()
+        return cls(rows)
+
+    def holiday_ordinals(self, community_id=None, province_id=None):
+        """Conjunto de ordinales festivos aplicables a una comunidad/provincia"""
+        if province_id:
+            return self.by_province.get(province_id, set())
+        if community_id:
+            merged = self._merged.get(community_id)
+            if merged is None:
+                merged = self.national | self.by_community.get(community_id, set())
+                self._merged[community_id] = merged
+            return merged
+        return self.national
+
+    def is_holiday(self, date_obj, community_id=None, province_id=None):
+        return date_obj.toordinal() in self.holiday_ordinals(community_id, province_id)
+
+
+def get_holiday_index():
+    """Índice de festivos compartido; se reconstruye tras HolidayService.invalidate_cache()"""
+    from src.services.holiday_service import HolidayService
+
+    return HolidayService._cache.get_or_compute('index', HolidayIndex.load)
+
+
+def weekdays_for_ordinals(ordinals):
+    """Día de la semana (0=Lunes) para una lista de ordinales; el ordinal 1 fue lunes"""
+    return [(ordinal - 1) % 7 for ordinal in ordinals]
+
+
+class WorkingDayCalendar:
+    """
+    Días laborables precalculados de una comunidad/provincia.
+
+    `before[i]` es el número de días laborables anteriores a `origin + i` y
+    `working[k]` el ordinal del k-ésimo día laborable, de modo que contar o
+    sumar días laborables se resuelve con dos accesos a array.
+    """
+
+    FIRST_YEAR = 2019
+    LAST_YEAR = 2032
+
+    def __init__(self, holiday_ordinals):
+        from array import array
+        from datetime import date
+
+        self.origin = date(self.FIRST_YEAR, 1, 1).toordinal()
+        self.end = date(self.LAST_YEAR, 12, 31).toordinal()
+        self.before = array('i', [0])
+        self.working = array('i')
+        ordinals = range(self.origin, self.end + 1)
+        for ordinal, weekday in zip(ordinals, weekdays_for_ordinals(ordinals)):
+            if weekday < 5 and ordinal not in holiday_ordinals:
+                self.working.append(ordinal)
+            self.before.append(len(self.working))
+
+    def _offset(self, date_obj):
+        ordinal = date_obj.toordinal()
+        if not (self.origin <= ordinal <= self.end):
+            raise ValueError(f'Fecha fuera de rango ({self.FIRST_YEAR}-{self.LAST_YEAR})')
+        return ordinal - self.origin
+
+    def add(self, start, days):
+        """N-ésimo día laborable desde `start` (incluido); negativo cuenta hacia atrás"""
+        if days == 0:
+            raise ValueError('El número de días laborables no puede ser 0')
+        offset = self._offset(start)
+        if days > 0:
+            position = self.before[offset] + days - 1
+        else:
+            position = self.before[offset + 1] + days
+        if not (0 <= position < len(self.working)):
+            raise ValueError(f'Resultado fuera de rango ({self.FIRST_YEAR}-{self.LAST_YEAR})')
+        return self.working[position]
+
+    def count(self, start, end):
+        """Días laborables entre `start` y `end`, ambos incluidos"""
+        return self.before[self._offset(end) + 1] - self.before[self._offset(start)]
+
+
+def get_working_day_calendar(community_id=None, province_id=None):
+    """Calendario laborable compartido por comunidad/provincia"""
+    from src.services.holiday_service import HolidayService
+
+    cache_key = ('workdays', community_id, province_id)
+    return HolidayService._cache.get_or_compute(cache_key, lambda: WorkingDayCalendar(
+        get_holiday_index().holiday_ordinals(community_id, province_id)))
@@ -1,9 +1,48 @@
 from datetime import datetime, date
 from src.models.employee import db, Holiday
+from src.utils.cache_backend import get_cache
 
 class HolidayService:
     """Servicio para gestión de festivos nacionales, autonómicos y provinciales"""
 
+    # Caché compartida por todas las instancias del servicio. Los índices se
+    # reconstruyen en cada proceso (son baratos de calcular y caros de
+    # deserializar); con CACHE_BACKEND compartido solo se comparte la invalidación
+    _cache = get_cache('holidays', share_values=False)
+
+    @classmethod
+    def invalidate_cache(cls):
+        """Vaciar las cachés de festivos (llamar tras cualquier alta/baja de festivos)"""
+        from src.utils.hours_calculator import HoursCalculator
+        from src.services.hours_ledger import hours_ledger
+        cls._cache.clear()
+        # Los forecast y el libro diario de horas dependen de los festivos (el libro se
+        # marca pendiente antes de invalidar para que nadie recachee con el antiguo)
+        hours_ledger.schedule()
+        HoursCalculator.invalidate_cache()
+
+    @classmethod
+    def invalidate_holidays(cls, changes):
+        """
+        Invalidación incremental tras cambiar festivos concretos.
+
+        `changes` es una lista de (fecha, comunidad, provincia). Solo se descartan
+        las cachés, forecast y días del libro de horas de los empleados y meses
+        que dependen de esos festivos (ver HolidayDependencies).
+        """
+        from src.utils.hours_calculator import HoursCalculator
+        from src.services.hours_ledger import hours_ledger
+        from src.services.holiday_dependencies import HolidayDependencies
+
+        dependencies = HolidayDependencies.resolve(changes)
+        if dependencies.is_empty:
+            return dependencies
+        cls._cache.discard_where(dependencies.affects_holiday_cache_key)
+        if dependencies.employee_ids is None or dependencies.employee_ids:
+            hours_ledger.schedule(dependencies.employee_ids, dependencies.start, dependencies.end)
+        HoursCalculator.invalidate_where(dependencies.affects_forecast_key)
+        return dependencies
+
     def get_holidays_by_year(self, year, community_id=None, province_id=None):
         """Obtener festivos por año y opcionalmente por comunidad/provincia"""
         query = Holiday.query.filter(
@@ -43,23 +82,15 @@ class HolidayService:
 
     def is_holiday(self, date_obj, community_id=None, province_id=None):
         """Verificar si una fecha es festivo"""
-        query = Holiday.query.filter(Holiday.date == date_obj)
-        if province_id:
-            query = query.filter(Holiday.province_id == province_id)
-        elif community_id:
-            query = query.filter(
-                db.or_(
-                    Holiday.autonomous_community_id == community_id,
-                    Holiday.autonomous_community_id.is_(None)
-                )
-            )
-        else:
-            query = query.filter(Holiday.autonomous_community_id.is_(None))
-        return query.first() is not None
+        from src.services.holiday_index import get_holiday_index
+        return get_holiday_index().is_holiday(date_obj, community_id, province_id)
 
     def get_working_days_in_month(self, year, month, community_id=None, province_id=None):
         """Calcular días laborables en un mes (excluyendo festivos y fines de semana)"""
         import calendar as cal
+        cache_key = ('working_days', year, month, community_id, province_id)
+        if cache_key in self._cache:
+            return self._cache[cache_key]
         holidays = self.get_holidays_by_month(year, month, community_id, province_id)
         holiday_dates = {holiday.date for holiday in holidays}
         working_days = 0
@@ -72,8 +103,23 @@ class HolidayService:
             if current_date in holiday_dates:
                 continue
             working_days += 1
+        self._cache[cache_key] = working_days
         return working_days
 
+    def add_working_days(self, start_date, days, community_id=None, province_id=None):
+        """Fecha del N-ésimo día laborable a partir de start_date (incluida)"""
+        from src.services.holiday_index import get_working_day_calendar
+        working_calendar = get_working_day_calendar(community_id, province_id)
+        return date.fromordinal(working_calendar.add(start_date, days))
+
+    def count_working_days(self, start_date, end_date, community_id=None, province_id=None):
+        """Número de días laborables entre dos fechas, ambas incluidas"""
+        from src.services.holiday_index import get_working_day_calendar
+        if end_date < start_date:
+            raise ValueError('La fecha final es anterior a la inicial')
+        working_calendar = get_working_day_calendar(community_id, province_id)
+        return working_calendar.count(start_date, end_date)
+
     def get_autonomous_communities(self):
         """Obtener lista de comunidades autónomas con festivos"""
         from src.models.employee import Employee
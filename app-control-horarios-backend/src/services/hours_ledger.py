@@ -0,0 +1,368 @@
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from datetime import date, datetime, timedelta
+from flask import g, has_app_context, has_request_context
+from src.models.employee import db, Employee, CalendarEntry, DailyExpectedHours, LedgerPending
+from src.services.schedule_service import get_schedule_index
+from src.utils.admission import admission, BACKGROUND
+from src.utils.cache_backend import try_lock, release_lock
+from src.utils.schedule_rules import get_expected_hours_vector
+
+logger = logging.getLogger(__name__)
+
+HOURS_LEDGER_ENABLED = os.getenv('HOURS_LEDGER_ENABLED', 'true').lower() == 'true'
+
+# Empleados regenerados por lote (acota memoria y tamaño de cada INSERT)
+LEDGER_CHUNK_SIZE = 200
+# Antigüedad a partir de la que una regeneración pendiente se considera abandonada
+LEDGER_PENDING_STALE = timedelta(minutes=int(os.getenv('LEDGER_PENDING_STALE_MINUTES', '15')))
+# Candado que elige al worker que genera el horizonte (caduca como las marcas abandonadas)
+HORIZON_LOCK = 'hours-ledger-horizon'
+HORIZON_LOCK_POLL = 1.0
+# Reintentos de la generación del horizonte: espera inicial y máxima (segundos)
+HORIZON_RETRY_DELAY = 5.0
+HORIZON_RETRY_MAX_DELAY = 300.0
+
+
+class HoursLedger:
+    """
+    Libro diario materializado de horas esperadas y trabajadas por empleado.
+
+    Un hilo en segundo plano genera la tabla daily_expected_hours para un
+    horizonte móvil (del 1 de enero del año anterior al 31 de diciembre del
+    siguiente) y la regenera para las filas afectadas cuando cambian festivos,
+    horarios o entradas. Los periodos INDRA/INDITEX se resuelven entonces con
+    un SUM ... GROUP BY indexado. Mientras un empleado tiene regeneraciones
+    pendientes, el calculador usa el cálculo en memoria.
+
+    Las regeneraciones pendientes se publican en la tabla ledger_pending al
+    encolarlas, para que los demás workers tampoco lean el libro a medio
+    reescribir; tras cada lote confirmado se descartan los forecasts
+    cacheados de los empleados afectados.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._app = None
+        self._worker = None
+        self._covered = None  # (inicio, fin) generado por completo
+        self._pending_all = 0
+        self._pending = {}  # employee_id -> tareas pendientes
+
+    def init_app(self, app):
+        """Arrancar el hilo generador y completar el horizonte en segundo plano"""
+        # Los procesos de trabajos en segundo plano (job_runner) no mantienen el libro
+        if not HOURS_LEDGER_ENABLED or multiprocessing.parent_process() is not None:
+            return
+        self._app = app
+        self._enqueue(None, 'horizon')
+
+    @staticmethod
+    def horizon(today=None):
+        today = today or date.today()
+        return date(today.year - 1, 1, 1), date(today.year + 1, 12, 31)
+
+    def is_current(self, employee_id, start_date, end_date):
+        """Si el libro cubre el rango para el empleado y no tiene cambios pendientes"""
+        if not HOURS_LEDGER_ENABLED or self._covered is None:
+            return False
+        if self._covered != self.horizon() and not self._pending_all:
+            # Cambio de año: desplazar el horizonte
+            self._enqueue(None, 'horizon')
+        if self._pending_all or self._pending.get(employee_id):
+            return False
+        if not (self._covered[0] <= start_date and end_date <= self._covered[1]):
+            return False
+        # Regeneraciones encoladas por otros workers
+        shared_pending = self.shared_pending()
+        return None not in shared_pending and employee_id not in shared_pending
+
+    def shared_pending(self):
+        """Empleados con regeneraciones pendientes en cualquier worker (None = todos); una consulta por petición"""
+        if has_request_context() and '_ledger_pending' in g:
+            return g._ledger_pending
+        pending = {employee_id for (employee_id,) in db.session.query(LedgerPending.employee_id).distinct()}
+        if has_request_context():
+            g._ledger_pending = pending
+        return pending
+
+    def mark_pending(self, employee_ids=None):
+        """Publicar regeneraciones pendientes (conexión propia: visible ya para los demás workers)"""
+        now = datetime.utcnow()
+        rows = [{'employee_id': None, 'created_at': now}] if employee_ids is None else \
+            [{'employee_id': employee_id, 'created_at': now} for employee_id in set(employee_ids)]
+        if not rows:
+            return []
+        with db.engine.begin() as connection:
+            return [connection.execute(db.insert(LedgerPending).values(**row)).inserted_primary_key[0]
+                    for row in rows]
+
+    def clear_pending(self, marker_ids):
+        if marker_ids:
+            with db.engine.begin() as connection:
+                connection.execute(db.delete(LedgerPending).where(LedgerPending.id.in_(marker_ids)))
+
+    def schedule(self, employee_ids=None, start_date=None, end_date=None):
+        """
+        Regenerar en segundo plano (todos los empleados si employee_ids es None).
+
+        Debe llamarse antes de invalidar la caché de forecast: así ningún
+        cálculo posterior a la invalidación lee el libro antiguo.
+        """
+        if not HOURS_LEDGER_ENABLED or self._app is None:
+            return
+        if has_request_context():
+            g.pop('_ledger_pending', None)
+        markers = self.mark_pending(employee_ids)
+        self._enqueue(employee_ids, (start_date, end_date), markers)
+
+    def _enqueue(self, employee_ids, task, markers=()):
+        with self._lock:
+            if employee_ids is None:
+                self._pending_all += 1
+            else:
+                employee_ids = list(employee_ids)
+                for employee_id in employee_ids:
+                    self._pending[employee_id] = self._pending.get(employee_id, 0) + 1
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='hours-ledger', daemon=True)
+                self._worker.start()
+        self._queue.put((employee_ids, task, markers))
+
+    def _run(self):
+        while True:
+            employee_ids, task, markers = self._queue.get()
+            try:
+                with self._app.app_context():
+                    if task == 'horizon':
+                        self._ensure_horizon()
+                    else:
+                        # Ocupa un hueco de admisión: no se come las conexiones reservadas para las escrituras
+                        with admission.slot(BACKGROUND, 'hours-ledger'):
+                            self.regenerate(employee_ids, *task)
+                            self.clear_pending(markers)
+            except Exception:
+                # Las marcas se quedan: el libro de esos empleados no se lee hasta repararlo al arrancar
+                logger.exception("❌ Error regenerando el libro de horas")
+            finally:
+                with self._lock:
+                    if employee_ids is None:
+                        self._pending_all -= 1
+                    else:
+                        for employee_id in employee_ids:
+                            remaining = self._pending.get(employee_id, 0) - 1
+                            if remaining > 0:
+                                self._pending[employee_id] = remaining
+                            else:
+                                self._pending.pop(employee_id, None)
+                self._queue.task_done()
+
+    def is_idle(self):
+        """Si no quedan regeneraciones pendientes en este worker ni en los demás"""
+        if not HOURS_LEDGER_ENABLED:
+            return True
+        if self._pending_all or self._pending:
+            return False
+        return not self.shared_pending()
+
+    def wait_until_idle(self):
+        """Bloquear hasta que no queden regeneraciones en cola (benchmarks y arranque)"""
+        self._queue.join()
+
+    def _ensure_horizon(self):
+        """
+        Podar los días fuera del horizonte y generarlo si está incompleto.
+
+        Un solo worker lo genera a la vez (candado HORIZON_LOCK en el almacén
+        compartido); los demás esperan a que lo suelte y entonces solo
+        comprueban que está completo (sin almacén compartido no hay elección y
+        los choques entre workers se resuelven con los reintentos). Si la
+        generación falla se retira la marca propia y se reintenta con espera
+        creciente, en vez de dejar el libro sin usar hasta el siguiente arranque.
+        """
+        delay = HORIZON_RETRY_DELAY
+        while True:
+            elected = try_lock(HORIZON_LOCK, LEDGER_PENDING_STALE.total_seconds())
+            if elected is False:
+                time.sleep(HORIZON_LOCK_POLL)
+                continue
+            try:
+                with admission.slot(BACKGROUND, 'hours-ledger'):
+                    self._generate_horizon()
+                return
+            except Exception:
+                logger.exception("❌ Error generando el libro de horas: reintento en %.0fs", delay)
+            finally:
+                if elected:
+                    release_lock(HORIZON_LOCK)
+                db.session.remove()
+            time.sleep(delay)
+            delay = min(delay * 2, HORIZON_RETRY_MAX_DELAY)
+
+    def _generate_horizon(self):
+        start_date, end_date = self.horizon()
+        markers = []
+        try:
+            DailyExpectedHours.query.filter(
+                db.or_(DailyExpectedHours.date < start_date, DailyExpectedHours.date > end_date)
+            ).delete(synchronize_session=False)
+            db.session.commit()
+
+            days = end_date.toordinal() - start_date.toordinal() + 1
+            rows = db.session.query(db.func.count()).select_from(DailyExpectedHours).scalar()
+            employees = db.session.query(db.func.count(Employee.id)).scalar()
+            # Marcas de regeneraciones que no terminaron (proceso caído o error); las recientes
+            # pueden ser de otro worker que sigue regenerando
+            leftovers = db.session.query(LedgerPending.id, LedgerPending.employee_id).filter(
+                LedgerPending.created_at < datetime.utcnow() - LEDGER_PENDING_STALE
+            ).all()
+            if rows != employees * days or any(employee_id is None for _, employee_id in leftovers):
+                logger.info("📒 Generando libro de horas %s - %s para %d empleados...", start_date, end_date, employees)
+                markers = self.mark_pending(None)
+                self.regenerate(None, start_date, end_date)
+                self.clear_pending(markers + [marker_id for marker_id, _ in leftovers])
+                markers = []
+            elif leftovers:
+                logger.info("📒 Reparando el libro de %d empleados con regeneraciones sin terminar", len(leftovers))
+                self.regenerate({employee_id for _, employee_id in leftovers}, start_date, end_date)
+                self.clear_pending([marker_id for marker_id, _ in leftovers])
+        except Exception:
+            db.session.rollback()
+            # Sin la marca propia: el reintento (de este worker u otro) pone la suya
+            self.clear_pending(markers)
+            raise
+        self._covered = (start_date, end_date)
+        logger.info("✅ Libro de horas al día")
+
+    def regenerate(self, employee_ids=None, start_date=None, end_date=None):
+        """
+        Recalcular las filas de los empleados en [start_date, end_date] (dentro del horizonte).
+
+        Borra e inserta por lotes de LEDGER_CHUNK_SIZE empleados y hace commit;
+        tras cada lote descarta los forecasts cacheados que lo usaban.
+        Devuelve el número de filas escritas.
+        """
+        from src.utils.hours_calculator import HoursCalculator
+
+        horizon_start, horizon_end = self.horizon()
+        start_date = max(start_date or horizon_start, horizon_start)
+        end_date = min(end_date or horizon_end, horizon_end)
+        if start_date > end_date:
+            return 0
+
+        query = Employee.query.order_by(Employee.id)
+        if employee_ids is not None:
+            if not employee_ids:
+                return 0
+            query = query.filter(Employee.id.in_(list(employee_ids)))
+        employees = query.all()
+
+        written = 0
+        try:
+            for offset in range(0, len(employees), LEDGER_CHUNK_SIZE):
+                chunk = employees[offset:offset + LEDGER_CHUNK_SIZE]
+                chunk_ids = [employee.id for employee in chunk]
+                entries = {}
+                for entry in CalendarEntry.query.filter(
+                    CalendarEntry.employee_id.in_(chunk_ids),
+                    CalendarEntry.date >= start_date,
+                    CalendarEntry.date <= end_date
+                ):
+                    entries[(entry.employee_id, entry.date.toordinal())] = entry
+
+                rows = []
+                for employee in chunk:
+                    rows.extend(self._compute_rows(employee, start_date, end_date, entries))
+
+                DailyExpectedHours.query.filter(
+                    DailyExpectedHours.employee_id.in_(chunk_ids),
+                    DailyExpectedHours.date >= start_date,
+                    DailyExpectedHours.date <= end_date
+                ).delete(synchronize_session=False)
+                if rows:
+                    db.session.execute(db.insert(DailyExpectedHours), rows)
+                db.session.commit()
+                written += len(rows)
+                # Lo calculado con el libro anterior no debe seguir en la caché (ni compartida)
+                HoursCalculator.invalidate_cache(
+                    since=start_date, employee_ids=None if employee_ids is None else chunk_ids)
+        except Exception:
+            db.session.rollback()
+            raise
+
+        if has_app_context():
+            g.pop('_ledger_totals', None)
+        return written
+
+    def _compute_rows(self, employee, start_date, end_date, entries):
+        from src.utils.hours_calculator import HoursCalculator
+
+        rows = []
+        for segment_start, segment_end, hours_mon_thu, hours_fri, profile in \
+                get_schedule_index().segments(employee, start_date, end_date):
+            for year in range(segment_start.year, segment_end.year + 1):
+                year_start = date(year, 1, 1).toordinal()
+                vector = get_expected_hours_vector(profile, year, hours_mon_thu, hours_fri,
+                                                   employee.autonomous_community_id)
+                first = max(segment_start.toordinal(), year_start)
+                last = min(segment_end.toordinal(), date(year, 12, 31).toordinal())
+                for ordinal in range(first, last + 1):
+                    expected = vector[ordinal - year_start]
+                    worked = expected
+                    entry = entries.get((employee.id, ordinal))
+                    if entry is not None:
+                        worked += HoursCalculator.entry_adjustment(expected, entry)
+                    rows.append({
+                        'employee_id': employee.id,
+                        'date': date.fromordinal(ordinal),
+                        'expected': expected,
+                        'worked': worked
+                    })
+        return rows
+
+    def delete_employee(self, employee_id):
+        """Borrar las filas de un empleado (sin commit; FK en cascada donde la BD lo soporte)"""
+        DailyExpectedHours.query.filter_by(employee_id=employee_id).delete(synchronize_session=False)
+
+    def preload(self, start_date, end_date):
+        """Totales de todos los empleados en un rango con un único SUM ... GROUP BY"""
+        memo = g.setdefault('_ledger_totals', {}) if has_app_context() else {}
+        totals = memo.get((start_date, end_date))
+        if totals is None:
+            totals = {
+                employee_id: (expected or 0, worked or 0)
+                for employee_id, expected, worked in db.session.query(
+                    DailyExpectedHours.employee_id,
+                    db.func.sum(DailyExpectedHours.expected),
+                    db.func.sum(DailyExpectedHours.worked)
+                ).filter(
+                    DailyExpectedHours.date >= start_date,
+                    DailyExpectedHours.date <= end_date
+                ).group_by(DailyExpectedHours.employee_id)
+            }
+            memo[(start_date, end_date)] = totals
+        return totals
+
+    def employee_totals(self, employee_id, start_date, end_date):
+        """(esperadas, trabajadas) de un empleado en un rango"""
+        memo = g.get('_ledger_totals', {}) if has_app_context() else {}
+        totals = memo.get((start_date, end_date))
+        if totals is not None:
+            return totals.get(employee_id, (0, 0))
+        expected, worked = db.session.query(
+            db.func.sum(DailyExpectedHours.expected),
+            db.func.sum(DailyExpectedHours.worked)
+        ).filter(
+            DailyExpectedHours.employee_id == employee_id,
+            DailyExpectedHours.date >= start_date,
+            DailyExpectedHours.date <= end_date
+        ).one()
+        return expected or 0, worked or 0
+
+
+hours_ledger = HoursLedger()
@@ -0,0 +1,206 @@
+import os
+import threading
+import time
+from flask_security import UserMixin, SQLAlchemyUserDatastore
+from flask_security.utils import config_value, set_request_attr
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from src.models.employee import db, User
+
+# Segundos que se reutiliza una identidad resuelta (acota el desfase entre procesos)
+IDENTITY_CACHE_TTL = float(os.getenv('IDENTITY_CACHE_TTL', '60'))
+IDENTITY_CACHE_MAX_ENTRIES = 10000
+
+# Marca de los tokens con roles: [ROLE_CLAIMS_MARKER, 'admin,user', fs_uniquifier].
+# Es el formato de 3 elementos (uniquifier al final) que Flask-Security sigue aceptando.
+ROLE_CLAIMS_MARKER = 'roles'
+
+
+def role_claims_token_data(user):
+    """Datos firmados del token de un usuario, con sus roles como claim"""
+    roles = ','.join(sorted(role.name for role in user.roles))
+    return [ROLE_CLAIMS_MARKER, roles, str(user.fs_uniquifier)]
+
+
+class _CachedRole:
+    def __init__(self, name):
+        self.name = name
+
+    def get_permissions(self):
+        return set()
+
+    def __str__(self):
+        return self.name
+
+
+class CachedIdentity(UserMixin):
+    """
+    Foto inmutable de un usuario autenticado por token.
+
+    Expone lo que usan las rutas de la API (id, email, fs_uniquifier, active
+    y roles) sin sesión de base de datos, para poder compartirla entre
+    peticiones y hilos. Las vistas de Flask-Security (cambio de contraseña,
+    verificación...) leen y modifican el usuario completo: en ellas el
+    request_loader devuelve el User del datastore (ver _needs_full_user).
+    """
+
+    def __init__(self, id, email, fs_uniquifier, active, role_names):
+        self.id = id
+        self.email = email
+        self.fs_uniquifier = fs_uniquifier
+        self.active = active
+        self.roles = [_CachedRole(name) for name in role_names]
+
+    def has_role(self, role):
+        return getattr(role, 'name', role) in {r.name for r in self.roles}
+
+    def verify_auth_token(self, data):
+        return data[0 if len(data) == 1 else 2] == self.fs_uniquifier
+
+
+class IdentityCache:
+    """Identidades resueltas por token, con TTL corto e invalidación por usuario"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}  # token -> (caduca, identidad)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token):
+        entry = self._entries.get(token)
+        if entry is None or entry[0] < time.monotonic():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def put(self, token, identity):
+        with self._lock:
+            if len(self._entries) >= IDENTITY_CACHE_MAX_ENTRIES:
+                now = time.monotonic()
+                self._entries = {key: value for key, value in self._entries.items() if value[0] >= now}
+                if len(self._entries) >= IDENTITY_CACHE_MAX_ENTRIES:
+                    self._entries.clear()
+            self._entries[token] = (time.monotonic() + self.ttl, identity)
+
+    def invalidate_user(self, fs_uniquifier):
+        with self._lock:
+            self._entries = {
+                token: entry for token, entry in self._entries.items()
+                if entry[1].fs_uniquifier != fs_uniquifier
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+identity_cache = IdentityCache(IDENTITY_CACHE_TTL)
+
+
+class CachedUserDatastore(SQLAlchemyUserDatastore):
+    """
+    Datastore que mantiene coherente la caché de identidades.
+
+    Quitar un rol o desactivar un usuario renueva su fs_uniquifier: los tokens
+    emitidos (y los roles que llevan firmados) dejan de valer en todos los
+    procesos, no solo en este.
+    """
+
+    def remove_role_from_user(self, user, role):
+        removed = super().remove_role_from_user(user, role)
+        if removed:
+            self.set_uniquifier(user)
+        return removed
+
+    def deactivate_user(self, user):
+        changed = super().deactivate_user(user)
+        if changed:
+            self.set_uniquifier(user)
+        return changed
+
+
+@event.listens_for(Session, 'before_flush')
+def _invalidate_changed_users(session, flush_context, instances):
+    """Cambios de contraseña, roles, estado o uniquifier descartan las identidades del usuario"""
+    for instance in list(session.dirty) + list(session.deleted):
+        if isinstance(instance, User):
+            history = db.inspect(instance).attrs.fs_uniquifier.history
+            for fs_uniquifier in set(history.deleted or ()) | {instance.fs_uniquifier}:
+                if fs_uniquifier:
+                    identity_cache.invalidate_user(fs_uniquifier)
+
+
+def _request_token(request, security):
+    """Token de la cabecera (admite el prefijo Bearer del frontend), la query o el JSON"""
+    token = request.headers.get(security.token_authentication_header)
+    if token and token.lower().startswith('bearer '):
+        token = token[7:].strip()
+    token = request.args.get(security.token_authentication_key, token)
+    if request.is_json:
+        data = request.get_json(silent=True) or {}
+        if isinstance(data, dict):
+            token = data.get(security.token_authentication_key, token)
+    return token
+
+
+def _needs_full_user(request):
+    """Vistas de Flask-Security: necesitan el User mapeado (contraseña, put en el datastore...)"""
+    return request.blueprint == config_value('BLUEPRINT_NAME')
+
+
+def _load_identity(data, security):
+    """Resolver la identidad de un token válido (una consulta; sin roles si van en el token)"""
+    uniquifier = data[0 if len(data) == 1 else 2]
+    if len(data) == 3 and data[0] == ROLE_CLAIMS_MARKER:
+        row = db.session.query(User.id, User.email, User.fs_uniquifier, User.active).filter(
+            User.fs_uniquifier == uniquifier
+        ).first()
+        if row is None:
+            return None
+        role_names = [name for name in data[1].split(',') if name]
+        return CachedIdentity(row.id, row.email, row.fs_uniquifier, row.active, role_names)
+    user = security.datastore.find_user(fs_uniquifier=uniquifier)
+    if user is None:
+        return None
+    return CachedIdentity(user.id, user.email, user.fs_uniquifier, user.active,
+                          [role.name for role in user.roles])
+
+
+def init_identity_cache(app, security):
+    """Sustituir el request_loader de Flask-Security por uno con caché de identidades"""
+
+    def cached_request_loader(request):
+        token = _request_token(request, security)
+        if not token:
+            return security.login_manager.anonymous_user()
+        try:
+            # La firma y la caducidad del token se comprueban siempre (sin base de datos)
+            data = security.remember_token_serializer.loads(token, max_age=security.token_max_age)
+        except Exception:
+            return security.login_manager.anonymous_user()
+
+        if _needs_full_user(request):
+            # Sin caché: el cambio de contraseña renueva el uniquifier e invalida las identidades
+            user = security.datastore.find_user(fs_uniquifier=data[0 if len(data) == 1 else 2])
+            if user is None or not user.active or not user.verify_auth_token(data):
+                return security.login_manager.anonymous_user()
+            set_request_attr('fs_authn_via', 'token')
+            return user
+
+        identity = identity_cache.get(token)
+        if identity is None:
+            try:
+                identity = _load_identity(data, security)
+            except Exception:
+                identity = None
+            if identity is None or not identity.active or not identity.verify_auth_token(data):
+                return security.login_manager.anonymous_user()
+            identity_cache.put(token, identity)
+        set_request_attr('fs_authn_via', 'token')
+        return identity
+
+    security.login_manager.request_loader(cached_request_loader)
+    return identity_cache
@@ -0,0 +1,379 @@
+import atexit
+import csv
+import io
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import uuid
+import zlib
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from flask import Flask, current_app
+from src.models.employee import db, Job, Employee, CalendarEntry
+from src.utils.instrumentation import metrics
+
+logger = logging.getLogger(__name__)
+
+# Procesos que ejecutan trabajos pesados fuera de los workers web
+JOBS_WORKERS = int(os.getenv('JOBS_WORKERS', '2'))
+# Latido de los trabajos en curso (updated_at) mientras el proceso sigue vivo
+JOBS_HEARTBEAT_SECONDS = int(os.getenv('JOBS_HEARTBEAT_SECONDS', '30'))
+# Trabajos en curso sin latido durante este tiempo se dan por perdidos (los en cola no caducan)
+JOBS_STALE_SECONDS = int(os.getenv('JOBS_STALE_SECONDS', str(JOBS_HEARTBEAT_SECONDS * 10)))
+# Intervalo mínimo entre escrituras de progreso (segundos)
+PROGRESS_INTERVAL = 1.0
+
+# Resultado descargable como fichero (exportaciones)
+JobFile = namedtuple('JobFile', 'filename content_type body')
+# Tipo de trabajo: función(params, context), validación de parámetros y si requiere admin
+JobKind = namedtuple('JobKind', 'function parse admin_only')
+
+JOB_KINDS = {}
+
+
+def job_kind(name, parse, admin_only=False):
+    """Registrar una función como tipo de trabajo (POST /api/jobs/<name>)"""
+    def decorator(function):
+        JOB_KINDS[name] = JobKind(function, parse, admin_only)
+        return function
+    return decorator
+
+
+def _year_param(params, required=True):
+    year = params.get('year')
+    if year is None and not required:
+        return None
+    try:
+        year = int(year)
+    except (TypeError, ValueError):
+        raise ValueError('Se requiere un año válido')
+    if not (2020 <= year <= 2030):
+        raise ValueError('Año inválido')
+    return year
+
+
+def _date_param(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return date.fromisoformat(value).isoformat()
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} debe tener formato YYYY-MM-DD')
+
+
+class JobContext:
+    """Lo que recibe la función de un trabajo: su id y cómo informar del progreso"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self._last_report = 0.0
+
+    def progress(self, done, total, message=None, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_report < PROGRESS_INTERVAL:
+            return
+        self._last_report = now
+        # Conexión propia: un commit en la sesión caducaría los objetos que usa el trabajo
+        with db.engine.begin() as connection:
+            connection.execute(
+                db.update(Job).where(Job.id == self.job_id).values(
+                    progress=min(done / total, 1.0) if total else 0.0,
+                    progress_message=message,
+                    updated_at=datetime.utcnow()
+                )
+            )
+
+
+# --- Tipos de trabajo ---
+
+def _parse_annual_summary(params):
+    team_name = params.get('team_name') or None
+    return {'year': _year_param(params), 'team_name': team_name}
+
+
+@job_kind('calculate_annual_summary', _parse_annual_summary)
+def calculate_annual_summary(params, context):
+    """Resumen anual de toda la organización (o de un equipo)"""
+    from src.utils.hours_calculator import HoursCalculator
+
+    year, team_name = params['year'], params.get('team_name')
+    query = Employee.query.order_by(Employee.team_name, Employee.full_name)
+    if team_name:
+        query = query.filter(Employee.team_name == team_name)
+    employees = query.all()
+
+    calculator = HoursCalculator()
+    summaries = []
+    for position, employee in enumerate(employees, 1):
+        summary = calculator.calculate_annual_summary(employee, year)
+        if summary is not None:
+            summaries.append(summary)
+        context.progress(position, len(employees), f'{position}/{len(employees)} empleados')
+    return {'year': year, 'team_name': team_name, 'employees': summaries}
+
+
+def _parse_ledger_rebuild(params):
+    return {'start_date': _date_param(params, 'start_date'), 'end_date': _date_param(params, 'end_date')}
+
+
+@job_kind('rebuild_hours_ledger', _parse_ledger_rebuild, admin_only=True)
+def rebuild_hours_ledger(params, context):
+    """Regenerar el libro diario de horas de todos los empleados"""
+    from src.services.hours_ledger import hours_ledger
+
+    start_date = date.fromisoformat(params['start_date']) if params.get('start_date') else None
+    end_date = date.fromisoformat(params['end_date']) if params.get('end_date') else None
+    context.progress(0, 1, 'Regenerando libro de horas', force=True)
+    # Publicado como pendiente: ningún worker lee el libro mientras se reescribe
+    # (si falla, la marca queda y el libro se repara al arrancar)
+    markers = hours_ledger.mark_pending(None)
+    rows = hours_ledger.regenerate(None, start_date, end_date)
+    hours_ledger.clear_pending(markers)
+    return {'rows': rows}
+
+
+def _parse_calendar_export(params):
+    month = params.get('month')
+    if month is not None:
+        try:
+            month = int(month)
+        except (TypeError, ValueError):
+            raise ValueError('Mes inválido')
+        if not (1 <= month <= 12):
+            raise ValueError('Mes inválido')
+    return {'year': _year_param(params), 'month': month, 'team_name': params.get('team_name') or None}
+
+
+@job_kind('export_calendar', _parse_calendar_export)
+def export_calendar(params, context):
+    """Exportar a CSV las entradas de calendario de un año o mes"""
+    year, month, team_name = params['year'], params.get('month'), params.get('team_name')
+    if month:
+        start_date = date(year, month, 1)
+        end_date = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    else:
+        start_date, end_date = date(year, 1, 1), date(year + 1, 1, 1)
+
+    query = db.session.query(
+        Employee.id, Employee.full_name, Employee.team_name,
+        CalendarEntry.date, CalendarEntry.activity_type, CalendarEntry.hours, CalendarEntry.notes
+    ).join(CalendarEntry, CalendarEntry.employee_id == Employee.id).filter(
+        CalendarEntry.date >= start_date,
+        CalendarEntry.date < end_date
+    )
+    if team_name:
+        query = query.filter(Employee.team_name == team_name)
+    total = query.order_by(None).count()
+
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['employee_id', 'full_name', 'team_name', 'date', 'activity_type', 'hours', 'notes'])
+    rows = query.order_by(Employee.team_name, Employee.full_name, CalendarEntry.date).execution_options(
+        yield_per=5000)
+    for position, row in enumerate(rows, 1):
+        writer.writerow([row.id, row.full_name, row.team_name, row.date.isoformat(),
+                         row.activity_type, '' if row.hours is None else row.hours, row.notes or ''])
+        if position % 5000 == 0:
+            context.progress(position, total, f'{position}/{total} entradas')
+
+    period = f'{year}-{month:02d}' if month else str(year)
+    return JobFile(f'calendario-{period}.csv', 'text/csv', output.getvalue().encode('utf-8'))
+
+
+# --- Ejecución ---
+
+def _heartbeat(app, job_id, stop):
+    """Renovar updated_at del trabajo en curso hasta que termine"""
+    while not stop.wait(JOBS_HEARTBEAT_SECONDS):
+        try:
+            with app.app_context(), db.engine.begin() as connection:
+                connection.execute(db.update(Job).where(Job.id == job_id, Job.status == 'running')
+                                   .values(updated_at=datetime.utcnow()))
+        except Exception:
+            logger.exception("❌ Error renovando el latido del trabajo %s", job_id)
+
+
+def run_job(job_id):
+    """Ejecutar un trabajo en cola y guardar su resultado (requiere contexto de aplicación)"""
+    job = db.session.get(Job, job_id)
+    if job is None or job.status != 'queued':
+        return
+    kind = JOB_KINDS.get(job.kind)
+    job.status = 'running'
+    job.started_at = datetime.utcnow()
+    db.session.commit()
+    started = time.perf_counter()
+    logger.info("⚙️ Trabajo %s iniciado", job.kind, extra={'job_id': job_id})
+    stop_heartbeat = threading.Event()
+    threading.Thread(target=_heartbeat, args=(current_app._get_current_object(), job_id, stop_heartbeat),
+                     name='job-heartbeat', daemon=True).start()
+
+    try:
+        if kind is None:
+            raise ValueError(f'Tipo de trabajo desconocido: {job.kind}')
+        result = kind.function(json.loads(job.params or '{}'), JobContext(job_id))
+        if isinstance(result, JobFile):
+            filename, content_type, body = result
+        else:
+            filename = f'{job.kind}-{job_id[:8]}.json'
+            content_type = 'application/json'
+            body = current_app.json.dumps({'success': True, 'data': result}).encode('utf-8')
+
+        job = db.session.get(Job, job_id)
+        job.status = 'succeeded'
+        job.progress = 1.0
+        job.result = zlib.compress(body, 6)
+        job.result_content_type = content_type
+        job.result_filename = filename
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        logger.info("✅ Trabajo %s terminado en %.1fs (%d bytes)", job.kind,
+                    time.perf_counter() - started, len(body), extra={'job_id': job_id})
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("❌ Error en el trabajo %s", job_id)
+        job = db.session.get(Job, job_id)
+        job.status = 'failed'
+        job.error = str(e)[:2000]
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+    finally:
+        stop_heartbeat.set()
+        db.session.remove()
+
+
+_worker_app = None
+
+
+def _init_worker():
+    """Inicializador de cada proceso del pool: cargar la aplicación una sola vez"""
+    global _worker_app
+    # Al lanzar con `python -m src.main` el módulo principal ya está cargado como __mp_main__
+    main = sys.modules.get('__mp_main__')
+    app = getattr(main, 'app', None)
+    if not isinstance(app, Flask):
+        from src.main import app
+    _worker_app = app
+
+
+def _run_in_worker(job_id):
+    with _worker_app.app_context():
+        run_job(job_id)
+
+
+class JobRunner:
+    """
+    Trabajos pesados (resúmenes anuales, reconstrucciones, exportaciones) en
+    un pool de procesos.
+
+    Cada trabajo es una fila de la tabla jobs: la petición la crea en cola y
+    responde 202 al momento; un proceso del pool la ejecuta, publica el
+    progreso y guarda el resultado comprimido para descargarlo después. El
+    estado vive en la base de datos, así que cualquier worker web puede
+    responder a las consultas de estado.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._app = None
+        self._lock = threading.Lock()
+        self._executor = None
+        self._in_flight = 0
+
+    def init_app(self, app):
+        """
+        Dar por fallidos los trabajos en curso abandonados (p. ej. por un reinicio).
+
+        Solo los que llevan JOBS_STALE_SECONDS sin latido: los que siguen en
+        cola pueden estar esperando tras trabajos largos en el pool de otro worker.
+        """
+        if multiprocessing.parent_process() is not None:
+            return
+        self._app = app
+        with app.app_context():
+            try:
+                cutoff = datetime.utcnow() - timedelta(seconds=JOBS_STALE_SECONDS)
+                stale = Job.query.filter(
+                    Job.status == 'running',
+                    Job.updated_at < cutoff
+                ).update({'status': 'failed', 'error': 'Trabajo interrumpido', 'finished_at': datetime.utcnow()},
+                         synchronize_session=False)
+                db.session.commit()
+                if stale:
+                    logger.warning("⚠️ %d trabajos interrumpidos marcados como fallidos", stale)
+            except Exception:
+                db.session.rollback()
+                logger.exception("❌ Error revisando trabajos pendientes")
+        metrics.register_gauge('jobs_in_flight', 'Trabajos en cola o en curso en este proceso',
+                               lambda: self._in_flight)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn: los hijos no heredan conexiones ni hilos del worker web
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker
+                )
+                atexit.register(self._executor.shutdown, wait=False, cancel_futures=True)
+            return self._executor
+
+    def submit(self, kind, params, created_by=None):
+        """Crear el trabajo en cola y enviarlo al pool; devuelve el Job"""
+        job = Job(id=str(uuid.uuid4()), kind=kind, params=json.dumps(params), status='queued',
+                  created_by=created_by)
+        db.session.add(job)
+        db.session.commit()
+
+        with self._lock:
+            self._in_flight += 1
+        try:
+            future = self._get_executor().submit(_run_in_worker, job.id)
+        except Exception:
+            # Pool roto (un proceso murió): se recrea en el siguiente envío
+            with self._lock:
+                self._in_flight -= 1
+                self._executor = None
+            job.status = 'failed'
+            job.error = 'No se pudo encolar el trabajo'
+            db.session.commit()
+            raise
+        future.add_done_callback(lambda done, job_id=job.id: self._finished(job_id, done))
+        return job
+
+    def _finished(self, job_id, future):
+        with self._lock:
+            self._in_flight -= 1
+        error = 'cancelado' if future.cancelled() else future.exception()
+        if error is None:
+            return
+        # El proceso murió (o el pool se cerró) antes de que el trabajo registrara su estado
+        logger.error("❌ Trabajo %s perdido: %s", job_id, error)
+        if not future.cancelled():
+            with self._lock:
+                self._executor = None
+        self._mark_lost(job_id, f'Trabajo interrumpido: {error}')
+
+    def _mark_lost(self, job_id, message):
+        """Dar por fallido un trabajo que no terminó (sin tocar los ya resueltos)"""
+        if self._app is None:
+            return
+        try:
+            with self._app.app_context(), db.engine.begin() as connection:
+                connection.execute(
+                    db.update(Job).where(Job.id == job_id, Job.status.in_(('queued', 'running'))).values(
+                        status='failed', error=message[:2000], finished_at=datetime.utcnow()
+                    )
+                )
+        except Exception:
+            logger.exception("❌ Error marcando como fallido el trabajo %s", job_id)
+
+
+job_runner = JobRunner(JOBS_WORKERS)
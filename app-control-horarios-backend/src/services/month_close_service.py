@@ -0,0 +1,121 @@
+import json
+import zlib
+from datetime import datetime
+from src.models.employee import db, MonthClosure
+from src.utils.cache_backend import get_cache
+
+
+class MonthCloseService:
+    """
+    Cierre de mes: congela el forecast de un mes ya pagado.
+
+    Al cerrar se guarda el resumen del Dashboard, el resumen de equipos y el
+    forecast de cada empleado como JSON comprimido. Los meses cerrados se sirven
+    desde esa foto y no admiten cambios en sus entradas hasta reabrirlos.
+    """
+
+    # Meses cerrados y fotos descomprimidas: se comparte solo la invalidación, de modo
+    # que un cierre o una reapertura en un worker llega a todos los demás
+    _cache = get_cache('month_close', share_values=False)
+
+    @classmethod
+    def invalidate_cache(cls):
+        cls._cache.clear()
+
+    @classmethod
+    def _closed_months(cls):
+        return cls._cache.get_or_compute('closed', lambda: frozenset(
+            (year, month) for year, month in db.session.query(
+                MonthClosure.year, MonthClosure.month
+            ).filter(MonthClosure.status == 'closed')
+        ))
+
+    def is_closed(self, year, month):
+        return (year, month) in self._closed_months()
+
+    @staticmethod
+    def _affected_months(date_obj):
+        """Una fecha afecta a su mes y, desde el día 26, también al período INDITEX del mes siguiente"""
+        months = [(date_obj.year, date_obj.month)]
+        if date_obj.day >= 26:
+            months.append((date_obj.year + 1, 1) if date_obj.month == 12 else (date_obj.year, date_obj.month + 1))
+        return months
+
+    def closed_month_for_date(self, date_obj):
+        """
+        Mes cerrado al que afecta una fecha, o None.
+
+        Se usa antes de escribir: se consulta la base de datos y no la caché,
+        para no admitir cambios en un mes que otro worker acaba de cerrar.
+        """
+        months = self._affected_months(date_obj)
+        closed = set(db.session.query(MonthClosure.year, MonthClosure.month).filter(
+            MonthClosure.status == 'closed',
+            db.or_(*(db.and_(MonthClosure.year == year, MonthClosure.month == month) for year, month in months))
+        ).all())
+        for month in months:
+            if month in closed:
+                return month
+        return None
+
+    def get_closures(self):
+        return MonthClosure.query.order_by(MonthClosure.year.desc(), MonthClosure.month.desc()).all()
+
+    def get_snapshot(self, year, month):
+        """Foto congelada de un mes cerrado, o None si el mes está abierto"""
+        if not self.is_closed(year, month):
+            return None
+        return self._cache.get_or_compute(('snapshot', year, month), lambda: self._load_snapshot(year, month))
+
+    @staticmethod
+    def _load_snapshot(year, month):
+        closure = MonthClosure.query.filter_by(year=year, month=month, status='closed').first()
+        if closure is None or closure.snapshot is None:
+            return None
+        return json.loads(zlib.decompress(closure.snapshot).decode('utf-8'))
+
+    def close_month(self, year, month, closed_by=None):
+        """Calcular y guardar la foto del mes (sustituye la de un cierre anterior reabierto)"""
+        from src.utils.hours_calculator import HoursCalculator
+
+        calculator = HoursCalculator()
+        dashboard = calculator.calculate_dashboard_summary(year, month)
+        all_teams = calculator.calculate_all_teams_summary(year, month)
+        if dashboard is None or all_teams is None:
+            raise ValueError('No se pudo calcular el forecast del mes')
+
+        employees = {}
+        for team in all_teams['teams']:
+            for employee_forecast in team['employees']:
+                employees[str(employee_forecast['employee_id'])] = employee_forecast
+
+        snapshot = {
+            'dashboard': dashboard,
+            'all_teams': all_teams,
+            'employees': employees,
+        }
+        payload = zlib.compress(json.dumps(snapshot, separators=(',', ':')).encode('utf-8'), 6)
+
+        closure = MonthClosure.query.filter_by(year=year, month=month).first()
+        if closure is None:
+            closure = MonthClosure(year=year, month=month)
+            db.session.add(closure)
+        closure.status = 'closed'
+        closure.snapshot = payload
+        closure.closed_at = datetime.utcnow()
+        closure.closed_by = closed_by
+        db.session.commit()
+        self.invalidate_cache()
+        return closure
+
+    def reopen_month(self, year, month, reopened_by=None):
+        """Reabrir un mes cerrado; la foto se conserva hasta el siguiente cierre"""
+        closure = MonthClosure.query.filter_by(year=year, month=month, status='closed').first()
+        if closure is None:
+            return None
+        closure.status = 'reopened'
+        closure.reopened_at = datetime.utcnow()
+        closure.reopened_by = reopened_by
+        db.session.commit()
+        self.invalidate_cache()
+        return closure
@@ -0,0 +1,158 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from flask import current_app, jsonify, request
+from flask_security.utils import get_hmac, use_double_hash
+from src.utils.instrumentation import metrics
+
+logger = logging.getLogger(__name__)
+
+# Hilos que calculan bcrypt (bcrypt libera el GIL: se ejecutan en paralelo)
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', str(min(4, os.cpu_count() or 1))))
+# Verificaciones en curso o en cola a partir de las que se rechazan logins nuevos
+PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', str(PASSWORD_HASH_WORKERS * 4)))
+# Espera máxima de una verificación (cola incluida) antes de responder 503
+PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', '10'))
+PASSWORD_HASH_RETRY_AFTER = 2
+
+# Vistas de Flask-Security que verifican una contraseña
+PASSWORD_ENDPOINTS = {'security.login', 'security.verify', 'security.change_password'}
+LOGIN_ENDPOINT = 'security.login'
+
+
+class PasswordHashingOverloaded(Exception):
+    """El pool de hashing está saturado o la verificación ha superado el tiempo máximo"""
+
+
+class PasswordHashExecutor:
+    """
+    Pool acotado para el hashing de contraseñas.
+
+    Cada login cuesta decenas de milisegundos de CPU en bcrypt; con un pool de
+    pocos hilos una ráfaga de logins no puede ocupar todos los workers ni toda
+    la CPU, y cuando la cola supera max_pending se rechaza en el acto (503)
+    en lugar de dejar esperando al resto del tráfico.
+    """
+
+    def __init__(self, workers, max_pending, timeout):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = 0
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def saturated(self):
+        return self._pending >= self.max_pending
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix='password-hash')
+        return self._executor
+
+    def _release(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    def run(self, function, *args):
+        """Ejecutar function(*args) en el pool y esperar el resultado"""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise PasswordHashingOverloaded(f'{self._pending} verificaciones pendientes')
+            self._pending += 1
+        queued = time.perf_counter()
+
+        def task():
+            started = time.perf_counter()
+            try:
+                return function(*args)
+            finally:
+                metrics.observe_password_hash(started - queued, time.perf_counter() - started)
+
+        try:
+            future = self._get_executor().submit(task)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        # El hueco se libera al terminar la tarea, no cuando deja de esperarla la petición
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise PasswordHashingOverloaded(f'verificación sin terminar tras {self.timeout}s')
+
+
+password_hasher = PasswordHashExecutor(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING, PASSWORD_HASH_TIMEOUT)
+
+
+def verify_and_update_password(user, password):
+    """
+    Como flask_security.utils.verify_and_update_password, con bcrypt en el pool.
+
+    Si el hash guardado usa otro esquema o un coste distinto del configurado
+    (PASSWORD_HASH_ROUNDS), se sustituye por uno nuevo calculado en la misma
+    tarea; la vista de login hace el commit.
+    """
+    security = current_app.extensions['security']
+    secret = get_hmac(password) if use_double_hash(user.password) else password
+    verified, new_hash = password_hasher.run(security.pwd_context.verify_and_update, secret, user.password)
+    if verified and new_hash:
+        user.password = new_hash
+        security.datastore.put(user)
+        logger.info("🔐 Hash de contraseña actualizado al coste configurado", extra={'user_id': user.id})
+    return verified
+
+
+def _overloaded_response():
+    response = jsonify({
+        'success': False,
+        'message': 'Demasiados inicios de sesión simultáneos, inténtalo de nuevo en unos segundos'
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = str(PASSWORD_HASH_RETRY_AFTER)
+    return response
+
+
+def init_password_hashing(app):
+    """Admisión por profundidad de cola en las vistas con contraseña y métricas de login"""
+
+    @app.before_request
+    def _admit_password_request():
+        if request.method == 'POST' and request.endpoint in PASSWORD_ENDPOINTS and password_hasher.saturated():
+            logger.warning("⚠️ Login rechazado: pool de hashing saturado",
+                           extra={'pending': password_hasher.pending})
+            return _overloaded_response()
+
+    @app.errorhandler(PasswordHashingOverloaded)
+    def _password_hashing_overloaded(error):
+        logger.warning("⚠️ Verificación de contraseña rechazada: %s", error)
+        return _overloaded_response()
+
+    @app.after_request
+    def _count_login(response):
+        if request.method == 'POST' and request.endpoint == LOGIN_ENDPOINT:
+            if response.status_code == 503:
+                result = 'rejected'
+            elif response.status_code < 400:
+                result = 'success'
+            else:
+                result = 'failure'
+            metrics.observe_login(result)
+        return response
+
+    metrics.register_gauge('password_hash_pending', 'Verificaciones de contraseña en curso o en cola',
+                           lambda: password_hasher.pending)
+    metrics.register_gauge('password_hash_workers', 'Hilos del pool de hashing de contraseñas',
+                           lambda: password_hasher.workers)
+    return password_hasher
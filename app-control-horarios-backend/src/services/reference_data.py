@@ -0,0 +1,123 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+from collections import namedtuple
+from itertools import chain
+from types import MappingProxyType
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from src.models.employee import db, AutonomousCommunity, Province, Employee, CalendarEntry
+from src.utils.cache_backend import get_cache
+
+logger = logging.getLogger(__name__)
+
+# Segundos que navegadores y proxies pueden reutilizar las respuestas sin revalidar
+REFERENCE_MAX_AGE = int(os.getenv('REFERENCE_MAX_AGE', '86400'))
+
+# Foto inmutable de los datos de referencia: versión y cuerpos JSON ya serializados por sección
+ReferenceSnapshot = namedtuple('ReferenceSnapshot', ['version', 'bodies'])
+
+# Solo se comparte la invalidación: cada worker recarga su foto (son pocas filas)
+_cache = get_cache('reference', share_values=False)
+
+
+def load_reference():
+    """Leer los datos de referencia y serializar una sola vez cada respuesta que los sirve"""
+    communities = db.session.query(AutonomousCommunity.id, AutonomousCommunity.name) \
+        .order_by(AutonomousCommunity.name).all()
+    provinces = db.session.query(Province.id, Province.name, Province.autonomous_community_id) \
+        .order_by(Province.name).all()
+    holiday_communities = Employee.get_autonomous_communities()
+
+    data = {
+        'autonomous_communities': [{'id': row.id, 'name': row.name} for row in communities],
+        'provinces': [{
+            'id': row.id,
+            'name': row.name,
+            'autonomous_community_id': row.autonomous_community_id
+        } for row in provinces],
+        'holiday_communities': holiday_communities,
+        'activity_types': CalendarEntry.get_activity_types()
+    }
+    dumps = current_app.json.dumps_bytes
+    # Versión por contenido: todos los workers calculan la misma sin coordinarse
+    version = hashlib.sha1(dumps(data, sort_keys=True)).hexdigest()[:16]
+
+    # Las rutas sirven bytes ya serializados: nada que mutar ni que volver a codificar
+    bodies = MappingProxyType({
+        'autonomous_communities': dumps(data['autonomous_communities']),
+        'provinces': dumps(data['provinces']),
+        'holiday_communities': dumps({
+            'success': True,
+            'data': {
+                'communities': holiday_communities,
+                'total_communities': len(holiday_communities)
+            }
+        }),
+        'bundle': dumps({
+            'success': True,
+            'data': {'version': version, **data}
+        })
+    })
+    logger.info("📚 Datos de referencia cargados (versión %s)", version,
+                extra={'communities': len(communities), 'provinces': len(provinces)})
+    return ReferenceSnapshot(version, bodies)
+
+
+def get_reference():
+    """Foto actual de los datos de referencia (se carga al arrancar y tras cambios)"""
+    return _cache.get_or_compute('snapshot', load_reference)
+
+
+def invalidate_reference():
+    """Descartar la foto en todos los workers; la siguiente petición la recarga"""
+    _cache.clear()
+
+
+def reference_response(name, private=False):
+    """
+    Respuesta con el cuerpo ya serializado de una sección y ETag versionado.
+
+    La compresión reutiliza el ETag y responde 304 a If-None-Match; con
+    `private` solo la cachea el navegador (rutas autenticadas).
+    """
+    snapshot = get_reference()
+    response = current_app.response_class(snapshot.bodies[name], mimetype='application/json')
+    response.set_etag(f'{snapshot.version}-{name}')
+    response.cache_control.public = not private
+    response.cache_control.private = private
+    response.cache_control.max_age = REFERENCE_MAX_AGE
+    return response
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_reference_changes(session, flush_context):
+    for instance in chain(session.new, session.dirty, session.deleted):
+        if isinstance(instance, (AutonomousCommunity, Province)):
+            session.info['_reference_changed'] = True
+            return
+
+
+@event.listens_for(Session, 'after_commit')
+def _reload_after_commit(session):
+    if session.info.pop('_reference_changed', False):
+        invalidate_reference()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_reference_changes(session):
+    session.info.pop('_reference_changed', None)
+
+
+def init_reference_data(app):
+    """Precargar los datos de referencia al arrancar (salvo en los procesos de trabajos)"""
+    if multiprocessing.parent_process() is not None:
+        return
+    try:
+        with app.app_context():
+            get_reference()
+    except Exception:
+        # Sin tablas todavía (p. ej. base de datos nueva): se cargan en la primera petición
+        logger.exception("❌ Error precargando los datos de referencia")
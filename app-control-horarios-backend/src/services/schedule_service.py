@@ -0,0 +1,157 @@
+from bisect import bisect_right
+from datetime import date, timedelta
+from flask import g, has_app_context
+from src.models.employee import db, EmployeeSchedule
+from src.utils.schedule_rules import DEFAULT_PROFILE
+
+# Inicio del primer tramo cuando se historiza el horario original de un empleado
+SCHEDULE_BASELINE_DATE = date(2000, 1, 1)
+
+_KEEP_PROFILE = object()
+
+
+class ScheduleIndex:
+    """
+    Índice de intervalos de horario por empleado.
+
+    Para cada empleado guarda los tramos ordenados por fecha de inicio y resuelve
+    el horario aplicable a un día con una búsqueda binaria.
+    """
+
+    def __init__(self, schedules):
+        self._starts = {}
+        self._intervals = {}
+        for schedule in sorted(schedules, key=lambda s: (s.employee_id, s.effective_from)):
+            self._starts.setdefault(schedule.employee_id, []).append(schedule.effective_from)
+            self._intervals.setdefault(schedule.employee_id, []).append(
+                (schedule.effective_to, schedule.hours_mon_thu, schedule.hours_fri,
+                 schedule.profile or DEFAULT_PROFILE)
+            )
+
+    @classmethod
+    def load(cls):
+        """Carga todos los tramos con una única consulta"""
+        rows = db.session.query(
+            EmployeeSchedule.employee_id, EmployeeSchedule.effective_from, EmployeeSchedule.effective_to,
+            EmployeeSchedule.hours_mon_thu, EmployeeSchedule.hours_fri, EmployeeSchedule.profile
+        ).all()
+        return cls(rows)
+
+    def schedule_for(self, employee, date_obj):
+        """(horas lunes-jueves, horas viernes, perfil) vigentes para el empleado en date_obj"""
+        starts = self._starts.get(employee.id)
+        if starts:
+            position = bisect_right(starts, date_obj) - 1
+            if position >= 0:
+                effective_to, hours_mon_thu, hours_fri, profile = self._intervals[employee.id][position]
+                if effective_to is None or date_obj <= effective_to:
+                    return hours_mon_thu, hours_fri, profile
+        # Sin tramo aplicable: horario actual del empleado
+        return employee.hours_mon_thu, employee.hours_fri, DEFAULT_PROFILE
+
+    def segments(self, employee, start_date, end_date):
+        """
+        Divide [start_date, end_date] en tramos con un mismo horario.
+
+        Devuelve una lista de (inicio, fin, horas lunes-jueves, horas viernes, perfil).
+        """
+        segments = []
+        current = start_date
+        while current <= end_date:
+            hours_mon_thu, hours_fri, profile = self.schedule_for(employee, current)
+            segment_end = end_date
+            starts = self._starts.get(employee.id) or []
+            position = bisect_right(starts, current) - 1
+            if position >= 0:
+                effective_to = self._intervals[employee.id][position][0]
+                if effective_to is not None and current <= effective_to < segment_end:
+                    segment_end = effective_to
+            if position + 1 < len(starts) and starts[position + 1] - timedelta(days=1) < segment_end:
+                segment_end = starts[position + 1] - timedelta(days=1)
+            segments.append((current, segment_end, hours_mon_thu, hours_fri, profile))
+            current = segment_end + timedelta(days=1)
+        return segments
+
+
+def get_schedule_index():
+    """Índice de horarios cargado una sola vez por petición (o contexto de aplicación)"""
+    if not has_app_context():
+        return ScheduleIndex.load()
+    index = g.get('_schedule_index')
+    if index is None:
+        index = ScheduleIndex.load()
+        g._schedule_index = index
+    return index
+
+
+class ScheduleService:
+    """Servicio para el histórico de horarios (jornadas con fecha de efecto)"""
+
+    def get_schedules(self, employee_id):
+        return EmployeeSchedule.query.filter_by(employee_id=employee_id).order_by(EmployeeSchedule.effective_from).all()
+
+    def get_schedules_by_employee(self, employee_ids):
+        """Tramos de varios empleados con una sola consulta: {employee_id: [tramos]}"""
+        schedules = {employee_id: [] for employee_id in employee_ids}
+        if not schedules:
+            return schedules
+        query = EmployeeSchedule.query.filter(
+            EmployeeSchedule.employee_id.in_(list(schedules))
+        ).order_by(EmployeeSchedule.effective_from)
+        for schedule in query:
+            schedules[schedule.employee_id].append(schedule)
+        return schedules
+
+    def set_schedule(self, employee, effective_from, hours_mon_thu, hours_fri, schedules=None,
+                     profile=_KEEP_PROFILE):
+        """
+        Registrar un nuevo horario a partir de effective_from.
+
+        Si el empleado no tenía histórico se guarda primero su horario actual como
+        tramo base, para que los meses anteriores no cambien. El tramo vigente en
+        effective_from se cierra el día anterior y los posteriores se sustituyen.
+        Sin `profile` se mantiene el perfil de jornada del tramo vigente (None es
+        el perfil por defecto). `schedules` permite pasar los tramos ya cargados.
+        No hace commit.
+        """
+        if schedules is None:
+            schedules = self.get_schedules(employee.id)
+        if profile is _KEEP_PROFILE:
+            current = [schedule for schedule in schedules
+                       if schedule.effective_from <= effective_from
+                       and (schedule.effective_to is None or schedule.effective_to >= effective_from)]
+            profile = max(current, key=lambda schedule: schedule.effective_from).profile if current else None
+        if not schedules and effective_from > SCHEDULE_BASELINE_DATE:
+            baseline = EmployeeSchedule(
+                employee_id=employee.id,
+                effective_from=SCHEDULE_BASELINE_DATE,
+                hours_mon_thu=employee.hours_mon_thu,
+                hours_fri=employee.hours_fri
+            )
+            db.session.add(baseline)
+            schedules = [baseline]
+
+        new_schedule = None
+        for schedule in schedules:
+            if schedule.effective_from == effective_from:
+                new_schedule = schedule
+            elif schedule.effective_from > effective_from:
+                db.session.delete(schedule)
+            elif schedule.effective_to is None or schedule.effective_to >= effective_from:
+                schedule.effective_to = effective_from - timedelta(days=1)
+
+        if new_schedule is None:
+            new_schedule = EmployeeSchedule(employee_id=employee.id, effective_from=effective_from)
+            db.session.add(new_schedule)
+        new_schedule.effective_to = None
+        new_schedule.hours_mon_thu = hours_mon_thu
+        new_schedule.hours_fri = hours_fri
+        new_schedule.profile = profile
+
+        # El horario del empleado refleja siempre el vigente hoy
+        if effective_from <= date.today():
+            employee.hours_mon_thu = hours_mon_thu
+            employee.hours_fri = hours_fri
+
+        g.pop('_schedule_index', None)
+        return new_schedule
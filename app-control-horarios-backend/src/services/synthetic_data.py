@@ -0,0 +1,153 @@
+import random
+from datetime import date, timedelta
+from src.models.employee import db, Employee, CalendarEntry, Holiday, AutonomousCommunity
+from src.services.holiday_generator import SpanishHolidayGenerator
+
+# Las 17 comunidades y las 2 ciudades autónomas
+COMMUNITY_NAMES = [
+    'Andalucía', 'Aragón', 'Asturias', 'Baleares', 'Canarias', 'Cantabria',
+    'Castilla-La Mancha', 'Castilla y León', 'Cataluña', 'Comunidad Valenciana',
+    'Extremadura', 'Galicia', 'La Rioja', 'Madrid', 'Murcia', 'Navarra',
+    'País Vasco', 'Ceuta', 'Melilla'
+]
+
+# Jornadas habituales (lunes-jueves, viernes)
+SCHEDULES = [(8.5, 6.5), (8.0, 7.0), (8.0, 8.0), (7.5, 7.5), (6.0, 6.0)]
+
+FIRST_NAMES = ['Ana', 'Luis', 'María', 'Javier', 'Lucía', 'Carlos', 'Elena', 'Pablo',
+               'Marta', 'Diego', 'Laura', 'Sergio', 'Paula', 'Raúl', 'Sara', 'Andrés']
+LAST_NAMES = ['García', 'Fernández', 'López', 'Martínez', 'Sánchez', 'Pérez', 'Gómez',
+              'Martín', 'Jiménez', 'Ruiz', 'Hernández', 'Díaz', 'Moreno', 'Álvarez']
+
+# Filas por INSERT multi-fila
+INSERT_CHUNK_SIZE = 5000
+
+
+class SyntheticDataGenerator:
+    """
+    Generador de datos sintéticos para pruebas de rendimiento.
+
+    Crea las 19 comunidades si faltan, los festivos de cada año, N empleados
+    repartidos en equipos y comunidades, y para cada empleado y año entradas
+    realistas: vacaciones (V) en bloques de verano y Navidad más días sueltos,
+    ausencias (F), horas de libre disposición (HLD) y guardias (G) en fin de
+    semana. Con la misma semilla se generan siempre los mismos datos.
+    """
+
+    def __init__(self, seed=42):
+        self.random = random.Random(seed)
+
+    def seed_communities(self):
+        """Crear las comunidades que falten y devolver sus ids"""
+        existing = {name for (name,) in db.session.query(AutonomousCommunity.name)}
+        missing = [{'name': name} for name in COMMUNITY_NAMES if name not in existing]
+        if missing:
+            db.session.execute(db.insert(AutonomousCommunity), missing)
+            db.session.commit()
+        return [community_id for (community_id,) in
+                db.session.query(AutonomousCommunity.id).order_by(AutonomousCommunity.id)]
+
+    def seed_holidays(self, years):
+        generator = SpanishHolidayGenerator()
+        for year in years:
+            generator.sync_year(year)
+        return db.session.query(db.func.count(Holiday.id)).scalar()
+
+    def seed_employees(self, count, community_ids, team_size=25):
+        """Insertar `count` empleados en equipos de ~team_size y devolver sus ids"""
+        teams = max(1, count // team_size)
+        offset = db.session.query(db.func.count(Employee.id)).scalar()
+        rows = []
+        for index in range(count):
+            hours_mon_thu, hours_fri = self.random.choice(SCHEDULES)
+            rows.append({
+                'team_name': f'Equipo {index % teams + 1:03d}',
+                'full_name': (f'{self.random.choice(FIRST_NAMES)} {self.random.choice(LAST_NAMES)} '
+                              f'{offset + index + 1:05d}'),
+                'hours_mon_thu': hours_mon_thu,
+                'hours_fri': hours_fri,
+                'vacation_days': self.random.choice([22, 22, 23, 25]),
+                'free_hours': self.random.choice([8, 16, 24, 40]),
+                'autonomous_community_id': self.random.choice(community_ids),
+            })
+        self._insert(Employee, rows)
+        return [employee_id for (employee_id,) in
+                db.session.query(Employee.id).order_by(Employee.id).offset(offset)]
+
+    def seed_entries(self, employee_ids, years):
+        """Insertar las entradas de calendario de cada empleado y año"""
+        vacation_days = dict(db.session.query(Employee.id, Employee.vacation_days))
+        total = 0
+        rows = []
+        for employee_id in employee_ids:
+            for year in years:
+                rows.extend(self._employee_year_entries(employee_id, year, vacation_days.get(employee_id, 22)))
+            if len(rows) >= INSERT_CHUNK_SIZE:
+                total += self._insert(CalendarEntry, rows)
+                rows = []
+        total += self._insert(CalendarEntry, rows)
+        return total
+
+    def generate(self, employees, years):
+        """Generar el conjunto completo; devuelve los totales creados"""
+        community_ids = self.seed_communities()
+        holidays = self.seed_holidays(years)
+        employee_ids = self.seed_employees(employees, community_ids)
+        entries = self.seed_entries(employee_ids, years)
+        return {
+            'communities': len(community_ids),
+            'holidays': holidays,
+            'employees': len(employee_ids),
+            'entries': entries,
+        }
+
+    def _employee_year_entries(self, employee_id, year, vacation_days):
+        days = {}
+
+        def workdays_from(start, count):
+            current = start
+            while count > 0:
+                if current.weekday() < 5 and current.year == year:
+                    days.setdefault(current, ('V', None))
+                    count -= 1
+                current += timedelta(days=1)
+                if current.year != year:
+                    break
+
+        # Vacaciones: dos semanas en verano, una en Navidad y el resto sueltas
+        summer = date(year, 7, 1) + timedelta(days=self.random.randrange(50))
+        workdays_from(summer, 10)
+        workdays_from(date(year, 12, 22), min(5, max(vacation_days - 10, 0)))
+        for _ in range(max(vacation_days - 15, 0)):
+            workdays_from(date(year, 1, 1) + timedelta(days=self.random.randrange(355)), 1)
+
+        # Ausencias, horas de libre disposición y guardias de fin de semana
+        for _ in range(self.random.randint(0, 3)):
+            day = self._random_weekday(year)
+            days.setdefault(day, ('F', None))
+        for _ in range(self.random.randint(2, 6)):
+            day = self._random_weekday(year)
+            days.setdefault(day, ('HLD', float(self.random.choice([1, 2, 3, 4]))))
+        for _ in range(self.random.randint(0, 8)):
+            day = self._random_weekday(year)
+            day += timedelta(days=5 - day.weekday())  # sábado de esa semana
+            if day.year == year:
+                days.setdefault(day, ('G', float(self.random.choice([4, 6, 8]))))
+
+        return [
+            {'employee_id': employee_id, 'date': day, 'activity_type': activity_type, 'hours': hours}
+            for day, (activity_type, hours) in days.items() if day.year == year
+        ]
+
+    def _random_weekday(self, year):
+        day = date(year, 1, 1) + timedelta(days=self.random.randrange(365))
+        if day.weekday() >= 5:
+            day -= timedelta(days=day.weekday() - 4)
+        return day
+
+    @staticmethod
+    def _insert(model, rows):
+        for offset in range(0, len(rows), INSERT_CHUNK_SIZE):
+            db.session.execute(db.insert(model), rows[offset:offset + INSERT_CHUNK_SIZE])
+        db.session.commit()
+        return len(rows)
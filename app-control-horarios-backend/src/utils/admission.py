@@ -0,0 +1,260 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from flask import current_app, g, jsonify, request
+from flask_security import current_user
+from src.models.employee import db
+from src.utils.instrumentation import metrics
+
+logger = logging.getLogger(__name__)
+
+# Huecos de admisión (0 = tantos como conexiones admite el pool de la base de datos)
+ADMISSION_DB_SLOTS = int(os.getenv('ADMISSION_DB_SLOTS', '0'))
+# Huecos que solo pueden ocupar las escrituras interactivas
+ADMISSION_RESERVED_SLOTS = int(os.getenv('ADMISSION_RESERVED_SLOTS', '2'))
+# Límites por defecto de cada ruta pesada: peticiones simultáneas y peticiones en espera
+ADMISSION_HEAVY_CONCURRENCY = int(os.getenv('ADMISSION_HEAVY_CONCURRENCY', '2'))
+ADMISSION_HEAVY_QUEUE = int(os.getenv('ADMISSION_HEAVY_QUEUE', '4'))
+# Espera máxima por un hueco antes de responder 503
+ADMISSION_TIMEOUT = float(os.getenv('ADMISSION_TIMEOUT', '10'))
+ADMISSION_RETRY_AFTER = int(os.getenv('ADMISSION_RETRY_AFTER', '5'))
+
+# Carriles, de más a menos prioritario
+INTERACTIVE = 'interactive'  # escrituras (POST/PUT/PATCH/DELETE)
+READ = 'read'  # lecturas normales
+HEAVY = 'heavy'  # rutas marcadas con @concurrency_limit
+BACKGROUND = 'background'  # hilos del proceso web que usan la base de datos (libro de horas, calentamiento)
+LANES = (INTERACTIVE, READ, HEAVY, BACKGROUND)
+WRITE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+READ_METHODS = {'GET', 'HEAD'}
+
+
+class AdmissionRejected(Exception):
+    """No hay hueco para la petición: cola de la ruta llena o espera agotada"""
+
+
+def concurrency_limit(concurrency=None, queue=None):
+    """
+    Marca una ruta como pesada (carril de baja prioridad).
+
+    Se coloca junto a @query_budget. Como mucho `concurrency` peticiones de la
+    ruta se ejecutan a la vez y `queue` esperan; el resto recibe 503 con
+    Retry-After en el acto.
+    """
+    def decorator(view):
+        view._concurrency_limit = (concurrency or ADMISSION_HEAVY_CONCURRENCY,
+                                   ADMISSION_HEAVY_QUEUE if queue is None else queue)
+        return view
+    return decorator
+
+
+class _RouteLimit:
+    def __init__(self, concurrency, queue):
+        self.concurrency = concurrency
+        self.queue = queue
+        self.active = 0
+        self.waiting = 0
+
+
+class AdmissionController:
+    """
+    Admisión con carriles de prioridad sobre las conexiones del pool.
+
+    Todo lo que usa la base de datos en el proceso web pasa por aquí: las
+    peticiones autenticadas (escrituras, lecturas y rutas pesadas) y los
+    hilos en segundo plano (carril BACKGROUND). Garantía: lo que no es una
+    escritura interactiva nunca ocupa más de `slots - reserved` huecos, y una
+    escritura en espera entra antes que cualquier otro carril; así quedan
+    siempre `reserved` conexiones del pool para las escrituras. No cubre las
+    peticiones anónimas (no se encolan: las rutas protegidas responden 401 y
+    las públicas no tocan el pool o lo hacen brevemente) ni los procesos de
+    trabajos, que tienen su propio pool.
+    """
+
+    def __init__(self):
+        self.slots = None  # None = sin configurar: todo entra sin esperar
+        self.reserved = 0
+        self.timeout = ADMISSION_TIMEOUT
+        self._condition = threading.Condition()
+        self._in_use = dict.fromkeys(LANES, 0)
+        self._waiting = dict.fromkeys(LANES, 0)
+        self._routes = {}  # ruta o nombre -> _RouteLimit
+
+    def configure(self, slots, reserved, timeout):
+        with self._condition:
+            self.slots = slots
+            self.reserved = max(min(reserved, slots - 1), 0)
+            self.timeout = timeout
+            self._condition.notify_all()
+
+    @property
+    def in_use(self):
+        return sum(self._in_use.values())
+
+    def waiting(self, lane):
+        return self._waiting[lane]
+
+    def _route_limit(self, key, limit):
+        route = self._routes.get(key)
+        if route is None:
+            route = self._routes[key] = _RouteLimit(*limit)
+        return route
+
+    def _can_enter(self, lane, route):
+        if self.in_use >= self.slots:
+            return False
+        if lane == INTERACTIVE:
+            return True
+        if self._waiting[INTERACTIVE]:
+            return False
+        if self.in_use - self._in_use[INTERACTIVE] >= self.slots - self.reserved:
+            return False
+        # Las lecturas normales pasan por delante de las pesadas y del segundo plano
+        if lane in (HEAVY, BACKGROUND) and self._waiting[READ]:
+            return False
+        return route is None or route.active < route.concurrency
+
+    def acquire(self, lane, key=None, limit=None, timeout=None):
+        """
+        Esperar un hueco en el carril; devuelve el ticket para release().
+
+        `key`/`limit` aplican además un límite (concurrencia, cola) por ruta o
+        tarea. `timeout` None usa el configurado; en BACKGROUND se espera sin límite.
+        """
+        with self._condition:
+            if self.slots is None:
+                return None
+            route = self._route_limit(key, limit) if limit is not None else None
+            if self._can_enter(lane, route):
+                return self._enter(lane, route)
+            if route is not None and route.waiting >= route.queue:
+                raise AdmissionRejected(f'cola llena ({route.waiting} en espera, {route.active} en curso)')
+
+            if timeout is None:
+                timeout = None if lane == BACKGROUND else self.timeout
+            deadline = None if timeout is None else time.monotonic() + timeout
+            self._waiting[lane] += 1
+            if route is not None:
+                route.waiting += 1
+            try:
+                while not self._can_enter(lane, route):
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise AdmissionRejected(f'sin hueco tras {timeout}s')
+                    self._condition.wait(remaining)
+            finally:
+                self._waiting[lane] -= 1
+                if route is not None:
+                    route.waiting -= 1
+                # Quien deja de esperar puede desbloquear a carriles de menos prioridad
+                self._condition.notify_all()
+            return self._enter(lane, route)
+
+    def _enter(self, lane, route):
+        self._in_use[lane] += 1
+        if route is not None:
+            route.active += 1
+        return lane, route
+
+    def release(self, ticket):
+        if ticket is None:
+            return
+        lane, route = ticket
+        with self._condition:
+            self._in_use[lane] -= 1
+            if route is not None:
+                route.active -= 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, lane=BACKGROUND, name=None, concurrency=1):
+        """Ocupar un hueco fuera de una petición (hilos en segundo plano)"""
+        ticket = self.acquire(lane, name, (concurrency, float('inf')) if name else None)
+        try:
+            yield
+        finally:
+            self.release(ticket)
+
+
+admission = AdmissionController()
+
+
+def _pool_slots(app):
+    """Conexiones que puede abrir el pool de SQLAlchemy (pool_size + max_overflow)"""
+    with app.app_context():
+        pool = db.engine.pool
+    size = getattr(pool, 'size', None)
+    if size is None:
+        return 5
+    return size() + max(getattr(pool, '_max_overflow', 0), 0)
+
+
+def _lane():
+    """Carril de la petición actual (None si no pasa por admisión)"""
+    view = current_app.view_functions.get(request.endpoint)
+    limit = getattr(view, '_concurrency_limit', None)
+    if limit is not None:
+        return HEAVY, limit
+    if request.method in WRITE_METHODS:
+        return INTERACTIVE, None
+    if request.method in READ_METHODS:
+        return READ, None
+    return None, None
+
+
+def _rejected_response():
+    response = jsonify({
+        'success': False,
+        'message': 'Servidor ocupado, inténtalo de nuevo en unos segundos'
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = str(ADMISSION_RETRY_AFTER)
+    return response
+
+
+def init_admission(app):
+    """Admisión por carriles antes de cada vista; el hueco se libera al terminar la petición"""
+    admission.configure(ADMISSION_DB_SLOTS or _pool_slots(app), ADMISSION_RESERVED_SLOTS, ADMISSION_TIMEOUT)
+
+    @app.before_request
+    def _admit_request():
+        if request.url_rule is None:
+            return None
+        lane, limit = _lane()
+        if lane is None:
+            return None
+        # Autenticación antes de encolar: las peticiones anónimas no ocupan colas ni huecos
+        if not current_user.is_authenticated:
+            return None
+        # Cargar la identidad puede haber abierto una transacción: se cierra para no
+        # retener una conexión del pool mientras se espera hueco
+        session = db.session()
+        if session.in_transaction():
+            session.commit()
+        started = time.perf_counter()
+        try:
+            g._admission_ticket = admission.acquire(lane, request.endpoint if limit else None, limit)
+        except AdmissionRejected as e:
+            metrics.observe_admission(lane, request.url_rule.rule, time.perf_counter() - started, False)
+            logger.warning("⚠️ Petición rechazada por admisión (%s): %s", lane, e,
+                           extra={'route': request.url_rule.rule})
+            return _rejected_response()
+        metrics.observe_admission(lane, request.url_rule.rule, time.perf_counter() - started, True)
+        return None
+
+    @app.teardown_request
+    def _release_admission(exception=None):
+        ticket = g.pop('_admission_ticket', None)
+        if ticket is not None:
+            admission.release(ticket)
+
+    metrics.register_gauge('admission_slots', 'Huecos de admisión (conexiones del pool)',
+                           lambda: admission.slots)
+    metrics.register_gauge('admission_in_use', 'Huecos de admisión ocupados', lambda: admission.in_use)
+    for lane in LANES:
+        metrics.register_gauge(f'admission_waiting_{lane}', f'Peticiones o tareas del carril {lane} esperando hueco',
+                               lambda lane=lane: admission.waiting(lane))
+    logger.info("🚦 Admisión: %d huecos, %d reservados para escrituras", admission.slots, admission.reserved)
+    return admission
@@ -0,0 +1,528 @@
+import ast
+import logging
+import os
+import pickle
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit, unquote
+
+logger = logging.getLogger(__name__)
+
+# 'memory' (solo en proceso), 'sqlite:////ruta/cache.db' o 'redis://host:6379/0'
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory')
+# Entradas locales por espacio de nombres (LRU)
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '50000'))
+# Vida de las entradas en el almacén compartido (segundos)
+CACHE_TTL = int(os.getenv('CACHE_TTL', str(24 * 3600)))
+# Cada cuánto se comprueba si otro proceso ha invalidado un espacio de nombres
+CACHE_SYNC_INTERVAL = float(os.getenv('CACHE_SYNC_INTERVAL', '1.0'))
+# Espera máxima a que otro hilo o proceso termine de calcular la misma clave
+SINGLE_FLIGHT_TIMEOUT = float(os.getenv('SINGLE_FLIGHT_TIMEOUT', '30'))
+SINGLE_FLIGHT_POLL = 0.05
+# Tras un fallo del almacén compartido se trabaja solo en proceso durante este tiempo
+CACHE_RETRY_AFTER = 5.0
+
+_MISSING = object()
+
+
+class SQLiteBackend:
+    """
+    Almacén compartido entre los workers de una máquina en un fichero SQLite.
+
+    Con la ruta en /dev/shm el fichero vive en memoria compartida.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        with self._connection() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires REAL)')
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        row = self._connection().execute(
+            'SELECT value FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)', (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl=None):
+        self._connection().execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+            (key, value, time.time() + ttl if ttl else None)
+        )
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            self._connection().execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+
+    def add(self, key, value, ttl=None):
+        """Guardar solo si la clave no existe (o ha caducado); True si se ha guardado"""
+        connection = self._connection()
+        connection.execute('DELETE FROM cache WHERE key = ? AND expires <= ?', (key, time.time()))
+        cursor = connection.execute(
+            'INSERT OR IGNORE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+            (key, value, time.time() + ttl if ttl else None)
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, keys):
+        keys = list(keys)
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            self._connection().execute(
+                f'DELETE FROM cache WHERE key IN ({",".join("?" * len(chunk))})', chunk)
+
+    def keys(self, prefix):
+        return [key for (key,) in self._connection().execute(
+            'SELECT key FROM cache WHERE key >= ? AND key < ? AND (expires IS NULL OR expires > ?)',
+            (prefix, prefix + '\uffff', time.time())
+        )]
+
+    def delete_prefix(self, prefix):
+        self._connection().execute('DELETE FROM cache WHERE key >= ? AND key < ?', (prefix, prefix + '\uffff'))
+
+    def generation(self, key):
+        value = self.get(key)
+        return int(value) if value is not None else 0
+
+    def bump(self, key):
+        connection = self._connection()
+        connection.execute(
+            'INSERT INTO cache (key, value, expires) VALUES (?, 1, NULL) '
+            'ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1', (key,))
+        return self.generation(key)
+
+
+class RedisError(Exception):
+    """Respuesta de error de un servidor con protocolo Redis"""
+
+
+class RedisBackend:
+    """
+    Almacén compartido en un servidor con protocolo Redis (RESP).
+
+    Cliente mínimo sin dependencias, una conexión por hilo; sirve igual con
+    Redis, Valkey, KeyDB o el servidor de pruebas src.benchmarks.resp_stub.
+    """
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.hostname or 'localhost'
+        self.port = parts.port or 6379
+        self.password = unquote(parts.password) if parts.password else None
+        self.database = int(parts.path.strip('/') or 0)
+        self.timeout = 2.0
+        self._local = threading.local()
+
+    def _connect(self):
+        connection = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.connection = connection
+        self._local.reader = connection.makefile('rb')
+        if self.password:
+            self._call('AUTH', self.password)
+        if self.database:
+            self._call('SELECT', self.database)
+
+    def _call(self, *args):
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode('utf-8')
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        self._local.connection.sendall(b''.join(parts))
+        return self._read()
+
+    def _read(self):
+        line = self._local.reader.readline()
+        if not line:
+            raise ConnectionError('Conexión cerrada por el servidor de caché')
+        kind, payload = line[:1], line[1:-2]
+        if kind == b'+':
+            return payload.decode('utf-8')
+        if kind == b'-':
+            raise RedisError(payload.decode('utf-8'))
+        if kind == b':':
+            return int(payload)
+        if kind == b'$':
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self._local.reader.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            length = int(payload)
+            return None if length < 0 else [self._read() for _ in range(length)]
+        raise RedisError(f'Respuesta no válida: {line!r}')
+
+    def command(self, *args):
+        if getattr(self._local, 'connection', None) is None:
+            self._connect()
+        try:
+            return self._call(*args)
+        except (OSError, ConnectionError):
+            # Conexión rota (reinicio del servidor, timeout): se reintenta una vez
+            self._local.connection = None
+            self._connect()
+            return self._call(*args)
+
+    def get(self, key):
+        return self.command('GET', key)
+
+    def set(self, key, value, ttl=None):
+        if ttl:
+            self.command('SET', key, value, 'PX', int(ttl * 1000))
+        else:
+            self.command('SET', key, value)
+
+    def add(self, key, value, ttl=None):
+        args = ['SET', key, value, 'NX']
+        if ttl:
+            args += ['PX', int(ttl * 1000)]
+        return self.command(*args) == 'OK'
+
+    def delete(self, keys):
+        keys = list(keys)
+        for start in range(0, len(keys), 500):
+            self.command('DEL', *keys[start:start + 500])
+
+    def keys(self, prefix):
+        pattern = ''.join('\\' + char if char in '*?[]\\' else char for char in prefix) + '*'
+        cursor, found = '0', []
+        while True:
+            cursor, batch = self.command('SCAN', cursor, 'MATCH', pattern, 'COUNT', 1000)
+            cursor = cursor.decode('utf-8') if isinstance(cursor, bytes) else str(cursor)
+            found.extend(key.decode('utf-8') for key in batch)
+            if cursor == '0':
+                return found
+
+    def delete_prefix(self, prefix):
+        self.delete(self.keys(prefix))
+
+    def generation(self, key):
+        value = self.get(key)
+        return int(value) if value is not None else 0
+
+    def bump(self, key):
+        return self.command('INCR', key)
+
+
+def create_backend(url):
+    """Almacén compartido para una URL de CACHE_BACKEND (None para 'memory')"""
+    if not url or url == 'memory':
+        return None
+    if url.startswith('sqlite:'):
+        path = url[len('sqlite:'):].lstrip('/')
+        path = '/' + path if path else os.path.join(tempfile.gettempdir(), 'control_horarios_cache.db')
+        return SQLiteBackend(path)
+    if url.startswith(('redis:', 'rediss:')):
+        return RedisBackend(url)
+    raise ValueError(f'CACHE_BACKEND no soportado: {url}')
+
+
+class _SharedStore:
+    """Envoltorio del almacén compartido: ante un fallo se sigue solo en proceso un rato"""
+
+    def __init__(self):
+        self.url = None
+        self.backend = None
+        self._down_until = 0.0
+
+    def configure(self, url):
+        self.url = url
+        self.backend = create_backend(url)
+        self._down_until = 0.0
+
+    @property
+    def available(self):
+        return self.backend is not None and time.monotonic() >= self._down_until
+
+    def call(self, method, *args, default=None):
+        if not self.available:
+            return default
+        try:
+            return getattr(self.backend, method)(*args)
+        except (OSError, sqlite3.Error, RedisError, ConnectionError) as e:
+            self._down_until = time.monotonic() + CACHE_RETRY_AFTER
+            logger.warning("⚠️ Caché compartida no disponible (%s): se usa solo la caché en proceso", e)
+            return default
+
+
+_shared = _SharedStore()
+_shared.configure(CACHE_BACKEND)
+
+
+class Cache:
+    """
+    Caché por espacio de nombres con la interfaz de un dict.
+
+    Siempre hay un LRU en proceso. Con un almacén compartido (CACHE_BACKEND)
+    los valores se guardan también allí, de modo que un resultado calculado
+    por un worker lo reutilizan los demás; con share_values=False solo se
+    comparte la invalidación (útil para objetos baratos de construir pero
+    caros de deserializar, como los índices de festivos). Cada invalidación
+    incrementa una generación compartida y los demás procesos descartan sus
+    copias locales en menos de CACHE_SYNC_INTERVAL segundos.
+
+    get_or_compute agrupa los cálculos concurrentes de una misma clave
+    (single-flight): un solo hilo del proceso, y con almacén compartido un
+    solo proceso, la calcula mientras el resto espera el resultado.
+    """
+
+    def __init__(self, namespace, share_values=True, max_entries=CACHE_MAX_ENTRIES):
+        self.namespace = namespace
+        self.share_values = share_values
+        self.max_entries = max_entries
+        self._prefix = f'{namespace}:'
+        self._generation_key = f'generation:{namespace}'
+        self._lock = threading.Lock()
+        self._local = OrderedDict()
+        self._flights = {}  # clave -> threading.Event del cálculo en curso
+        self._generation = None
+        self._checked = 0.0
+        self._epoch = 0  # invalidaciones vistas en este proceso
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    # --- Sincronización con el almacén compartido ---
+
+    def _sync(self):
+        if not _shared.available:
+            return
+        now = time.monotonic()
+        if now - self._checked < CACHE_SYNC_INTERVAL:
+            return
+        self._checked = now
+        generation = _shared.call('generation', self._generation_key)
+        if generation is not None and generation != self._generation:
+            with self._lock:
+                if self._generation is not None:
+                    self._local.clear()
+                    self._epoch += 1
+                self._generation = generation
+
+    def _bump(self):
+        with self._lock:
+            self._epoch += 1
+        generation = _shared.call('bump', self._generation_key)
+        if generation is not None:
+            self._generation = generation
+
+    def _version(self):
+        """Marca de invalidaciones (locales y compartidas) leída en el momento, sin esperar al sync"""
+        return self._epoch, _shared.call('generation', self._generation_key)
+
+    def _shared_key(self, key):
+        return self._prefix + repr(key)
+
+    def _store_local(self, key, value):
+        with self._lock:
+            self._local[key] = value
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+    # --- Interfaz de dict ---
+
+    def get(self, key, default=None):
+        self._sync()
+        with self._lock:
+            value = self._local.get(key, _MISSING)
+            if value is not _MISSING:
+                self._local.move_to_end(key)
+                self.hits += 1
+                return value
+        if self.share_values:
+            data = _shared.call('get', self._shared_key(key))
+            if data is not None:
+                value = pickle.loads(data)
+                self._store_local(key, value)
+                self.hits += 1
+                return value
+        self.misses += 1
+        return default
+
+    def set(self, key, value):
+        self._store_local(key, value)
+        if self.share_values:
+            _shared.call('set', self._shared_key(key), pickle.dumps(value, pickle.HIGHEST_PROTOCOL), CACHE_TTL)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def keys(self):
+        with self._lock:
+            keys = list(self._local)
+        if self.share_values and _shared.available:
+            known = set(keys)
+            for shared_key in _shared.call('keys', self._prefix, default=[]):
+                key = ast.literal_eval(shared_key[len(self._prefix):])
+                if key not in known:
+                    keys.append(key)
+        return keys
+
+    def pop(self, key, default=None):
+        with self._lock:
+            value = self._local.pop(key, default)
+        if self.share_values:
+            _shared.call('delete', [self._shared_key(key)])
+        self._bump()
+        return value
+
+    def discard_where(self, predicate):
+        """Descartar (en todos los procesos) las claves que cumplen `predicate`"""
+        keys = [key for key in self.keys() if predicate(key)]
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+        if self.share_values and keys:
+            _shared.call('delete', [self._shared_key(key) for key in keys])
+        self._bump()
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+        if self.share_values:
+            _shared.call('delete_prefix', self._prefix)
+        self._bump()
+
+    # --- Single-flight ---
+
+    def get_or_compute(self, key, compute):
+        """
+        Valor cacheado de `key` o el resultado de compute() (None no se cachea).
+
+        Si otro hilo del proceso ya está calculando la clave se espera a su
+        resultado; con almacén compartido, un candado con caducidad evita que
+        otro proceso la calcule a la vez.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = threading.Event()
+        if not leader:
+            self.coalesced += 1
+            flight.wait(SINGLE_FLIGHT_TIMEOUT)
+            value = self.get(key, _MISSING)
+            # Sin valor: el cálculo falló (o devolvió None); se intenta aquí
+            return value if value is not _MISSING else self._compute(key, compute)
+
+        try:
+            if self.share_values and _shared.available:
+                return self._compute_shared(key, compute)
+            return self._compute(key, compute)
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.set()
+
+    def _compute(self, key, compute):
+        # Si alguien invalida mientras se calcula, el resultado puede venir de
+        # datos anteriores a su commit: se devuelve pero no se guarda
+        version = self._version()
+        value = compute()
+        if value is None:
+            return value
+        if self._version() != version:
+            logger.debug("Caché %s invalidada durante el cálculo de %r: no se guarda", self.namespace, key)
+            return value
+        self.set(key, value)
+        # La invalidación pudo colarse entre la comprobación y el set
+        if self._version() != version:
+            with self._lock:
+                self._local.pop(key, None)
+            if self.share_values:
+                _shared.call('delete', [self._shared_key(key)])
+        return value
+
+    def _compute_shared(self, key, compute):
+        lock_key = self._shared_key(key) + '#computing'
+        deadline = time.monotonic() + SINGLE_FLIGHT_TIMEOUT
+        while True:
+            if _shared.call('add', lock_key, b'1', SINGLE_FLIGHT_TIMEOUT, default=True):
+                try:
+                    # Otro proceso puede haberla guardado justo antes de soltar el candado
+                    value = self.get(key, _MISSING)
+                    return value if value is not _MISSING else self._compute(key, compute)
+                finally:
+                    _shared.call('delete', [lock_key])
+            self.coalesced += 1
+            time.sleep(SINGLE_FLIGHT_POLL)
+            data = _shared.call('get', self._shared_key(key))
+            if data is not None:
+                value = pickle.loads(data)
+                self._store_local(key, value)
+                return value
+            if time.monotonic() >= deadline:
+                return self._compute(key, compute)
+
+
+def try_lock(name, ttl):
+    """
+    Candado entre procesos con caducidad en el almacén compartido.
+
+    True si lo obtiene este proceso, False si lo tiene otro y None si no hay
+    almacén compartido disponible (no hay con quién coordinarse).
+    """
+    if not _shared.available:
+        return None
+    return _shared.call('add', f'lock:{name}', b'1', ttl, default=None)
+
+
+def release_lock(name):
+    _shared.call('delete', [f'lock:{name}'])
+
+
+_caches = {}
+
+
+def get_cache(namespace, share_values=True):
+    """Caché de un espacio de nombres (una instancia por proceso)"""
+    cache = _caches.get(namespace)
+    if cache is None:
+        cache = _caches[namespace] = Cache(namespace, share_values=share_values)
+    return cache
+
+
+def init_cache(app):
+    """Configurar el almacén compartido desde app.config o el entorno (CACHE_BACKEND)"""
+    url = app.config.get('CACHE_BACKEND') or CACHE_BACKEND
+    if url != _shared.url:
+        _shared.configure(url)
+    logger.info("🗄️ Caché: %s", 'solo en proceso' if _shared.backend is None else type(_shared.backend).__name__)
+    return _shared
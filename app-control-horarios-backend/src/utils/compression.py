@@ -0,0 +1,229 @@
+import hashlib
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from flask import g, request, current_app
+
+try:
+    import brotli  # type: ignore
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard  # type: ignore
+except ImportError:
+    zstandard = None
+
+# Respuestas más pequeñas no compensan la compresión
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+# Memoria máxima para cuerpos comprimidos reutilizables (por ETag y codificación)
+COMPRESS_CACHE_BYTES = int(os.getenv('COMPRESS_CACHE_BYTES', str(32 * 1024 * 1024)))
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/html', 'text/plain', 'text/css', 'text/csv',
+                          'application/javascript', 'text/javascript')
+
+
+class _GzipEncoder:
+    def __init__(self):
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+
+class _BrotliEncoder:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=5)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.finish()
+
+
+class _ZstdEncoder:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=3).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+
+# Codificaciones disponibles en orden de preferencia del servidor
+ENCODERS = OrderedDict()
+if brotli is not None:
+    ENCODERS['br'] = _BrotliEncoder
+if zstandard is not None:
+    ENCODERS['zstd'] = _ZstdEncoder
+ENCODERS['gzip'] = _GzipEncoder
+
+
+def negotiate_encoding(accept_encoding):
+    """Mejor codificación admitida según Accept-Encoding (q-values), o None"""
+    accepted = {}
+    for item in (accept_encoding or '').split(','):
+        parts = item.strip().split(';')
+        name = parts[0].strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for parameter in parts[1:]:
+            key, _, value = parameter.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in ENCODERS:
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress_body(encoding, data):
+    encoder = ENCODERS[encoding]()
+    return encoder.compress(data) + encoder.flush()
+
+
+def _compress_stream(encoding, chunks):
+    encoder = ENCODERS[encoding]()
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            compressed = encoder.compress(chunk)
+            if compressed:
+                yield compressed
+        yield encoder.flush()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close:
+            close()
+
+
+class CompressedBodyCache:
+    """LRU en proceso de cuerpos comprimidos por (ETag, codificación), acotado en bytes"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = body
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+compressed_cache = CompressedBodyCache(COMPRESS_CACHE_BYTES)
+
+
+def cache_compressed(view):
+    """
+    Decorador de vista: respuesta cacheable por ETag.
+
+    Se calcula un ETag del cuerpo, se responde 304 a If-None-Match y el cuerpo
+    comprimido se reutiliza entre peticiones mientras el ETag no cambie.
+    """
+    view._cache_compressed = True
+    return view
+
+
+def mark_cache_compressed():
+    """Marcar la respuesta actual como cacheable (p. ej. la foto de un mes cerrado)"""
+    g._cache_compressed = True
+
+
+def _is_cacheable():
+    if g.get('_cache_compressed'):
+        return True
+    view = current_app.view_functions.get(request.endpoint)
+    return getattr(view, '_cache_compressed', False)
+
+
+def init_compression(app):
+    """
+    Comprimir las respuestas según Accept-Encoding (br, zstd o gzip).
+
+    Debe registrarse antes que el resto de after_request para ejecutarse el
+    último. Se omiten las respuestas pequeñas, las ya codificadas y los tipos no
+    comprimibles; las respuestas en streaming se comprimen por trozos.
+    """
+
+    @app.after_request
+    def _compress_response(response):
+        if request.method == 'HEAD' or response.status_code < 200 or response.status_code in (204, 206, 304):
+            return response
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES or 'Content-Encoding' in response.headers:
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+
+        if response.is_streamed:
+            if encoding:
+                response.response = _compress_stream(encoding, response.response)
+                response.headers.pop('Content-Length', None)
+                response.headers['Content-Encoding'] = encoding
+            return response
+
+        cacheable = request.method == 'GET' and response.status_code == 200 and _is_cacheable()
+        if cacheable:
+            body = response.get_data()
+            # Un ETag puesto por la vista (p. ej. versionado) se respeta; si no, hash del cuerpo
+            etag = response.get_etag()[0] or hashlib.sha1(body).hexdigest()
+            if len(body) < COMPRESS_MIN_SIZE:
+                encoding = None
+            # Cada codificación es una representación distinta: ETag propio
+            response.set_etag(f'{etag}-{encoding}' if encoding else etag)
+            response.make_conditional(request)
+            if response.status_code == 304 or encoding is None:
+                return response
+            compressed = compressed_cache.get((etag, encoding))
+            if compressed is None:
+                compressed = compress_body(encoding, body)
+                compressed_cache.put((etag, encoding), compressed)
+        else:
+            if encoding is None or response.direct_passthrough:
+                return response
+            body = response.get_data()
+            if len(body) < COMPRESS_MIN_SIZE:
+                return response
+            compressed = compress_body(encoding, body)
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    return app
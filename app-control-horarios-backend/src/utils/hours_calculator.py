@@ -1,47 +1,198 @@
+import logging
 from datetime import datetime, date, timedelta
 import calendar
-from src.models.employee import Employee, CalendarEntry, Holiday, db
+from flask import g, has_app_context
+from src.models.employee import Employee, CalendarEntry, Holiday, AutonomousCommunity, db
+from src.services.schedule_service import get_schedule_index
+from src.services.holiday_index import get_holiday_index
+from src.services.hours_ledger import hours_ledger
+from src.utils.schedule_rules import get_expected_hours_vector
+from src.utils.instrumentation import instrument_calculations
+from src.utils.cache_backend import get_cache
 
+logger = logging.getLogger(__name__)
+
+@instrument_calculations
 class HoursCalculator:
+    # Caché de resultados de forecast, compartida por todas las instancias
+    # (y por todos los workers con CACHE_BACKEND compartido)
+    _cache = get_cache('forecast')
+
     def __init__(self):
         pass
-    
+
+    # Claves de caché propias de un empleado (el segundo elemento es su id)
+    _EMPLOYEE_KEYS = ('employee_forecast', 'annual_summary')
+
+    @classmethod
+    def invalidate_cache(cls, since=None, employee_id=None, employee_ids=None):
+        """
+        Vaciar la caché de forecast (tras cambios en empleados, entradas o festivos).
+
+        Con `since` solo se descartan los periodos que terminan en esa fecha o
+        después (los meses anteriores no cambian); con `employee_id` (o varios en
+        `employee_ids`) se conservan los resultados individuales de otros empleados.
+        """
+        if employee_id is not None:
+            employee_ids = {employee_id}
+        elif employee_ids is not None:
+            employee_ids = set(employee_ids)
+        if since is None and employee_ids is None:
+            cls._cache.clear()
+            return
+
+        def affected(key):
+            if employee_ids is not None and key[0] in cls._EMPLOYEE_KEYS and key[1] not in employee_ids:
+                return False
+            return since is None or cls._period_end(key) >= since
+
+        cls._cache.discard_where(affected)
+
+    @classmethod
+    def invalidate_where(cls, predicate):
+        """Descartar las entradas de la caché cuya clave cumple `predicate`"""
+        cls._cache.discard_where(predicate)
+
+    @staticmethod
+    def _period_end(key):
+        """Último día del periodo cubierto por una clave de caché"""
+        if key[0] == 'annual_summary':
+            return date(key[2], 12, 31)
+        year, month = key[-2], key[-1]
+        return date(year, month, calendar.monthrange(year, month)[1])
+
+    def _cached(self, key, compute):
+        """
+        Devuelve el resultado cacheado para key o lo calcula (no se cachean errores).
+
+        Las peticiones concurrentes de una misma clave fría esperan a un único cálculo.
+        """
+        return self._cache.get_or_compute(key, compute)
+
+    def _expected_hours(self, employee, date_obj):
+        """Horas esperadas de un día según el perfil y horario vigentes (0 si no es laborable)"""
+        hours_mon_thu, hours_fri, profile = get_schedule_index().schedule_for(employee, date_obj)
+        vector = get_expected_hours_vector(profile, date_obj.year, hours_mon_thu, hours_fri,
+                                           employee.autonomous_community_id)
+        return vector[date_obj.toordinal() - date(date_obj.year, 1, 1).toordinal()]
+
+    def _expected_hours_between(self, employee, start_date, end_date):
+        """Suma de horas esperadas entre dos fechas (incluidas) a partir de los vectores anuales"""
+        total = 0
+        for segment_start, segment_end, hours_mon_thu, hours_fri, profile in \
+                get_schedule_index().segments(employee, start_date, end_date):
+            for year in range(segment_start.year, segment_end.year + 1):
+                year_start = date(year, 1, 1).toordinal()
+                first = max(segment_start.toordinal(), year_start) - year_start
+                last = min(segment_end.toordinal(), date(year, 12, 31).toordinal()) - year_start
+                vector = get_expected_hours_vector(profile, year, hours_mon_thu, hours_fri,
+                                                   employee.autonomous_community_id)
+                total += sum(vector[first:last + 1])
+        return total
+
+    @staticmethod
+    def entry_adjustment(day_hours, entry):
+        """Ajuste de una entrada del calendario sobre las horas esperadas de su día"""
+        if day_hours <= 0:
+            return 0  # Fin de semana o festivo
+        if entry.activity_type in ['V', 'F']:  # Vacaciones y ausencias
+            return -day_hours  # Día completo perdido
+        if entry.activity_type == 'HLD' and entry.hours:
+            return -min(day_hours, entry.hours)  # Restar HLD
+        if entry.activity_type == 'G' and entry.hours:
+            return entry.hours  # Sumar guardia
+        return 0
+
+    def _entries_adjustment(self, employee, entries):
+        """Ajuste sobre las horas esperadas por las entradas del calendario en días laborables"""
+        return sum(self.entry_adjustment(self._expected_hours(employee, entry.date), entry) for entry in entries)
+
+    def _ledger_totals(self, employee, start_date, end_date):
+        """(esperadas, trabajadas) desde el libro diario, o None si no está al día"""
+        if hours_ledger.is_current(employee.id, start_date, end_date):
+            return hours_ledger.employee_totals(employee.id, start_date, end_date)
+        return None
+
+    def _preload_month(self, year, month, employees=None):
+        """
+        Cargar de una vez los datos del mes y del período INDITEX de varios empleados.
+
+        Totales del libro diario (un GROUP BY por período) y entradas del
+        calendario (una consulta), para no consultar empleado a empleado.
+        """
+        start_date = date(year, month, 1)
+        end_date = date(year, month, calendar.monthrange(year, month)[1])
+        inditex_start, inditex_end = self._inditex_period(year, month)
+        if not has_app_context():
+            return
+        if hours_ledger.is_current(None, inditex_start, end_date):
+            hours_ledger.preload(start_date, end_date)
+            hours_ledger.preload(inditex_start, inditex_end)
+
+        preloaded = g.get('_calendar_entries')
+        if preloaded and preloaded[:2] == (inditex_start, end_date) and employees is not None \
+                and all(employee.id in preloaded[2] for employee in employees):
+            return  # Ya cargadas (p. ej. por el resumen de todos los equipos)
+
+        query = CalendarEntry.query.filter(
+            CalendarEntry.date >= inditex_start,
+            CalendarEntry.date <= end_date
+        )
+        if employees is not None:
+            employee_ids = [employee.id for employee in employees]
+            query = query.filter(CalendarEntry.employee_id.in_(employee_ids))
+        elif g.get('_employees_by_team') is not None:
+            employee_ids = [employee.id for team in g._employees_by_team.values() for employee in team]
+        else:
+            employee_ids = [employee_id for (employee_id,) in db.session.query(Employee.id)]
+        entries = {employee_id: [] for employee_id in employee_ids}
+        for entry in query:
+            entries.setdefault(entry.employee_id, []).append(entry)
+        g._calendar_entries = (inditex_start, end_date, entries)
+
+    def _load_employees_by_team(self):
+        """Todos los empleados agrupados por equipo con una consulta (memo por petición)"""
+        employees_by_team = {}
+        for employee in Employee.query.order_by(Employee.team_name, Employee.id):
+            employees_by_team.setdefault(employee.team_name, []).append(employee)
+        if has_app_context():
+            g._employees_by_team = employees_by_team
+        return employees_by_team
+
+    def _team_employees(self, team_name):
+        employees_by_team = g.get('_employees_by_team') if has_app_context() else None
+        if employees_by_team is not None:
+            return employees_by_team.get(team_name, [])
+        return Employee.query.filter_by(team_name=team_name).all()
+
+    def _entries_between(self, employee, start_date, end_date):
+        """Entradas del calendario de un empleado en un rango (precargadas si es posible)"""
+        preloaded = g.get('_calendar_entries') if has_app_context() else None
+        if preloaded and preloaded[0] <= start_date and end_date <= preloaded[1] and employee.id in preloaded[2]:
+            return [entry for entry in preloaded[2][employee.id] if start_date <= entry.date <= end_date]
+        return CalendarEntry.query.filter(
+            CalendarEntry.employee_id == employee.id,
+            CalendarEntry.date >= start_date,
+            CalendarEntry.date <= end_date
+        ).all()
+
+    def _inditex_period(self, year, month):
+        """Período INDITEX: del 26 del mes anterior al 25 del mes actual"""
+        if month == 1:
+            return date(year - 1, 12, 26), date(year, month, 25)
+        return date(year, month - 1, 26), date(year, month, 25)
+
     def calculate_theoretical_hours(self, employee, year, month):
         """Calcula las horas teóricas de un empleado para un mes específico"""
         try:
-            # Verificar si es julio o agosto (horario de verano)
-            is_summer = month in [7, 8]
-            
-            # Obtener días del mes
-            days_in_month = calendar.monthrange(year, month)[1]
-            total_hours = 0
-            
-            for day in range(1, days_in_month + 1):
-                date_obj = date(year, month, day)
-                weekday = date_obj.weekday()  # 0=Lunes, 6=Domingo
-                
-                # Verificar si es fin de semana
-                if weekday >= 5:  # Sábado o Domingo
-                    continue
-                
-                # Verificar si es festivo
-                if self.is_holiday(date_obj, employee.autonomous_community):
-                    continue
-                
-                # Calcular horas del día
-                if is_summer:
-                    # Julio y agosto: 7 horas por día
-                    total_hours += 7
-                else:
-                    # Resto del año: según configuración del empleado
-                    if weekday < 4:  # Lunes a Jueves
-                        total_hours += employee.hours_mon_thu
-                    else:  # Viernes
-                        total_hours += employee.hours_fri
-            
-            return total_hours
-        except Exception as e:
-            print(f"Error calculating theoretical hours: {e}")
+            start_date = date(year, month, 1)
+            end_date = date(year, month, calendar.monthrange(year, month)[1])
+            ledger_totals = self._ledger_totals(employee, start_date, end_date)
+            if ledger_totals is not None:
+                return ledger_totals[0]
+            return self._expected_hours_between(employee, start_date, end_date)
+        except Exception:
+            logger.exception("Error calculating theoretical hours")
             return 0
     
     def calculate_actual_hours(self, employee, year, month):
@@ -53,11 +204,7 @@ class HoursCalculator:
             start_date = date(year, month, 1)
             end_date = date(year, month, calendar.monthrange(year, month)[1])
             
-            entries = CalendarEntry.query.filter(
-                CalendarEntry.employee_id == employee.id,
-                CalendarEntry.date >= start_date,
-                CalendarEntry.date <= end_date
-            ).all()
+            entries = self._entries_between(employee, start_date, end_date)
             
             # Calcular deducciones y adiciones
             deductions = 0
@@ -65,17 +212,8 @@ class HoursCalculator:
             
             for entry in entries:
                 if entry.activity_type in ['V', 'F']:  # Vacaciones y ausencias
-                    # Calcular horas del día perdido
-                    weekday = entry.date.weekday()
-                    is_summer = month in [7, 8]
-                    
-                    if is_summer:
-                        deductions += 7
-                    else:
-                        if weekday < 4:  # Lunes a Jueves
-                            deductions += employee.hours_mon_thu
-                        else:  # Viernes
-                            deductions += employee.hours_fri
+                    # Horas esperadas del día perdido
+                    deductions += self._expected_hours(employee, entry.date)
                 
                 elif entry.activity_type == 'HLD' and entry.hours:
                     # Restar horas de libre disposición
@@ -88,154 +226,56 @@ class HoursCalculator:
             actual_hours = theoretical_hours - deductions + additions
             return max(0, actual_hours)  # No puede ser negativo
             
-        except Exception as e:
-            print(f"Error calculating actual hours: {e}")
+        except Exception:
+            logger.exception("Error calculating actual hours")
             return 0
     
     def calculate_indra_hours(self, employee, year, month):
         """Calcula las horas INDRA (día 1 al último del mes) - TOTAL de horas laborables del mes"""
         try:
             # INDRA = Total de horas laborables del mes (sin aplicar porcentaje)
-            # Calcular horas laborables del mes considerando deducciones
-            
-            # Obtener días del mes
-            days_in_month = calendar.monthrange(year, month)[1]
-            total_hours = 0
-            
-            # Obtener entradas del calendario para el mes
+            # considerando deducciones
             start_date = date(year, month, 1)
-            end_date = date(year, month, days_in_month)
-            
-            entries = CalendarEntry.query.filter(
-                CalendarEntry.employee_id == employee.id,
-                CalendarEntry.date >= start_date,
-                CalendarEntry.date <= end_date
-            ).all()
-            
-            # Crear diccionario de entradas por fecha
-            entries_by_date = {entry.date: entry for entry in entries}
+            end_date = date(year, month, calendar.monthrange(year, month)[1])
+            ledger_totals = self._ledger_totals(employee, start_date, end_date)
+            if ledger_totals is not None:
+                return ledger_totals[1]
             
-            for day in range(1, days_in_month + 1):
-                date_obj = date(year, month, day)
-                weekday = date_obj.weekday()  # 0=Lunes, 6=Domingo
-                
-                # Verificar si es fin de semana
-                if weekday >= 5:  # Sábado o Domingo
-                    continue
-                
-                # Verificar si es festivo
-                if self.is_holiday(date_obj, employee.autonomous_community):
-                    continue
-                
-                # Calcular horas base del día
-                is_summer = month in [7, 8]
-                if is_summer:
-                    day_hours = 7
-                else:
-                    if weekday < 4:  # Lunes a Jueves
-                        day_hours = employee.hours_mon_thu
-                    else:  # Viernes
-                        day_hours = employee.hours_fri
-                
-                # Aplicar modificaciones según entradas del calendario
-                if date_obj in entries_by_date:
-                    entry = entries_by_date[date_obj]
-                    if entry.activity_type in ['V', 'F']:  # Vacaciones y ausencias
-                        day_hours = 0  # Día completo perdido
-                    elif entry.activity_type == 'HLD' and entry.hours:
-                        day_hours = max(0, day_hours - entry.hours)  # Restar HLD
-                    elif entry.activity_type == 'G' and entry.hours:
-                        day_hours += entry.hours  # Sumar guardia
-                
-                total_hours += day_hours
+            entries = self._entries_between(employee, start_date, end_date)
             
-            return total_hours
+            expected_hours = self._expected_hours_between(employee, start_date, end_date)
+            return expected_hours + self._entries_adjustment(employee, entries)
             
-        except Exception as e:
-            print(f"Error calculating INDRA hours: {e}")
+        except Exception:
+            logger.exception("Error calculating INDRA hours")
             return 0
     
     def calculate_inditex_hours(self, employee, year, month):
         """Calcula las horas INDITEX (día 26 del mes anterior al 25 del mes actual) - TOTAL del período"""
         try:
             # INDITEX = Total de horas del período 26 mes anterior - 25 mes actual (sin aplicar porcentaje)
-            
-            # Calcular período INDITEX: del 26 del mes anterior al 25 del mes actual
-            if month == 1:
-                prev_year = year - 1
-                prev_month = 12
-            else:
-                prev_year = year
-                prev_month = month - 1
-            
-            # Período: 26 del mes anterior al 25 del mes actual
-            start_date = date(prev_year, prev_month, 26)
-            end_date = date(year, month, 25)
+            start_date, end_date = self._inditex_period(year, month)
+            ledger_totals = self._ledger_totals(employee, start_date, end_date)
+            if ledger_totals is not None:
+                return ledger_totals[1]
             
             # Obtener entradas del calendario para todo el período
-            entries = CalendarEntry.query.filter(
-                CalendarEntry.employee_id == employee.id,
-                CalendarEntry.date >= start_date,
-                CalendarEntry.date <= end_date
-            ).all()
+            entries = self._entries_between(employee, start_date, end_date)
             
-            # Crear diccionario de entradas por fecha
-            entries_by_date = {entry.date: entry for entry in entries}
+            expected_hours = self._expected_hours_between(employee, start_date, end_date)
+            return expected_hours + self._entries_adjustment(employee, entries)
             
-            total_hours = 0
-            current_date = start_date
-            
-            while current_date <= end_date:
-                weekday = current_date.weekday()
-                
-                # Verificar si es fin de semana
-                if weekday >= 5:
-                    current_date += timedelta(days=1)
-                    continue
-                
-                # Verificar si es festivo
-                if self.is_holiday(current_date, employee.autonomous_community):
-                    current_date += timedelta(days=1)
-                    continue
-                
-                # Calcular horas base del día
-                current_month = current_date.month
-                is_summer = current_month in [7, 8]
-                
-                if is_summer:
-                    day_hours = 7
-                else:
-                    if weekday < 4:  # Lunes a Jueves
-                        day_hours = employee.hours_mon_thu
-                    else:  # Viernes
-                        day_hours = employee.hours_fri
-                
-                # Aplicar modificaciones según entradas del calendario
-                if current_date in entries_by_date:
-                    entry = entries_by_date[current_date]
-                    if entry.activity_type in ['V', 'F']:  # Vacaciones y ausencias
-                        day_hours = 0  # Día completo perdido
-                    elif entry.activity_type == 'HLD' and entry.hours:
-                        day_hours = max(0, day_hours - entry.hours)  # Restar HLD
-                    elif entry.activity_type == 'G' and entry.hours:
-                        day_hours += entry.hours  # Sumar guardia
-                
-                total_hours += day_hours
-                current_date += timedelta(days=1)
-            
-            return total_hours
-            
-        except Exception as e:
-            print(f"Error calculating INDITEX hours: {e}")
+        except Exception:
+            logger.exception("Error calculating INDITEX hours")
             return 0
     
-    def calculate_vacation_summary(self, employee, year):
-        """Calcula el resumen anual de vacaciones de un empleado"""
+    def calculate_vacation_summary(self, employee, year, today=None):
+        """Calcula el resumen anual de vacaciones de un empleado (usadas/asignadas respecto a `today`)"""
         try:
             # Obtener todas las entradas de vacaciones del año
             start_date = date(year, 1, 1)
             end_date = date(year, 12, 31)
-            today = date.today()
+            today = today or date.today()
             
             vacation_entries = CalendarEntry.query.filter(
                 CalendarEntry.employee_id == employee.id,
@@ -264,8 +304,8 @@ class HoursCalculator:
                 'vacation_days_remaining': max(0, vacation_days_remaining)
             }
             
-        except Exception as e:
-            print(f"Error calculating vacation summary: {e}")
+        except Exception:
+            logger.exception("Error calculating vacation summary")
             return {
                 'vacation_days_total': employee.vacation_days,
                 'vacation_days_used': 0,
@@ -296,8 +336,8 @@ class HoursCalculator:
                 'hld_hours_remaining': round(hld_hours_remaining, 1)
             }
             
-        except Exception as e:
-            print(f"Error calculating HLD summary: {e}")
+        except Exception:
+            logger.exception("Error calculating HLD summary")
             return {
                 'hld_hours_total': employee.free_hours,
                 'hld_hours_used': 0,
@@ -305,6 +345,19 @@ class HoursCalculator:
             }
     
     def calculate_annual_summary(self, employee, year):
+        """
+        Calcula el resumen anual completo de un empleado (con caché).
+
+        El reparto de vacaciones usadas/asignadas depende del día: en el año en
+        curso la clave incluye la fecha, así el resultado no se queda anticuado
+        al pasar los días.
+        """
+        today = date.today()
+        as_of = today.isoformat() if year == today.year else None
+        return self._cached(('annual_summary', employee.id, year, as_of),
+                            lambda: self._calculate_annual_summary(employee, year, today))
+
+    def _calculate_annual_summary(self, employee, year, today=None):
         """Calcula el resumen anual completo de un empleado"""
         try:
             # Calcular totales anuales
@@ -320,7 +373,7 @@ class HoursCalculator:
                 total_inditex_hours += self.calculate_inditex_hours(employee, year, month)
             
             # Obtener resúmenes de vacaciones y HLD
-            vacation_summary = self.calculate_vacation_summary(employee, year)
+            vacation_summary = self.calculate_vacation_summary(employee, year, today)
             hld_summary = self.calculate_hld_summary(employee, year)
             
             # Calcular guardias del año
@@ -366,11 +419,15 @@ class HoursCalculator:
                 'hld_alert': hld_summary['hld_hours_remaining'] < 10
             }
             
-        except Exception as e:
-            print(f"Error calculating annual summary: {e}")
+        except Exception:
+            logger.exception("Error calculating annual summary")
             return None
     
     def calculate_employee_forecast(self, employee, year, month):
+        """Calcula el forecast mensual de un empleado (con caché)"""
+        return self._cached(('employee_forecast', employee.id, year, month), lambda: self._calculate_employee_forecast(employee, year, month))
+
+    def _calculate_employee_forecast(self, employee, year, month):
         """Calcula el forecast mensual de un empleado"""
         try:
             theoretical_hours = self.calculate_theoretical_hours(employee, year, month)
@@ -385,11 +442,7 @@ class HoursCalculator:
             start_date = date(year, month, 1)
             end_date = date(year, month, calendar.monthrange(year, month)[1])
             
-            entries = CalendarEntry.query.filter(
-                CalendarEntry.employee_id == employee.id,
-                CalendarEntry.date >= start_date,
-                CalendarEntry.date <= end_date
-            ).all()
+            entries = self._entries_between(employee, start_date, end_date)
             
             vacation_days = len([e for e in entries if e.activity_type == 'V'])
             absence_days = len([e for e in entries if e.activity_type == 'F'])
@@ -413,17 +466,22 @@ class HoursCalculator:
                 'month': month
             }
             
-        except Exception as e:
-            print(f"Error calculating employee forecast: {e}")
+        except Exception:
+            logger.exception("Error calculating employee forecast")
             return None
     
     def calculate_team_summary(self, team_name, year, month):
+        """Calcula el resumen mensual de un equipo (con caché)"""
+        return self._cached(('team_summary', team_name, year, month), lambda: self._calculate_team_summary(team_name, year, month))
+
+    def _calculate_team_summary(self, team_name, year, month):
         """Calcula el resumen mensual de un equipo"""
         try:
-            employees = Employee.query.filter_by(team_name=team_name).all()
+            employees = self._team_employees(team_name)
             
             if not employees:
                 return None
+            self._preload_month(year, month, employees)
             
             team_data = {
                 'team_name': team_name,
@@ -469,15 +527,20 @@ class HoursCalculator:
             
             return team_data
             
-        except Exception as e:
-            print(f"Error calculating team summary: {e}")
+        except Exception:
+            logger.exception("Error calculating team summary")
             return None
     
     def calculate_all_teams_summary(self, year, month):
+        """Calcula el resumen de todos los equipos para el Dashboard (con caché)"""
+        return self._cached(('all_teams_summary', year, month), lambda: self._calculate_all_teams_summary(year, month))
+
+    def _calculate_all_teams_summary(self, year, month):
         """Calcula el resumen de todos los equipos para el Dashboard"""
         try:
             # Obtener todos los equipos únicos
-            teams = db.session.query(Employee.team_name).distinct().all()
+            teams = [(team_name,) for team_name in self._load_employees_by_team()]
+            self._preload_month(year, month)
             teams_data = []
             
             overall_summary = {
@@ -531,107 +594,56 @@ class HoursCalculator:
                 'overall_summary': overall_summary
             }
             
-        except Exception as e:
-            print(f"Error calculating all teams summary: {e}")
+        except Exception:
+            logger.exception("Error calculating all teams summary")
             return None
     
     def is_holiday(self, date_obj, autonomous_community):
-        """Verifica si una fecha es festivo"""
+        """Verifica si una fecha es festivo (comunidad por id o por nombre) usando el índice de festivos"""
         try:
-            # Mapeo de nombres completos a códigos de comunidades autónomas
-            community_mapping = {
-                'Galicia': 'GA',
-                'Cataluña': 'CT',
-                'Madrid': 'MD',
-                'Andalucía': 'AN',
-                'Valencia': 'VC',
-                'País Vasco': 'PV',
-                'Castilla y León': 'CL',
-                'Castilla-La Mancha': 'CM',
-                'Canarias': 'CN',
-                'Aragón': 'AR',
-                'Extremadura': 'EX',
-                'Asturias': 'AS',
-                'Navarra': 'NC',
-                'Murcia': 'MC',
-                'Cantabria': 'CB',
-                'Baleares': 'IB',
-                'La Rioja': 'RI',
-                'Ceuta': 'CE',
-                'Melilla': 'ML'
-            }
-            
-            # Convertir nombre completo a código si es necesario
-            community_code = autonomous_community
-            if autonomous_community in community_mapping:
-                community_code = community_mapping[autonomous_community]
-            
-            # Buscar festivo con código o nombre completo
-            holiday = Holiday.query.filter(
-                Holiday.date == date_obj,
-                db.or_(
-                    Holiday.autonomous_community == community_code,  # Buscar por código
-                    Holiday.autonomous_community == autonomous_community,  # Buscar por nombre completo
-                    Holiday.autonomous_community.is_(None)  # Festivos nacionales
+            community_id = autonomous_community
+            if isinstance(autonomous_community, str):
+                community_id = db.session.query(AutonomousCommunity.id).filter(
+                    AutonomousCommunity.name == autonomous_community
+                ).scalar()
+            is_holiday = get_holiday_index().is_holiday(date_obj, community_id)
+
+            # Diagnóstico del 25 de julio: solo con DEBUG activo (incluida la consulta)
+            if date_obj.month == 7 and date_obj.day == 25 and logger.isEnabledFor(logging.DEBUG):
+                holidays = Holiday.query.filter(Holiday.date == date_obj).all()
+                logger.debug(
+                    "🔍 25 julio: festivo para %s (comunidad %r -> %s): %s",
+                    date_obj, autonomous_community, community_id, is_holiday,
+                    extra={'holidays': [(h.name, h.autonomous_community_id) for h in holidays]}
                 )
-            ).first()
-            
-            # Debug específico para el 25 de julio
-            if date_obj.month == 7 and date_obj.day == 25:
-                print(f"🔍 DEBUG 25 julio: Buscando festivo para {date_obj}")
-                print(f"   Comunidad empleado: '{autonomous_community}'")
-                print(f"   Código mapeado: '{community_code}'")
-                
-                # Buscar todos los festivos de esa fecha
-                all_holidays = Holiday.query.filter(Holiday.date == date_obj).all()
-                print(f"   Festivos encontrados para {date_obj}:")
-                for h in all_holidays:
-                    print(f"     - {h.name} (comunidad: '{h.autonomous_community}', tipo: {h.type})")
-                
-                if holiday:
-                    print(f"   ✅ FESTIVO ENCONTRADO: {holiday.name}")
-                else:
-                    print(f"   ❌ NO SE ENCONTRÓ FESTIVO")
-            
-            return holiday is not None
-        except Exception as e:
-            print(f"Error checking holiday: {e}")
+
+            return is_holiday
+        except Exception:
+            logger.exception("Error checking holiday")
             return False
     
     def get_working_days_in_month(self, year, month):
-        """Obtiene el número de días laborables en un mes"""
+        """Obtiene el número de días laborables en un mes (festivos nacionales)"""
         try:
-            days_in_month = calendar.monthrange(year, month)[1]
-            working_days = 0
-            
-            for day in range(1, days_in_month + 1):
-                date_obj = date(year, month, day)
-                weekday = date_obj.weekday()
-                
-                # Verificar si es fin de semana
-                if weekday >= 5:
-                    continue
-                
-                # Verificar si es festivo
-                if self.is_holiday(date_obj, None):  # Verificar festivos nacionales
-                    continue
-                
-                working_days += 1
-            
-            return working_days
-        except Exception as e:
-            print(f"Error calculating working days: {e}")
+            start = date(year, month, 1).toordinal()
+            end = date(year, month, calendar.monthrange(year, month)[1]).toordinal()
+            national_holidays = get_holiday_index().holiday_ordinals()
+            return sum(
+                1 for ordinal in range(start, end + 1)
+                if (ordinal - 1) % 7 < 5 and ordinal not in national_holidays
+            )
+        except Exception:
+            logger.exception("Error calculating working days")
             return 0
 
-
     def calculate_worked_indra_hours(self, employee, year, month):
         """Calcula las horas trabajadas INDRA (horas teóricas INDRA menos deducciones)"""
         try:
             # Las horas trabajadas INDRA son las horas teóricas INDRA menos deducciones
             # Ya están calculadas correctamente en calculate_indra_hours
             return self.calculate_indra_hours(employee, year, month)
-        except Exception as e:
-            print(f"Error calculating worked INDRA hours: {e}")
+        except Exception:
+            logger.exception("Error calculating worked INDRA hours")
             return 0
     
     def calculate_worked_inditex_hours(self, employee, year, month):
@@ -640,94 +652,35 @@ class HoursCalculator:
             # Las horas trabajadas INDITEX son las horas teóricas INDITEX menos deducciones
             # Ya están calculadas correctamente en calculate_inditex_hours
             return self.calculate_inditex_hours(employee, year, month)
-        except Exception as e:
-            print(f"Error calculating worked INDITEX hours: {e}")
+        except Exception:
+            logger.exception("Error calculating worked INDITEX hours")
             return 0
     
     def calculate_theoretical_indra_hours(self, employee, year, month):
         """Calcula las horas teóricas INDRA (sin deducciones)"""
         try:
-            # Obtener días del mes
-            days_in_month = calendar.monthrange(year, month)[1]
-            total_hours = 0
-            
-            for day in range(1, days_in_month + 1):
-                date_obj = date(year, month, day)
-                weekday = date_obj.weekday()  # 0=Lunes, 6=Domingo
-                
-                # Verificar si es fin de semana
-                if weekday >= 5:  # Sábado o Domingo
-                    continue
-                
-                # Verificar si es festivo
-                if self.is_holiday(date_obj, employee.autonomous_community):
-                    continue
-                
-                # Calcular horas base del día (sin deducciones)
-                is_summer = month in [7, 8]
-                if is_summer:
-                    total_hours += 7
-                else:
-                    if weekday < 4:  # Lunes a Jueves
-                        total_hours += employee.hours_mon_thu
-                    else:  # Viernes
-                        total_hours += employee.hours_fri
-            
-            return total_hours
+            start_date = date(year, month, 1)
+            end_date = date(year, month, calendar.monthrange(year, month)[1])
+            ledger_totals = self._ledger_totals(employee, start_date, end_date)
+            if ledger_totals is not None:
+                return ledger_totals[0]
+            return self._expected_hours_between(employee, start_date, end_date)
             
-        except Exception as e:
-            print(f"Error calculating theoretical INDRA hours: {e}")
+        except Exception:
+            logger.exception("Error calculating theoretical INDRA hours")
             return 0
     
     def calculate_theoretical_inditex_hours(self, employee, year, month):
         """Calcula las horas teóricas INDITEX (sin deducciones)"""
         try:
-            # Calcular período INDITEX: del 26 del mes anterior al 25 del mes actual
-            if month == 1:
-                prev_year = year - 1
-                prev_month = 12
-            else:
-                prev_year = year
-                prev_month = month - 1
-            
-            # Período: 26 del mes anterior al 25 del mes actual
-            start_date = date(prev_year, prev_month, 26)
-            end_date = date(year, month, 25)
-            
-            total_hours = 0
-            current_date = start_date
-            
-            while current_date <= end_date:
-                weekday = current_date.weekday()
-                
-                # Verificar si es fin de semana
-                if weekday >= 5:
-                    current_date += timedelta(days=1)
-                    continue
-                
-                # Verificar si es festivo
-                if self.is_holiday(current_date, employee.autonomous_community):
-                    current_date += timedelta(days=1)
-                    continue
-                
-                # Calcular horas base del día (sin deducciones)
-                current_month = current_date.month
-                is_summer = current_month in [7, 8]
-                
-                if is_summer:
-                    total_hours += 7
-                else:
-                    if weekday < 4:  # Lunes a Jueves
-                        total_hours += employee.hours_mon_thu
-                    else:  # Viernes
-                        total_hours += employee.hours_fri
-                
-                current_date += timedelta(days=1)
-            
-            return total_hours
-            
-        except Exception as e:
-            print(f"Error calculating theoretical INDITEX hours: {e}")
+            start_date, end_date = self._inditex_period(year, month)
+            ledger_totals = self._ledger_totals(employee, start_date, end_date)
+            if ledger_totals is not None:
+                return ledger_totals[0]
+            return self._expected_hours_between(employee, start_date, end_date)
+            
+        except Exception:
+            logger.exception("Error calculating theoretical INDITEX hours")
             return 0
     
     def calculate_employee_dashboard_data(self, employee, year, month):
@@ -768,17 +721,18 @@ class HoursCalculator:
                 'month': month
             }
             
-        except Exception as e:
-            print(f"Error calculating employee dashboard data: {e}")
+        except Exception:
+            logger.exception("Error calculating employee dashboard data")
             return None
     
     def calculate_team_dashboard_data(self, team_name, year, month):
         """Calcula los datos de un equipo para el Dashboard"""
         try:
-            employees = Employee.query.filter_by(team_name=team_name).all()
+            employees = self._team_employees(team_name)
             
             if not employees:
                 return None
+            self._preload_month(year, month, employees)
             
             team_data = {
                 'team_name': team_name,
@@ -826,15 +780,20 @@ class HoursCalculator:
             
             return team_data
             
-        except Exception as e:
-            print(f"Error calculating team dashboard data: {e}")
+        except Exception:
+            logger.exception("Error calculating team dashboard data")
             return None
     
     def calculate_dashboard_summary(self, year, month):
+        """Calcula el resumen completo para el Dashboard (con caché)"""
+        return self._cached(('dashboard_summary', year, month), lambda: self._calculate_dashboard_summary(year, month))
+
+    def _calculate_dashboard_summary(self, year, month):
         """Calcula el resumen completo para el Dashboard"""
         try:
             # Obtener todos los equipos únicos
-            teams = db.session.query(Employee.team_name).distinct().all()
+            teams = [(team_name,) for team_name in self._load_employees_by_team()]
+            self._preload_month(year, month)
             teams_data = []
             
             overall_summary = {
@@ -887,7 +846,7 @@ class HoursCalculator:
                 'overall_summary': overall_summary
             }
             
-        except Exception as e:
-            print(f"Error calculating dashboard summary: {e}")
+        except Exception:
+            logger.exception("Error calculating dashboard summary")
             return None
 
@@ -0,0 +1,294 @@
+import functools
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter as FingerprintCounter
+from flask import g, request, has_app_context, current_app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Límites (segundos) de los histogramas de latencia, al estilo de Prometheus
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class Histogram:
+    """Histograma acumulado por etiquetas (sin dependencias externas)"""
+
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self._series = {}  # labels -> [cuentas por bucket..., suma, total]
+
+    def observe(self, labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 2)
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[position] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        for labels, series in sorted(self._series.items()):
+            label_text = _format_labels(labels)
+            bucket_prefix = f'{label_text},' if label_text else ''
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{bucket_prefix}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{bucket_prefix}le="+Inf"}} {series[-1]}')
+            label_block = f'{{{label_text}}}' if label_text else ''
+            lines.append(f'{self.name}_sum{label_block} {series[-2]:.6f}')
+            lines.append(f'{self.name}_count{label_block} {series[-1]}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self._series = {}
+
+    def inc(self, labels, value=1):
+        self._series[labels] = self._series.get(labels, 0) + value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} counter']
+        for labels, value in sorted(self._series.items()):
+            lines.append(f'{self.name}{{{_format_labels(labels)}}} {value}')
+        return lines
+
+
+def _format_labels(labels):
+    return ','.join(f'{key}="{str(value)}"' for key, value in labels)
+
+
+class Metrics:
+    """Registro en proceso de métricas HTTP, SQL y del calculador"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.request_latency = Histogram(
+            'http_request_duration_seconds', 'Latencia de las peticiones por ruta', LATENCY_BUCKETS)
+        self.request_queries = Histogram(
+            'http_request_sql_queries', 'Consultas SQL por petición y ruta', QUERY_COUNT_BUCKETS)
+        self.sql_seconds = Counter('sql_query_seconds_total', 'Tiempo total en consultas SQL por ruta')
+        self.span_seconds = Counter('calculator_span_seconds_total', 'Tiempo total por cálculo del forecast')
+        self.span_calls = Counter('calculator_span_calls_total', 'Llamadas por cálculo del forecast')
+        self.login_attempts = Counter('login_attempts_total', 'Inicios de sesión por resultado')
+        self.password_hash_seconds = Histogram(
+            'password_hash_duration_seconds', 'Duración de cada verificación de contraseña', LATENCY_BUCKETS)
+        self.password_hash_wait = Histogram(
+            'password_hash_queue_wait_seconds', 'Espera en cola antes de verificar la contraseña', LATENCY_BUCKETS)
+        self.admission_wait = Histogram(
+            'admission_wait_seconds', 'Espera por un hueco de admisión por carril', LATENCY_BUCKETS)
+        self.admission_rejected = Counter('admission_rejected_total', 'Peticiones rechazadas con 503 por admisión')
+        self._gauges = []  # (nombre, descripción, función sin argumentos)
+
+    def observe_request(self, route, method, status, duration, query_count, query_seconds, spans):
+        labels = (('method', method), ('route', route), ('status', status))
+        route_labels = (('route', route),)
+        with self._lock:
+            self.request_latency.observe(labels, duration)
+            self.request_queries.observe(route_labels, query_count)
+            self.sql_seconds.inc(route_labels, query_seconds)
+            for name, (calls, seconds) in spans.items():
+                self.span_seconds.inc((('span', name),), seconds)
+                self.span_calls.inc((('span', name),), calls)
+
+    def observe_login(self, result):
+        with self._lock:
+            self.login_attempts.inc((('result', result),))
+
+    def observe_password_hash(self, wait, duration):
+        with self._lock:
+            self.password_hash_wait.observe((), wait)
+            self.password_hash_seconds.observe((), duration)
+
+    def observe_admission(self, lane, route, wait, admitted):
+        with self._lock:
+            self.admission_wait.observe((('lane', lane),), wait)
+            if not admitted:
+                self.admission_rejected.inc((('lane', lane), ('route', route)))
+
+    def register_gauge(self, name, description, getter):
+        """Exponer en /metrics un valor que se lee en el momento de renderizar"""
+        self._gauges.append((name, description, getter))
+
+    def render(self, engine=None):
+        with self._lock:
+            lines = []
+            for metric in (self.request_latency, self.request_queries, self.sql_seconds,
+                           self.span_seconds, self.span_calls, self.login_attempts,
+                           self.password_hash_seconds, self.password_hash_wait,
+                           self.admission_wait, self.admission_rejected):
+                lines.extend(metric.render())
+        for name, description, getter in self._gauges:
+            lines.extend([f'# HELP {name} {description}', f'# TYPE {name} gauge', f'{name} {getter()}'])
+        lines.extend(_pool_metrics(engine))
+        return '\n'.join(lines) + '\n'
+
+
+def _pool_metrics(engine):
+    """Estado del pool de conexiones (solo pools con tamaño fijo, p. ej. QueuePool)"""
+    pool = getattr(engine, 'pool', None)
+    lines = []
+    for name, attribute, description in (
+        ('db_pool_size', 'size', 'Tamaño configurado del pool'),
+        ('db_pool_checked_out', 'checkedout', 'Conexiones en uso'),
+        ('db_pool_checked_in', 'checkedin', 'Conexiones libres en el pool'),
+        ('db_pool_overflow', 'overflow', 'Conexiones por encima del tamaño del pool'),
+    ):
+        getter = getattr(pool, attribute, None)
+        if getter is None:
+            continue
+        lines.extend([f'# HELP {name} {description}', f'# TYPE {name} gauge', f'{name} {getter()}'])
+    return lines
+
+
+metrics = Metrics()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['_query_start'].pop()
+    if has_app_context():
+        stats = g.get('_sql_stats')
+        if stats is not None:
+            stats[1] += time.perf_counter() - started
+            # Un INSERT de varias filas puede ejecutarse en varios lotes (o fila a fila
+            # en SQLite): se cuenta como una sola sentencia
+            if context is not None and context is g.get('_sql_last_context'):
+                return
+            g._sql_last_context = context
+            stats[0] += 1
+            fingerprints = g.get('_sql_fingerprints')
+            if fingerprints is not None:
+                fingerprints[fingerprint(statement)] += 1
+
+
+_IN_LIST = re.compile(r'\((?:\s*(?:\?|%\(\w+\)s|%s|:\w+|__\[POSTCOMPILE_\w+\])\s*,?)+\)')
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SPACES = re.compile(r'\s+')
+
+
+def fingerprint(statement):
+    """Forma normalizada de una sentencia: sin literales y con las listas IN colapsadas"""
+    statement = _LITERALS.sub('?', statement)
+    statement = _IN_LIST.sub('(?)', statement)
+    return _SPACES.sub(' ', statement).strip()[:300]
+
+
+class QueryBudgetExceeded(Exception):
+    """Una petición ha superado el presupuesto de consultas de su ruta"""
+
+
+def query_budget(max_queries):
+    """
+    Declara el máximo de consultas SQL de una ruta.
+
+    Se coloca junto al decorador @route. En pruebas y desarrollo superar el
+    presupuesto lanza QueryBudgetExceeded; en producción solo se registra.
+    """
+    def decorator(view):
+        view._query_budget = max_queries
+        return view
+    return decorator
+
+
+def _query_budget_mode(app):
+    """'raise', 'log' u 'off' (QUERY_BUDGET_MODE; por defecto 'raise' en pruebas/desarrollo)"""
+    mode = app.config.get('QUERY_BUDGET_MODE') or os.getenv('QUERY_BUDGET_MODE')
+    if mode:
+        return mode.lower()
+    return 'raise' if app.testing or app.debug else 'log'
+
+
+def _check_query_budget(query_count):
+    view = current_app.view_functions.get(request.endpoint)
+    budget = getattr(view, '_query_budget', None)
+    if budget is None or query_count <= budget or g.get('_query_budget_reported'):
+        return
+    g._query_budget_reported = True  # after_request vuelve a ejecutarse con la respuesta de error
+    mode = _query_budget_mode(current_app)
+    if mode == 'off':
+        return
+    repeated = [
+        f'{count}x {statement}'
+        for statement, count in g._sql_fingerprints.most_common(5) if count > 1
+    ]
+    message = (f'{request.method} {request.url_rule.rule}: {query_count} consultas '
+               f'(presupuesto {budget})')
+    logger.warning("⚠️ Presupuesto de consultas excedido: %s", message,
+                   extra={'repeated_queries': repeated})
+    if mode == 'raise':
+        raise QueryBudgetExceeded(message + ''.join(f'\n  {line}' for line in repeated))
+
+
+def span(name):
+    """Decorador: acumula llamadas y duración de una función en la petición actual"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not has_app_context() or g.get('_spans') is None:
+                return function(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                calls, seconds = g._spans.get(name, (0, 0.0))
+                g._spans[name] = (calls + 1, seconds + time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def instrument_calculations(cls):
+    """Decorador de clase: envuelve en un span cada método público calculate_*"""
+    for attribute, value in list(vars(cls).items()):
+        if attribute.startswith('calculate_') and callable(value):
+            setattr(cls, attribute, span(attribute)(value))
+    return cls
+
+
+def init_instrumentation(app):
+    """Contar y cronometrar SQL y cálculos por petición y exponerlos en Server-Timing"""
+
+    @app.before_request
+    def _start_request_timing():
+        g._request_start = time.perf_counter()
+        g._sql_stats = [0, 0.0]
+        g._sql_fingerprints = FingerprintCounter()
+        g._spans = {}
+
+    @app.after_request
+    def _finish_request_timing(response):
+        started = g.get('_request_start')
+        if started is None:
+            return response
+        duration = time.perf_counter() - started
+        query_count, query_seconds = g.get('_sql_stats') or (0, 0.0)
+        spans = g.get('_spans') or {}
+
+        timings = [f'db;dur={query_seconds * 1000:.1f};desc="{query_count} queries"']
+        for name, (calls, seconds) in sorted(spans.items(), key=lambda item: -item[1][1])[:10]:
+            timings.append(f'{name};dur={seconds * 1000:.1f};desc="{calls}x"')
+        timings.append(f'total;dur={duration * 1000:.1f}')
+        response.headers['Server-Timing'] = ', '.join(timings)
+
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe_request(route, request.method, response.status_code, duration,
+                                query_count, query_seconds, spans)
+        if request.url_rule:
+            _check_query_budget(query_count)
+        return response
@@ -0,0 +1,95 @@
+from datetime import date
+from flask import current_app, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # Sin orjson se usa el codificador estándar
+    orjson = None
+
+# Elementos codificados por trozo en las respuestas en streaming
+STREAM_CHUNK_SIZE = 500
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Proveedor JSON de Flask basado en orjson.
+
+    orjson serializa date/datetime en ISO 8601 de forma nativa (las rutas
+    pueden devolver las fechas tal cual, sin strftime/isoformat), admite
+    claves no str como los ids de empleado y genera bytes directamente para
+    la respuesta. Si orjson no está instalado se comporta como el proveedor por
+    defecto, salvo que las fechas también salen en ISO 8601.
+    """
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, date):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+    def _options(self, sort_keys=None, indent=None):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys if sort_keys is None else sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps_bytes(self, obj, **kwargs):
+        if orjson is None or set(kwargs) - {'sort_keys', 'indent'}:
+            return self.dumps(obj, **kwargs).encode('utf-8')
+        return orjson.dumps(obj, default=self.default, option=self._options(**kwargs))
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or set(kwargs) - {'sort_keys', 'indent'}:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj, **kwargs).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        # Igual que el proveedor por defecto: sangría en modo debug, compacto en producción
+        indent = 2 if self.compact is False or (self.compact is None and self._app.debug) else None
+        return self._app.response_class(self.dumps_bytes(obj, indent=indent), mimetype=self.mimetype)
+
+
+def stream_json_list(items, serialize=None, **envelope):
+    """
+    Respuesta {**envelope, "data": [...]} generada por trozos.
+
+    `items` se recorre de forma perezosa y cada elemento se pasa por
+    `serialize` (si se indica) antes de codificarse; nunca se construye la
+    cadena completa en memoria.
+    """
+    provider = current_app.json
+    dumps = provider.dumps_bytes if hasattr(provider, 'dumps_bytes') else (
+        lambda obj: provider.dumps(obj).encode('utf-8'))
+
+    def generate():
+        head = dumps(envelope)[:-1] if envelope else b'{'
+        yield head + (b',' if envelope else b'') + b'"data":['
+        chunk = []
+        first = True
+        for item in items:
+            chunk.append(dumps(serialize(item) if serialize else item))
+            if len(chunk) >= STREAM_CHUNK_SIZE:
+                yield (b'' if first else b',') + b','.join(chunk)
+                first = False
+                chunk = []
+        if chunk:
+            yield (b'' if first else b',') + b','.join(chunk)
+        yield b']}'
+
+    return current_app.response_class(stream_with_context(generate()), mimetype=provider.mimetype)
+
+
+def init_json(app):
+    """Usar FastJSONProvider en app.json (jsonify, request.get_json...)"""
+    app.json_provider_class = FastJSONProvider
+    app.json = FastJSONProvider(app)
+    return app.json
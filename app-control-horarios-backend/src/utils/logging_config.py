@@ -0,0 +1,99 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+
+# Atributos estándar de LogRecord: el resto son campos extra (logger.info(..., extra={...}))
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro: hora, nivel, logger, mensaje, campos extra y traza"""
+
+    def format(self, record):
+        payload = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                payload[key] = value
+        if record.exc_info:
+            payload['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload['exception'] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Como QueueHandler, pero deja la traza en exc_text en lugar de pegarla al mensaje"""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _parse_levels(value):
+    """'src.routes.calendar=DEBUG,src.utils=WARNING' -> {logger: nivel}"""
+    levels = {}
+    for item in (value or '').split(','):
+        if '=' in item:
+            name, level = item.split('=', 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def init_logging(app=None):
+    """
+    Configurar el logging de la aplicación (logger 'src').
+
+    Los módulos registran con logging.getLogger(__name__); los registros pasan
+    por un QueueHandler y un QueueListener los escribe en stdout desde un hilo
+    aparte, así las peticiones no esperan a la salida. Configuración por
+    entorno (o app.config):
+
+    - LOG_LEVEL: nivel general (INFO por defecto)
+    - LOG_LEVELS: niveles por módulo, p. ej. 'src.routes.calendar=DEBUG'
+    - LOG_FORMAT: 'json' (por defecto) o 'text'
+    """
+    global _listener
+    config = app.config if app is not None else {}
+
+    def setting(name, default=None):
+        return config.get(name) or os.getenv(name) or default
+
+    root = logging.getLogger('src')
+    root.setLevel(setting('LOG_LEVEL', 'INFO').upper())
+    for name, level in _parse_levels(setting('LOG_LEVELS')).items():
+        logging.getLogger(name).setLevel(level)
+
+    if _listener is not None:
+        return root
+
+    stream = logging.StreamHandler(sys.stdout)
+    if setting('LOG_FORMAT', 'json').lower() == 'text':
+        stream.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    else:
+        stream.setFormatter(JsonFormatter())
+
+    log_queue = queue.SimpleQueue()
+    root.addHandler(_QueueHandler(log_queue))
+    root.propagate = False
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return root
@@ -0,0 +1,99 @@
+import json
+import logging
+import os
+from array import array
+from datetime import date
+
+logger = logging.getLogger(__name__)
+
+# Perfiles de jornada declarativos. Cada perfil define:
+#   - intensive_periods: tramos (MM-DD a MM-DD, ambos incluidos) con jornada fija
+#     `hours` por día laborable (y opcionalmente `friday_hours` para los viernes).
+#     Un tramo con inicio posterior al fin cruza el cambio de año.
+#   - reduced_friday_hours: tope de horas de los viernes fuera de jornada intensiva.
+# Se pueden añadir o sobrescribir perfiles con un JSON en SCHEDULE_PROFILES_FILE.
+DEFAULT_PROFILE = 'default'
+
+SCHEDULE_PROFILES = {
+    'default': {
+        'description': 'Jornada intensiva de 7h/día en julio y agosto',
+        'intensive_periods': [{'start': '07-01', 'end': '08-31', 'hours': 7}],
+        'reduced_friday_hours': None,
+    },
+    'sin_intensiva': {
+        'description': 'Jornada del empleado todo el año, sin jornada intensiva',
+        'intensive_periods': [],
+        'reduced_friday_hours': None,
+    },
+}
+
+_profiles_file = os.getenv('SCHEDULE_PROFILES_FILE')
+if _profiles_file:
+    try:
+        with open(_profiles_file, encoding='utf-8') as profiles_file:
+            SCHEDULE_PROFILES.update(json.load(profiles_file))
+    except Exception as e:
+        logger.warning("⚠️ No se pudieron cargar los perfiles de jornada de %s: %s", _profiles_file, e)
+
+
+def _month_day(value):
+    month, day = value.split('-')
+    return int(month), int(day)
+
+
+def _in_period(month_day, start, end):
+    if start <= end:
+        return start <= month_day <= end
+    return month_day >= start or month_day <= end
+
+
+def compile_profile(profile_name, year, hours_mon_thu, hours_fri, holiday_ordinals):
+    """
+    Compila un perfil a un vector de horas esperadas por día del año.
+
+    La posición i corresponde al día `1 de enero + i`; fines de semana y
+    festivos valen 0.
+    """
+    profile = SCHEDULE_PROFILES.get(profile_name) or SCHEDULE_PROFILES[DEFAULT_PROFILE]
+    periods = [
+        (_month_day(period['start']), _month_day(period['end']), period)
+        for period in profile.get('intensive_periods') or []
+    ]
+    reduced_friday_hours = profile.get('reduced_friday_hours')
+
+    first = date(year, 1, 1).toordinal()
+    last = date(year, 12, 31).toordinal()
+    vector = array('d')
+    for ordinal in range(first, last + 1):
+        weekday = (ordinal - 1) % 7
+        if weekday >= 5 or ordinal in holiday_ordinals:
+            vector.append(0.0)
+            continue
+        day = date.fromordinal(ordinal)
+        hours = hours_mon_thu if weekday < 4 else hours_fri
+        period = next((p for start, end, p in periods if _in_period((day.month, day.day), start, end)), None)
+        if period is not None:
+            hours = period.get('friday_hours', period['hours']) if weekday == 4 else period['hours']
+        elif weekday == 4 and reduced_friday_hours is not None:
+            hours = min(hours, reduced_friday_hours)
+        vector.append(float(hours))
+    return vector
+
+
+def get_expected_hours_vector(profile_name, year, hours_mon_thu, hours_fri, community_id=None):
+    """
+    Vector de horas esperadas de un año, compilado una vez y cacheado.
+
+    Se guarda junto a las cachés de festivos porque depende de ellos y debe
+    descartarse con HolidayService.invalidate_cache().
+    """
+    from src.services.holiday_service import HolidayService
+    from src.services.holiday_index import get_holiday_index
+
+    cache_key = ('hours_vector', profile_name or DEFAULT_PROFILE, year, hours_mon_thu, hours_fri, community_id)
+    vector = HolidayService._cache.get(cache_key)
+    if vector is None:
+        holiday_ordinals = get_holiday_index().holiday_ordinals(community_id)
+        vector = compile_profile(profile_name, year, hours_mon_thu, hours_fri, holiday_ordinals)
+        HolidayService._cache[cache_key] = vector
+    return vector
@@ -0,0 +1,74 @@
+import os
+import sys
+import uuid
+import pytest
+from passlib.context import CryptContext
+
+# Las pruebas importan el paquete src desde la raíz del backend
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    """Aplicación completa sobre una base de datos SQLite temporal, sin hilos en segundo plano"""
+    database = tmp_path_factory.mktemp('db') / 'control_horarios.db'
+    os.environ['DATABASE_URL'] = f'sqlite:///{database}'
+    os.environ['HOURS_LEDGER_ENABLED'] = 'false'
+    os.environ['CACHE_WARMUP_ENABLED'] = 'false'
+    from src.main import app as flask_app
+    flask_app.config['TESTING'] = True
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def shared_sqlite(tmp_path, monkeypatch):
+    """Almacén compartido SQLite temporal (dos Cache del mismo espacio = dos workers)"""
+    from src.utils import cache_backend
+
+    store = cache_backend._SharedStore()
+    store.configure(f'sqlite:///{tmp_path}/cache.db')
+    monkeypatch.setattr(cache_backend, '_shared', store)
+    monkeypatch.setattr(cache_backend, 'CACHE_SYNC_INTERVAL', 0.0)
+    return store
+
+
+@pytest.fixture
+def fast_hashing(app):
+    """Hash rápido en pruebas (bcrypt cuesta decenas de ms por verificación)"""
+    security = app.extensions['security']
+    original = security.pwd_context
+    security.pwd_context = CryptContext(schemes=['pbkdf2_sha256'], pbkdf2_sha256__rounds=1000)
+    yield
+    security.pwd_context = original
+
+
+def _user_with_token(app, role_name):
+    """Usuario activo con el rol indicado y su token de autenticación: (email, token)"""
+    from flask_security.utils import hash_password
+    from src.models.employee import db
+
+    security = app.extensions['security']
+    email = f'{uuid.uuid4().hex[:8]}@example.com'
+    with app.app_context():
+        role = security.datastore.find_or_create_role(name=role_name)
+        user = security.datastore.create_user(
+            email=email, password=hash_password('clave-antigua-1'), roles=[role], active=True)
+        db.session.commit()
+        with app.test_request_context():
+            token = user.get_auth_token()
+    return email, token
+
+
+@pytest.fixture
+def user_token(app, fast_hashing):
+    return _user_with_token(app, 'user')
+
+
+@pytest.fixture
+def admin_token(app, fast_hashing):
+    return _user_with_token(app, 'admin')
@@ -0,0 +1,120 @@
+import threading
+import time
+import pytest
+from src.utils.admission import (AdmissionController, AdmissionRejected, admission,
+                                 INTERACTIVE, READ, HEAVY, BACKGROUND)
+
+
+def _controller(slots=4, reserved=2, timeout=2):
+    controller = AdmissionController()
+    controller.configure(slots, reserved, timeout)
+    return controller
+
+
+def _acquire_in_thread(controller, lane, *args):
+    """Pedir un hueco desde otro hilo; devuelve el hilo y la lista donde deja el ticket"""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(controller.acquire(lane, *args)), daemon=True)
+    thread.start()
+    return thread, result
+
+
+def _wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_reserved_slots_stay_free_for_writes():
+    controller = _controller(slots=4, reserved=2, timeout=0.05)
+    # Lecturas, rutas pesadas y segundo plano comparten los huecos no reservados
+    controller.acquire(READ)
+    controller.acquire(BACKGROUND)
+    with pytest.raises(AdmissionRejected):
+        controller.acquire(HEAVY, 'forecast', (2, 4))
+    with pytest.raises(AdmissionRejected):
+        controller.acquire(READ)
+
+    # Los huecos reservados siguen libres para las escrituras
+    controller.acquire(INTERACTIVE)
+    controller.acquire(INTERACTIVE)
+    assert controller.in_use == 4
+
+
+def test_waiting_write_goes_ahead_of_other_lanes():
+    controller = _controller(slots=2, reserved=1)
+    held = controller.acquire(READ)
+    controller.acquire(INTERACTIVE)
+
+    heavy, heavy_ticket = _acquire_in_thread(controller, HEAVY, 'forecast', (2, 4))
+    _wait_for(lambda: controller.waiting(HEAVY))
+    write, write_ticket = _acquire_in_thread(controller, INTERACTIVE)
+    _wait_for(lambda: controller.waiting(INTERACTIVE))
+
+    controller.release(held)
+    write.join(1)
+    assert write_ticket and not heavy_ticket
+    assert controller.waiting(HEAVY) == 1
+
+    controller.release(write_ticket[0])
+    heavy.join(1)
+    assert heavy_ticket
+
+
+def test_heavy_route_queue_is_bounded():
+    controller = _controller(slots=8, reserved=2)
+    controller.acquire(HEAVY, 'forecast', (1, 1))
+    waiting, _ = _acquire_in_thread(controller, HEAVY, 'forecast', (1, 1))
+    _wait_for(lambda: controller.waiting(HEAVY))
+    # Cola llena: se rechaza en el acto, sin esperar al timeout
+    started = time.monotonic()
+    with pytest.raises(AdmissionRejected):
+        controller.acquire(HEAVY, 'forecast', (1, 1))
+    assert time.monotonic() - started < 0.5
+
+
+@pytest.fixture
+def saturated(app):
+    """Todos los huecos del proceso ocupados y espera corta"""
+    timeout = admission.timeout
+    admission.timeout = 0.2
+    tickets = [admission.acquire(INTERACTIVE) for _ in range(admission.slots)]
+    yield
+    for ticket in tickets:
+        admission.release(ticket)
+    admission.timeout = timeout
+
+
+def test_anonymous_requests_are_not_queued(client, saturated):
+    started = time.monotonic()
+    response = client.get('/api/forecast/2025/3', headers={'Accept': 'application/json'})
+    assert response.status_code == 401
+    assert time.monotonic() - started < admission.timeout
+    assert admission.waiting(HEAVY) == 0
+
+
+def test_authenticated_reads_wait_for_a_slot(client, user_token, saturated):
+    _, token = user_token
+    response = client.get('/api/employees', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After']
+
+
+def test_waiting_request_holds_no_connection(app, client, user_token, saturated):
+    from src.models.employee import db
+
+    _, token = user_token
+    admission.timeout = 2
+    with app.app_context():
+        pool = db.engine.pool
+    # Token recién creado: la identidad no está en caché y se carga de la base de datos
+    request, responses = threading.Thread(target=lambda: responses.append(
+        client.get('/api/employees', headers={'Authorization': f'Bearer {token}'}))), []
+    request.start()
+    try:
+        _wait_for(lambda: admission.waiting(READ))
+        assert pool.checkedout() == 0
+    finally:
+        request.join(5)
+    assert responses[0].status_code == 503
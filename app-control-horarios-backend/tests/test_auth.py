@@ -0,0 +1,34 @@
+from flask_security.utils import verify_password
+from src.models.employee import User
+
+
+def test_change_password_with_bearer_token(app, client, user_token):
+    email, token = user_token
+    headers = {'Authorization': f'Bearer {token}', 'Accept': 'application/json'}
+
+    # La identidad queda en la caché antes del cambio
+    assert client.get('/api/jobs/inexistente', headers=headers).status_code == 404
+
+    response = client.post('/api/auth/change', headers=headers, json={
+        'password': 'clave-antigua-1',
+        'new_password': 'clave-nueva-2',
+        'new_password_confirm': 'clave-nueva-2'
+    })
+    assert response.status_code == 200, response.get_json()
+
+    with app.app_context():
+        user = User.query.filter_by(email=email).one()
+        assert verify_password('clave-nueva-2', user.password)
+
+    # El cambio renueva el uniquifier: el token anterior deja de valer aunque estuviera cacheado
+    assert client.get('/api/jobs/inexistente', headers=headers).status_code == 401
+
+
+def test_change_password_rejects_wrong_current_password(client, user_token):
+    _, token = user_token
+    response = client.post('/api/auth/change', headers={'Authorization': f'Bearer {token}'}, json={
+        'password': 'otra-clave-9',
+        'new_password': 'clave-nueva-2',
+        'new_password_confirm': 'clave-nueva-2'
+    })
+    assert response.status_code == 400
@@ -0,0 +1,44 @@
+import pytest
+from src.utils.cache_backend import Cache
+
+
+def test_invalidation_during_compute_is_not_cached_in_process():
+    cache = Cache('test-local')
+    calls = []
+
+    def compute():
+        calls.append(1)
+        if len(calls) == 1:
+            cache.clear()  # un commit invalida mientras se lee la base de datos
+            return 'viejo'
+        return 'nuevo'
+
+    assert cache.get_or_compute('k', compute) == 'viejo'
+    assert 'k' not in cache
+    assert cache.get_or_compute('k', compute) == 'nuevo'
+    assert cache.get_or_compute('k', compute) == 'nuevo'
+    assert len(calls) == 2
+
+
+def test_invalidation_from_other_worker_during_compute_is_not_shared(shared_sqlite):
+    worker_a = Cache('test-shared')
+    worker_b = Cache('test-shared')
+
+    def stale_compute():
+        worker_b.pop(('month', 2025, 3))  # otro worker hace commit e invalida
+        return {'entries': 'antes del commit'}
+
+    assert worker_a.get_or_compute(('month', 2025, 3), stale_compute) == {'entries': 'antes del commit'}
+    assert worker_b.get(('month', 2025, 3)) is None
+    assert worker_a.get(('month', 2025, 3)) is None
+
+    fresh = worker_b.get_or_compute(('month', 2025, 3), lambda: {'entries': 'tras el commit'})
+    assert worker_a.get(('month', 2025, 3)) == fresh
+
+
+def test_uninterrupted_compute_is_shared(shared_sqlite):
+    worker_a = Cache('test-shared-ok')
+    worker_b = Cache('test-shared-ok')
+
+    assert worker_a.get_or_compute('k', lambda: 42) == 42
+    assert worker_b.get_or_compute('k', lambda: pytest.fail('debería leerse del almacén')) == 42
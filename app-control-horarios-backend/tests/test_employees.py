@@ -0,0 +1,21 @@
+import uuid
+from src.models.employee import db, Employee
+
+
+def test_search_treats_wildcards_literally(app, client, user_token):
+    _, token = user_token
+    prefix = uuid.uuid4().hex[:6]
+    with app.app_context():
+        for name in (f'{prefix} Ana_B', f'{prefix} AnaXB', f'{prefix} 50% Equipo'):
+            db.session.add(Employee(team_name='Pruebas', full_name=name, hours_mon_thu=8, hours_fri=7,
+                                    vacation_days=22, free_hours=0, autonomous_community_id=1))
+        db.session.commit()
+
+    def search(term):
+        response = client.get('/api/employees', query_string={'search': f'{prefix} {term}'},
+                              headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 200, response.get_json()
+        return sorted(employee['full_name'] for employee in response.get_json()['data'])
+
+    assert search('Ana_') == [f'{prefix} Ana_B']
+    assert search('50%') == [f'{prefix} 50% Equipo']
@@ -0,0 +1,33 @@
+import uuid
+from datetime import date
+from src.models.employee import db, Employee, CalendarEntry
+from src.services.month_close_service import MonthCloseService
+
+
+def test_indra_inditex_hours_of_closed_month_come_from_snapshot(app, client, user_token):
+    _, token = user_token
+    service = MonthCloseService()
+    with app.app_context():
+        employee = Employee(team_name='Cierre', full_name=f'Cierre {uuid.uuid4().hex[:8]}', hours_mon_thu=8,
+                            hours_fri=7, vacation_days=22, free_hours=0, autonomous_community_id=1)
+        db.session.add(employee)
+        db.session.commit()
+        employee_id = employee.id
+        service.close_month(2029, 4, closed_by='pruebas@example.com')
+        closed = service.get_snapshot(2029, 4)['employees'][str(employee_id)]
+
+        # Cambio hecho fuera de la API (sin pasar por la comprobación de cierre)
+        db.session.add(CalendarEntry(employee_id=employee_id, date=date(2029, 4, 10), activity_type='V'))
+        db.session.commit()
+
+    try:
+        response = client.get(f'/api/forecast/indra-inditex/{employee_id}/2029/4',
+                              headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        assert body['closed'] is True
+        for name in ('theoretical_hours', 'actual_hours', 'indra_hours', 'inditex_hours'):
+            assert body['data'][name] == closed[name]
+    finally:
+        with app.app_context():
+            service.reopen_month(2029, 4, reopened_by='pruebas@example.com')
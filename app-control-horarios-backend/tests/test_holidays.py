@@ -0,0 +1,27 @@
+def test_batch_check_accepts_numeric_strings(client, user_token):
+    _, token = user_token
+    headers = {'Authorization': f'Bearer {token}'}
+    response = client.post('/api/holidays', headers=headers, json={
+        'date': '2031-03-19', 'name': 'San José (prueba)', 'autonomous_community': 5
+    })
+    assert response.status_code == 200, response.get_json()
+
+    response = client.post('/api/holidays/check/batch', headers=headers, json={
+        'checks': [{'date': '2031-03-19', 'community': '5'}, {'date': '2031-03-19', 'community': 5}],
+        'ranges': [{'start': '2031-03-19', 'end': '2031-03-19', 'community': '5'}]
+    })
+    assert response.status_code == 200, response.get_json()
+    results = response.get_json()['data']
+    assert [result['is_holiday'] for result in results] == [True, True, True]
+    assert {result['community'] for result in results} == {5}
+
+
+def test_checks_reject_non_numeric_locations(client, user_token):
+    _, token = user_token
+    headers = {'Authorization': f'Bearer {token}'}
+    response = client.post('/api/holidays/check/batch', headers=headers, json={
+        'checks': [{'date': '2031-03-19', 'community': 'Madrid'}]
+    })
+    assert response.status_code == 400
+    response = client.post('/api/holidays/check', headers=headers, json={'date': '2031-03-19', 'province': 'x'})
+    assert response.status_code == 400
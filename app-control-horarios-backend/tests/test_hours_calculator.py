@@ -0,0 +1,63 @@
+import uuid
+from datetime import date
+import pytest
+from src.models.employee import db, Employee
+from src.utils import hours_calculator
+from src.utils.hours_calculator import HoursCalculator
+
+
+@pytest.fixture
+def employees(app):
+    with app.app_context():
+        created = [Employee(team_name='Caché', full_name=f'Caché {uuid.uuid4().hex[:8]}', hours_mon_thu=8,
+                            hours_fri=7, vacation_days=22, free_hours=0, autonomous_community_id=1)
+                   for _ in range(2)]
+        db.session.add_all(created)
+        db.session.commit()
+        return [employee.id for employee in created]
+
+
+def test_entry_write_keeps_unrelated_forecasts(app, client, user_token, employees):
+    _, token = user_token
+    first, second = employees
+    cache = HoursCalculator._cache
+    kept = [('employee_forecast', second, 2031, 5), ('employee_forecast', first, 2031, 4)]
+    dropped = [('employee_forecast', first, 2031, 5), ('team_summary', 'Caché', 2031, 5)]
+    with app.app_context():
+        for key in kept + dropped:
+            cache.set(key, {'cached': True})
+
+    response = client.post('/api/calendar/entry', headers={'Authorization': f'Bearer {token}'}, json={
+        'employee_id': first, 'date': '2031-05-12', 'activity_type': 'V'
+    })
+    assert response.status_code == 200, response.get_json()
+    with app.app_context():
+        assert all(key in cache for key in kept)
+        assert not any(key in cache for key in dropped)
+
+
+def test_annual_summary_splits_vacations_by_current_day(app, monkeypatch, employees):
+    class FakeDate(date):
+        current = date(2031, 6, 1)
+
+        @classmethod
+        def today(cls):
+            return cls.current
+
+    monkeypatch.setattr(hours_calculator, 'date', FakeDate)
+    calculator = HoursCalculator()
+    with app.app_context():
+        employee = db.session.get(Employee, employees[0])
+        db.session.add(hours_calculator.CalendarEntry(employee_id=employee.id, date=date(2031, 6, 10),
+                                                      activity_type='V'))
+        db.session.commit()
+        HoursCalculator.invalidate_cache(employee_id=employee.id)
+
+        summary = calculator.calculate_annual_summary(employee, 2031)
+        assert summary['vacation_days_assigned'] == 1
+
+        # Días después la vacación ya es pasada: no se sirve el reparto anterior
+        FakeDate.current = date(2031, 6, 20)
+        summary = calculator.calculate_annual_summary(employee, 2031)
+        assert summary['vacation_days_used'] == 1
+        assert summary['vacation_days_assigned'] == 0
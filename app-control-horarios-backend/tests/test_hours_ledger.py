@@ -0,0 +1,83 @@
+import threading
+import uuid
+import pytest
+from src.models.employee import db, DailyExpectedHours, Employee, LedgerPending
+from src.services import hours_ledger as ledger_module
+from src.services.hours_ledger import HoursLedger, HORIZON_LOCK
+from src.utils.cache_backend import try_lock
+
+
+@pytest.fixture
+def empty_ledger(app, monkeypatch):
+    """Libro activo y vacío (hay que generar el horizonte), con esperas cortas"""
+    monkeypatch.setattr(ledger_module, 'HOURS_LEDGER_ENABLED', True)
+    monkeypatch.setattr(ledger_module, 'HORIZON_LOCK_POLL', 0.01)
+    monkeypatch.setattr(ledger_module, 'HORIZON_RETRY_DELAY', 0.01)
+    with app.app_context():
+        db.session.add(Employee(team_name='Libro', full_name=f'Libro {uuid.uuid4().hex[:8]}', hours_mon_thu=8,
+                                hours_fri=7, vacation_days=22, free_hours=0, autonomous_community_id=1))
+        DailyExpectedHours.query.delete()
+        LedgerPending.query.delete()
+        db.session.commit()
+
+
+def _record_generations(ledger, calls, fail_first=False):
+    original = ledger.regenerate
+
+    def regenerate(*args):
+        # Marcas globales vistas por cada intento de generación
+        calls.append(LedgerPending.query.filter(LedgerPending.employee_id.is_(None)).count())
+        if fail_first and len(calls) == 1:
+            raise RuntimeError('fallo simulado')
+        return original(*args)
+
+    ledger.regenerate = regenerate
+
+
+def _assert_horizon_complete():
+    start_date, end_date = HoursLedger.horizon()
+    days = end_date.toordinal() - start_date.toordinal() + 1
+    employees = db.session.query(db.func.count(Employee.id)).scalar()
+    assert db.session.query(db.func.count()).select_from(DailyExpectedHours).scalar() == employees * days
+    assert LedgerPending.query.count() == 0
+
+
+def test_two_workers_generate_the_horizon_once(app, shared_sqlite, empty_ledger):
+    workers = [HoursLedger(), HoursLedger()]
+    calls, errors = [], []
+    for ledger in workers:
+        _record_generations(ledger, calls)
+
+    def boot(ledger):
+        try:
+            with app.app_context():
+                ledger._ensure_horizon()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=boot, args=(ledger,)) for ledger in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(60)
+
+    assert not errors
+    # Solo el worker elegido genera; el otro espera al candado y lo encuentra completo
+    assert calls == [1]
+    assert all(ledger._covered == HoursLedger.horizon() for ledger in workers)
+    with app.app_context():
+        _assert_horizon_complete()
+
+
+def test_failed_generation_drops_its_marker_and_retries(app, shared_sqlite, empty_ledger):
+    ledger = HoursLedger()
+    calls = []
+    _record_generations(ledger, calls, fail_first=True)
+
+    with app.app_context():
+        ledger._ensure_horizon()
+        # El reintento solo ve su propia marca: la del intento fallido se retiró
+        assert calls == [1, 1]
+        assert ledger._covered == HoursLedger.horizon()
+        _assert_horizon_complete()
+    assert try_lock(HORIZON_LOCK, 1)
@@ -0,0 +1,55 @@
+import uuid
+from datetime import date, timedelta
+import pytest
+from src.models.employee import db, Employee
+
+
+@pytest.fixture
+def employee_id(app):
+    with app.app_context():
+        employee = Employee(team_name='Jornada', full_name=f'Jornada {uuid.uuid4().hex[:8]}', hours_mon_thu=8,
+                            hours_fri=7, vacation_days=22, free_hours=0, autonomous_community_id=1)
+        db.session.add(employee)
+        db.session.commit()
+        return employee.id
+
+
+def _schedules(client, headers, employee_id):
+    response = client.get(f'/api/employees/{employee_id}/schedules', headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['data']
+
+
+def test_hours_changes_keep_the_schedule_profile(client, admin_token, employee_id):
+    _, token = admin_token
+    headers = {'Authorization': f'Bearer {token}'}
+    today = date.today()
+    response = client.post(f'/api/employees/{employee_id}/schedules', headers=headers, json={
+        'hours_mon_thu': 8, 'hours_fri': 7, 'effective_from': today.isoformat(), 'profile': 'sin_intensiva'
+    })
+    assert response.status_code == 201, response.get_json()
+
+    # Cambio de jornada por la edición del empleado (fecha futura: nuevo tramo)
+    response = client.put(f'/api/employees/{employee_id}', headers=headers, json={
+        'hours_mon_thu': 7.5, 'effective_from': (today + timedelta(days=30)).isoformat()
+    })
+    assert response.status_code == 200, response.get_json()
+    assert [schedule['profile'] for schedule in _schedules(client, headers, employee_id)[-2:]] == \
+        ['sin_intensiva', 'sin_intensiva']
+
+    # Cambio por la carga en bloque (efecto hoy: sustituye el tramo de hoy)
+    response = client.post('/api/employees/bulk', headers=headers, json=[{'id': employee_id, 'hours_fri': 6}])
+    assert response.status_code == 200, response.get_json()
+    assert _schedules(client, headers, employee_id)[-1]['profile'] == 'sin_intensiva'
+
+    # Solo la ruta de horarios cambia el perfil, y solo si se indica
+    response = client.post(f'/api/employees/{employee_id}/schedules', headers=headers, json={
+        'hours_mon_thu': 8, 'hours_fri': 7, 'effective_from': (today + timedelta(days=60)).isoformat()
+    })
+    assert response.status_code == 201
+    assert response.get_json()['data']['profile'] == 'sin_intensiva'
+    response = client.post(f'/api/employees/{employee_id}/schedules', headers=headers, json={
+        'hours_mon_thu': 8, 'hours_fri': 7, 'effective_from': (today + timedelta(days=60)).isoformat(),
+        'profile': None
+    })
+    assert response.get_json()['data']['profile'] is None